@@ -10,3 +10,9 @@ python manage.py collectstatic --no-input
 
 # Run your database migrations on the Render PostgreSQL database
 python manage.py migrate
+
+# Fill stored order totals for orders placed before the columns existed
+python manage.py backfill_order_totals
+
+# Build the dashboard sales rollups on first deploy
+python manage.py rebuild_sales_rollups --if-empty
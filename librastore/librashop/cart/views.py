@@ -5,6 +5,7 @@ from django.views.decorators.http import require_POST
 from django.urls import reverse
 
 from store.models import Product, Customer
+from store import flash_sale
 from .models import Cart, CartItem
 # Create your views here.
 
@@ -36,6 +37,18 @@ def view_cart(request):
 @login_required
 def add_to_cart(request, product_id):
     product = get_object_or_404(Product, id=product_id)
+
+    # Flash-sale products: sold-out check and admission run against the cache only
+    admitted = []
+    sale = flash_sale.sale_for_product(product.id)
+    if sale:
+        if flash_sale.remaining(sale) <= 0:
+            messages.error(request, f"Sorry, {product.name} is sold out.")
+            return redirect(request.META.get('HTTP_REFERER', 'shop'))
+        admitted = flash_sale.admit(request, [sale])
+        if admitted is None:
+            return flash_sale.waiting_room(request, sale)
+
     # Use quantity from POST; fallback to 1 for non-POST (e.g., link click)
     try:
         quantity = int(request.POST.get('quantity', 1)) if request.method == 'POST' else 1
@@ -65,8 +78,8 @@ def add_to_cart(request, product_id):
     except Exception:
         checkout_url = '/checkout/'
     if next_url in (checkout_url, '/checkout/'):
-        return redirect(checkout_url)
-    return redirect('view_cart')
+        return flash_sale.grant_passes(request, redirect(checkout_url), admitted)
+    return flash_sale.grant_passes(request, redirect('view_cart'), admitted)
     
     
 
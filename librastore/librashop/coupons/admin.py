@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils import timezone
 from . models import Coupon, OrderCoupon
 
@@ -23,6 +24,9 @@ class CouponAdmin(admin.ModelAdmin):
             'fields': ('active', 'max_users')
         }),
     )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_usage_count=Count('ordercoupon'))
     
     def discount_badge(self, obj):
         """Display discount in a readable format"""
@@ -45,11 +49,12 @@ class CouponAdmin(admin.ModelAdmin):
     
     def usage_count(self, obj):
         """Show how many times coupon was used"""
-        count = obj.ordercoupon_set.count()
+        count = obj._usage_count
         if obj.max_users > 0:
             return f"{count} / {obj.max_users}"
         return f"{count} / ∞"
     usage_count.short_description = 'Usage'
+    usage_count.admin_order_field = '_usage_count'
     
     class Media:
         css = {
@@ -63,6 +68,7 @@ class OrderCouponAdmin(admin.ModelAdmin):
     list_filter = ['coupon']
     search_fields = ['order__id', 'coupon__code']
     readonly_fields = ['order', 'coupon', 'discount_amount']
+    list_select_related = ['order', 'coupon']
     
     def applied_date(self, obj):
         """Show when coupon was applied"""
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'librashop.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402  (needs the app registry loaded above)
+
+from store.order_events import order_events_app  # noqa: E402
+
+ORDER_EVENTS_PATH = reverse('my_orders_events')
+
+
+async def application(scope, receive, send):
+    # Order event streams skip the Django request cycle so an idle stream holds no thread
+    if scope['type'] == 'http' and scope['path'] == ORDER_EVENTS_PATH:
+        await order_events_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,30 @@
+"""
+Image decoding and resizing for process pools.
+
+Only Pillow is imported here, not Django, so pool workers start quickly and
+never touch settings or database connections. Functions take and return
+plain bytes, which is all that crosses the process boundary.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+def resize_image(data, max_size, quality=85):
+    """``data`` decoded, rotated upright, shrunk to fit ``max_size`` pixels and re-encoded as JPEG.
+
+    Raises ValueError if ``data`` is not an image Pillow can read.
+    """
+    try:
+        with Image.open(BytesIO(data)) as image:
+            # JPEG can decode at a fraction of full size, far cheaper than decoding it all
+            image.draft('RGB', (max_size, max_size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_size, max_size))
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            out = BytesIO()
+            image.save(out, 'JPEG', quality=quality, optimize=True)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ValueError(f"not a readable image ({exc})") from exc
+    return out.getvalue()
@@ -0,0 +1,191 @@
+"""
+Pagination for large tables.
+
+Keyset (seek) pagination: a page is addressed by an opaque cursor holding
+the ordering values of the last row already shown, so page N is the same
+index range scan as page 1 instead of an OFFSET scan over every earlier row.
+
+Estimated counts: an unfiltered ``COUNT(*)`` reads the whole table, so for
+big tables the row count the planner keeps (Postgres ``pg_class.reltuples``,
+SQLite's ``sqlite_stat1`` after ANALYZE) is used instead. Filtered lists are
+counted only up to ESTIMATE_THRESHOLD rows ("10,000+"), unless the exact
+count is asked for.
+"""
+import logging
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = 'keyset-cursor'
+# Below this many rows an exact count is cheap enough and always right
+ESTIMATE_THRESHOLD = 10000
+EXACT, ESTIMATED, AT_LEAST = 'exact', 'estimated', 'at_least'
+
+
+def estimated_count(model, using='default'):
+    """The database's row estimate for ``model``'s table, or None if it has none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+                row = cursor.fetchone()
+                # -1 until the table is first vacuumed/analyzed
+                return row[0] if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                # sqlite_stat1 only exists once ANALYZE has run; the first number is the row count
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        logger.debug("No row estimate for %s", table, exc_info=True)
+    return None
+
+
+def is_unfiltered(queryset):
+    """True when ``queryset`` counts every row of its table (ordering aside)."""
+    query = queryset.query
+    return not query.where and not query.distinct and not query.is_sliced and not query.combinator
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the table's row estimate instead of COUNT(*) for unfiltered querysets
+    of at least ESTIMATE_THRESHOLD rows; filtered ones are counted exactly."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and is_unfiltered(queryset):
+            estimate = estimated_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, is_first):
+        self.object_list = items
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _fields(model, ordering):
+    fields = []
+    for term in ordering:
+        name = term.lstrip('-')
+        fields.append((model._meta.get_field(name), name, term.startswith('-')))
+    return fields
+
+
+def encode_cursor(obj, ordering):
+    values = [field.value_to_string(obj) for field, _, _ in _fields(type(obj), ordering)]
+    return signing.dumps(values, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, model, ordering):
+    """Return the typed ordering values in ``cursor``, or None if it is missing or tampered with."""
+    try:
+        values = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    fields = _fields(model, ordering)
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    return [field.to_python(value) for (field, _, _), value in zip(fields, values)]
+
+
+def _after(fields, values):
+    # (a, b) after (x, y) in descending order is: a < x OR (a = x AND b < y)
+    condition = Q()
+    for i, (_, name, descending) in enumerate(fields):
+        term = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for (_, previous, _), value in zip(fields[:i], values[:i]):
+            term &= Q(**{previous: value})
+        condition |= term
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, per_page=20):
+    """Return the page of ``queryset`` that follows ``cursor``.
+
+    ``ordering`` must end with a unique field (normally the primary key) so
+    every row has a distinct position.
+    """
+    fields = _fields(queryset.model, ordering)
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, queryset.model, ordering) if cursor else None
+    if values is not None:
+        queryset = queryset.filter(_after(fields, values))
+    rows = list(queryset[:per_page + 1])
+    next_cursor = encode_cursor(rows[per_page - 1], ordering) if len(rows) > per_page else None
+    return KeysetPage(rows[:per_page], next_cursor, is_first=values is None)
+
+
+def list_total(queryset, exact=False):
+    """``(total, kind)`` for ``queryset`` without an unbounded COUNT(*) unless ``exact``."""
+    if exact:
+        return queryset.count(), EXACT
+    if is_unfiltered(queryset):
+        estimate = estimated_count(queryset.model, using=queryset.db)
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate, ESTIMATED
+    # Count at most one row past the threshold: bounded work however many rows match
+    counted = queryset.order_by()[:ESTIMATE_THRESHOLD + 1].count()
+    if counted > ESTIMATE_THRESHOLD:
+        return ESTIMATE_THRESHOLD, AT_LEAST
+    return counted, EXACT
+
+
+class ListPage(KeysetPage):
+    """A keyset page of a list view, with the list's total and the query string to page with."""
+
+    def __init__(self, page, cursor, total, total_kind, params):
+        super().__init__(page.object_list, page.next_cursor, page.is_first)
+        self.cursor = cursor
+        self.total = total
+        self.total_kind = total_kind
+        self.params = params
+
+    @property
+    def total_is_exact(self):
+        return self.total_kind == EXACT
+
+    @property
+    def total_display(self):
+        total = intcomma(self.total)
+        if self.total_kind == ESTIMATED:
+            return f"~{total}"
+        if self.total_kind == AT_LEAST:
+            return f"{total}+"
+        return total
+
+
+def paginate_list(request, queryset, ordering, per_page=20):
+    """Keyset-paginate ``queryset`` for a list view (``?cursor=``; ``?exact=1`` for an exact total).
+
+    ``params`` on the page is the request's query string without the cursor,
+    for building the next/first page links with the same filters.
+    """
+    cursor = request.GET.get('cursor')
+    page = keyset_page(queryset, ordering, cursor, per_page)
+    total, kind = list_total(queryset, exact=request.GET.get('exact') == '1')
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    return ListPage(page, cursor if not page.is_first else None, total, kind, params.urlencode())
@@ -0,0 +1,82 @@
+"""
+Time-bucketed series for dashboards.
+
+Buckets are calendar days or months in the current time zone, computed by
+the database with ``TruncDate``/``TruncMonth`` so the same query runs on
+SQLite and Postgres. Ranges are half-open, ``[start, end)``, and on datetime
+columns become ``field >= <local midnight> AND field < <local midnight>``,
+which an index on the column can serve (unlike ``field__date`` lookups,
+which wrap the column in a function). Buckets with no rows are filled in
+here, so a chart gets one entry per day or month from a single query.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import DateField, DateTimeField, F
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+DAY = 'day'
+MONTH = 'month'
+
+
+def local_midnight(day):
+    """Aware datetime for the start of ``day`` in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def day_window(days, today=None):
+    """[start, end) dates covering the last ``days`` days, today included."""
+    today = today or timezone.localdate()
+    return today - timedelta(days=days - 1), today + timedelta(days=1)
+
+
+def month_window(months, today=None):
+    """[start, end) dates covering the last ``months`` calendar months, this one included."""
+    this_month = (today or timezone.localdate()).replace(day=1)
+    return _add_months(this_month, -(months - 1)), _add_months(this_month, 1)
+
+
+def buckets(start, end, unit):
+    """Every bucket start date in [start, end)."""
+    current = start if unit == DAY else start.replace(day=1)
+    while current < end:
+        yield current
+        current = current + timedelta(days=1) if unit == DAY else _add_months(current, 1)
+
+
+def in_range(queryset, field, start, end):
+    """Filter ``queryset`` to ``start <= field < end`` (dates; local midnights on datetime columns)."""
+    if isinstance(queryset.model._meta.get_field(field), DateTimeField):
+        start, end = local_midnight(start), local_midnight(end)
+    return queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def _truncate(model, field, unit):
+    is_datetime = isinstance(model._meta.get_field(field), DateTimeField)
+    tzinfo = timezone.get_current_timezone() if is_datetime else None
+    if unit == DAY:
+        # TruncDate only accepts datetimes; a DateField already is a day
+        return TruncDate(field, tzinfo=tzinfo) if is_datetime else F(field)
+    return TruncMonth(field, output_field=DateField(), tzinfo=tzinfo)
+
+
+def time_series(queryset, field, unit, start, end, fill=0, **aggregates):
+    """Aggregate ``queryset`` per ``unit`` bucket of ``field`` over [start, end).
+
+    Returns one dict per bucket, in order, with the bucket's start date under
+    ``'bucket'`` and each aggregate under its keyword; buckets without rows get
+    ``fill``.
+    """
+    rows = in_range(queryset, field, start, end).values(bucket=_truncate(queryset.model, field, unit))
+    found = {row['bucket']: row for row in rows.annotate(**aggregates).order_by('bucket')}
+    series = []
+    for bucket in buckets(start, end, unit):
+        row = found.get(bucket, {})
+        values = {name: fill if row.get(name) is None else row[name] for name in aggregates}
+        series.append({'bucket': bucket, **values})
+    return series
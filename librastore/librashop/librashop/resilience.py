@@ -0,0 +1,168 @@
+"""
+Circuit breakers and bulkheads for outbound provider calls (Stripe, email).
+
+Breaker state and in-flight slots live in the default cache, so with the
+shared Redis cache every gunicorn worker sees the same breaker. With the
+local-memory cache each worker process keeps its own breaker.
+"""
+import logging
+import time
+
+import stripe
+from anymail.exceptions import AnymailAPIError
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open or whose bulkhead is full."""
+
+    def __init__(self, provider, reason):
+        self.provider = provider
+        self.reason = reason
+        super().__init__(f"{provider} unavailable: {reason}")
+
+
+class CircuitBreaker:
+    """Fail fast on a degraded provider and cap concurrent calls to it.
+
+    Only exceptions in ``failure_exceptions`` count towards opening the
+    circuit; anything else (card declined, invalid request) is the caller's
+    problem and passes straight through.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, max_concurrent=4,
+                 failure_exceptions=(Exception,)):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_concurrent = max_concurrent
+        self.failure_exceptions = failure_exceptions
+        # In-flight slots expire on their own if a worker dies mid-call
+        self.slot_ttl = max(settings.PROVIDER_TIMEOUT_SECONDS * 3, 30)
+
+    def _key(self, suffix):
+        return f"breaker:{self.name}:{suffix}"
+
+    @property
+    def state(self):
+        opened_at = cache.get(self._key('opened_at'))
+        if opened_at is None:
+            return CLOSED
+        if time.time() - opened_at >= self.recovery_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def call(self, func, *args, **kwargs):
+        state = self.state
+        if state == OPEN:
+            self._count('rejected_open')
+            raise ProviderUnavailable(self.name, 'circuit open')
+        # While half-open only one trial call is let through at a time
+        if state == HALF_OPEN and not cache.add(self._key('probe'), 1, self.slot_ttl):
+            self._count('rejected_open')
+            raise ProviderUnavailable(self.name, 'circuit open')
+
+        slot = self._acquire()
+        if slot is None:
+            if state == HALF_OPEN:
+                cache.delete(self._key('probe'))
+            self._count('rejected_bulkhead')
+            raise ProviderUnavailable(self.name, 'too many concurrent calls')
+
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_exceptions:
+            self._record_failure(state)
+            raise
+        else:
+            self._record_success(state)
+            return result
+        finally:
+            self._release(slot)
+            if state == HALF_OPEN:
+                cache.delete(self._key('probe'))
+
+    def _slot_keys(self):
+        return [self._key(f"in_flight:{slot}") for slot in range(self.max_concurrent)]
+
+    def _acquire(self):
+        """Take a free in-flight slot and return its key, or None if all are taken.
+
+        Each slot is its own key with its own TTL, so a slot left by a dead
+        worker frees itself without disturbing the others.
+        """
+        for key in self._slot_keys():
+            if cache.add(key, 1, self.slot_ttl):
+                return key
+        return None
+
+    def _release(self, slot):
+        cache.delete(slot)
+
+    def _count(self, counter):
+        key = self._key(f"count:{counter}")
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    def _record_failure(self, state):
+        self._count('failures')
+        key = self._key('consecutive_failures')
+        cache.add(key, 0, None)
+        try:
+            failures = cache.incr(key)
+        except ValueError:
+            failures = 1
+        if state == HALF_OPEN or failures >= self.failure_threshold:
+            cache.set(self._key('opened_at'), time.time(), None)
+            cache.delete(key)
+            self._count('opened')
+            logger.warning("Circuit for %s opened after %s consecutive failures", self.name, failures)
+
+    def _record_success(self, state):
+        self._count('successes')
+        if state == HALF_OPEN:
+            cache.delete(self._key('opened_at'))
+            logger.info("Circuit for %s closed after a successful trial call", self.name)
+        cache.delete(self._key('consecutive_failures'))
+
+    def snapshot(self):
+        """Current breaker state and counters, for the metrics endpoint."""
+        counters = ['successes', 'failures', 'rejected_open', 'rejected_bulkhead', 'opened']
+        keys = [self._key('consecutive_failures'), self._key('opened_at')]
+        keys += [self._key(f"count:{c}") for c in counters]
+        values = cache.get_many(keys + self._slot_keys())
+        return {
+            'provider': self.name,
+            'state': self.state,
+            'in_flight': sum(1 for key in self._slot_keys() if key in values),
+            'max_concurrent': self.max_concurrent,
+            'consecutive_failures': values.get(keys[0], 0),
+            'failure_threshold': self.failure_threshold,
+            'opened_at': values.get(keys[1]),
+            'recovery_timeout': self.recovery_timeout,
+            'counters': {c: values.get(self._key(f"count:{c}"), 0) for c in counters},
+        }
+
+
+# Only transport/provider-side errors should trip the breaker
+STRIPE_FAILURES = (
+    stripe.error.APIConnectionError,
+    stripe.error.APIError,
+    stripe.error.RateLimitError,
+)
+EMAIL_FAILURES = (AnymailAPIError, OSError)
+
+stripe_breaker = CircuitBreaker('stripe', failure_exceptions=STRIPE_FAILURES, **settings.CIRCUIT_BREAKERS['stripe'])
+email_breaker = CircuitBreaker('email', failure_exceptions=EMAIL_FAILURES, **settings.CIRCUIT_BREAKERS['email'])
+
+BREAKERS = {breaker.name: breaker for breaker in (stripe_breaker, email_breaker)}
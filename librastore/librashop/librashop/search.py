@@ -0,0 +1,134 @@
+"""
+Substring search served by trigram indexes.
+
+``search(queryset, fields, term)`` keeps the Django admin's semantics: every
+word of ``term`` must occur, case-insensitively, in at least one of
+``fields`` (which may follow foreign keys, e.g. ``custamer__name``). Columns
+listed in TRIGRAM_FIELDS are indexed by store migration 0022 (indexing
+another column takes a new migration as well as an entry here):
+
+* Postgres: GIN ``gin_trgm_ops`` indexes on ``UPPER(column::text)``, the
+  exact expression Django's ``icontains`` compares, so the ORM's own lookup
+  uses them.
+* SQLite: one FTS5 table per model with the ``trigram`` tokenizer, kept in
+  sync by triggers; a column matches through ``pk IN (SELECT rowid ... MATCH)``.
+
+Words shorter than a trigram, and columns without an index, fall back to a
+plain ``icontains``. SQLite drops a table's triggers when a migration
+rebuilds it, so ``repair_indexes`` puts them back (and re-reads the table)
+after every migrate.
+"""
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+# db_table -> indexed columns
+TRIGRAM_FIELDS = {
+    'store_customer': ('name', 'email'),
+    'store_order': ('tracking_number',),
+    'store_shippingadderss': ('address', 'city', 'state', 'zipcode'),
+}
+MIN_TRIGRAM_LENGTH = 3
+
+
+def fts_table(db_table):
+    return f'{db_table}_search'
+
+
+def _sqlite_triggers(db_table, columns):
+    table = fts_table(db_table)
+    names = ', '.join(f'"{column}"' for column in columns)
+    new = ', '.join(f'new."{column}"' for column in columns)
+    old = ', '.join(f'old."{column}"' for column in columns)
+    remove = f'INSERT INTO "{table}" ("{table}", rowid, {names}) VALUES (\'delete\', old.id, {old});'
+    add = f'INSERT INTO "{table}" (rowid, {names}) VALUES (new.id, {new});'
+    return {
+        f'{table}_ai': f'AFTER INSERT ON "{db_table}" BEGIN {add} END',
+        f'{table}_ad': f'AFTER DELETE ON "{db_table}" BEGIN {remove} END',
+        f'{table}_au': f'AFTER UPDATE ON "{db_table}" BEGIN {remove} {add} END',
+    }
+
+
+def _repair_sqlite(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for db_table, columns in TRIGRAM_FIELDS.items():
+            table = fts_table(db_table)
+            triggers = _sqlite_triggers(db_table, columns)
+            if table not in existing or existing.issuperset(triggers):
+                continue
+            for name, body in triggers.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS "{name}" {body}')
+            # Rows written while the triggers were missing: re-read the whole table
+            cursor.execute(f'INSERT INTO "{table}" ("{table}") VALUES (\'rebuild\')')
+
+
+def repair_indexes(connection):
+    """Restore lost SQLite FTS triggers; tables the migration hasn't created yet are left alone."""
+    if connection.vendor == 'sqlite':
+        _repair_sqlite(connection)
+
+
+def _words(term):
+    for word in smart_split(term):
+        if word[0] in '"\'' and word[0] == word[-1]:
+            word = unescape_string_literal(word)
+        if word:
+            yield word
+
+
+def _target(model, path):
+    """(prefix to the model holding the column, that model, column name) for a lookup path."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    prefix = '__'.join(relations)
+    return (f'{prefix}__' if prefix else ''), model, model._meta.get_field(name).column
+
+
+def _fts_match(db_table, columns, word):
+    # Column filter plus a quoted phrase: the trigram tokenizer matches it as a substring
+    phrase = '"' + word.replace('"', '""') + '"'
+    table = fts_table(db_table)
+    return RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', [f'{{{" ".join(columns)}}} : {phrase}'])
+
+
+def _word_q(model, fields, word, vendor):
+    condition = Q()
+    fts_columns = {}
+    for path in fields:
+        prefix, target, column = _target(model, path)
+        indexed = column in TRIGRAM_FIELDS.get(target._meta.db_table, ())
+        if vendor == 'sqlite' and indexed and len(word) >= MIN_TRIGRAM_LENGTH:
+            # Columns of the same table share one MATCH
+            fts_columns.setdefault((prefix, target._meta.db_table), []).append(column)
+        else:
+            condition |= Q(**{f'{path}__icontains': word})
+    for (prefix, db_table), columns in fts_columns.items():
+        condition |= Q(**{f'{prefix}pk__in': _fts_match(db_table, columns, word)})
+    return condition
+
+
+def search(queryset, fields, term):
+    """Rows of ``queryset`` where each word of ``term`` is in one of ``fields``."""
+    vendor = connections[queryset.db].vendor
+    for word in _words(term):
+        queryset = queryset.filter(_word_q(queryset.model, fields, word, vendor))
+    return queryset
+
+
+class TrigramSearchMixin:
+    """ModelAdmin mixin routing ``search_fields`` through :func:`search`.
+
+    Only plain field paths are supported (no ``^``, ``=`` or ``@`` prefixes).
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_fields or not search_term:
+            return queryset, False
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, path) for path in search_fields)
+        return search(queryset, search_fields, search_term), may_have_duplicates
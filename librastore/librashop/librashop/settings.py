@@ -29,6 +29,11 @@ STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="")
 if STRIPE_SECRET_KEY:
     stripe.api_key = STRIPE_SECRET_KEY
 
+# Bound every Stripe call so a degraded API cannot pin a worker for 80s
+PROVIDER_TIMEOUT_SECONDS = config("PROVIDER_TIMEOUT_SECONDS", default=10, cast=int)
+stripe.default_http_client = stripe.RequestsClient(timeout=PROVIDER_TIMEOUT_SECONDS)
+stripe.max_network_retries = 0
+
 
 
 # ====== AUTH / LOGIN SETTINGS ======
@@ -92,6 +97,7 @@ EMAIL_BACKEND = "anymail.backends.mailgun.EmailBackend"
 ANYMAIL = {
     "MAILGUN_API_KEY": config("MAILGUN_API_KEY", default=""),
     "MAILGUN_SENDER_DOMAIN": config("MAILGUN_SENDER_DOMAIN", default=""),
+    "REQUESTS_TIMEOUT": PROVIDER_TIMEOUT_SECONDS,
 }
 
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="LIBRA Store <noreply@example.com>")
@@ -155,6 +161,97 @@ DATABASES = {
     )
 }
 
+# ====== CACHE ======
+# A shared cache (Redis) is required for breaker state, counters and
+# versioned page caches to be consistent across gunicorn workers.
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "librashop",
+        }
+    }
+
+
+# ====== OUTBOUND PROVIDER CIRCUIT BREAKERS ======
+# failure_threshold: consecutive provider failures before the circuit opens
+# recovery_timeout: seconds the circuit stays open before a single trial call
+# max_concurrent: in-flight calls allowed per provider (bulkhead)
+CIRCUIT_BREAKERS = {
+    "stripe": {
+        "failure_threshold": config("STRIPE_BREAKER_FAILURES", default=5, cast=int),
+        "recovery_timeout": config("STRIPE_BREAKER_RECOVERY_SECONDS", default=30, cast=int),
+        "max_concurrent": config("STRIPE_MAX_CONCURRENT", default=8, cast=int),
+    },
+    "email": {
+        "failure_threshold": config("EMAIL_BREAKER_FAILURES", default=5, cast=int),
+        "recovery_timeout": config("EMAIL_BREAKER_RECOVERY_SECONDS", default=60, cast=int),
+        "max_concurrent": config("EMAIL_MAX_CONCURRENT", default=4, cast=int),
+    },
+}
+
+
+# ====== INVENTORY ======
+# Stock held for a cart from checkout-session creation until payment; the
+# Stripe session is set to expire a minute before the hold does.
+STOCK_RESERVATION_MINUTES = config("STOCK_RESERVATION_MINUTES", default=35, cast=int)
+
+# Flash sales: each sale admits max_shoppers into checkout per admission
+# window; everyone else sees the waiting room, which retries on its own.
+FLASH_SALE_ADMISSION_SECONDS = config("FLASH_SALE_ADMISSION_SECONDS", default=600, cast=int)
+FLASH_SALE_RETRY_SECONDS = config("FLASH_SALE_RETRY_SECONDS", default=15, cast=int)
+
+
+
+# ====== CARRIER TRACKING ======
+# Adapters per carrier (matched on the lower-cased Order.carrier); "default"
+# serves every other carrier. The default url points at the local stand-in
+# (manage.py run_carrier_standin) until a real tracking API is configured.
+CARRIER_ADAPTERS = {
+    "default": {
+        "adapter": "store.carriers.HTTPTrackingAdapter",
+        "url": config("CARRIER_TRACKING_URL", default="http://127.0.0.1:8765/track/{tracking_number}"),
+        "rate_per_second": config("CARRIER_RATE_PER_SECOND", default=20, cast=int),
+        "max_concurrent": config("CARRIER_MAX_CONCURRENT", default=20, cast=int),
+    },
+}
+CARRIER_SYNC = {
+    "max_concurrent": config("CARRIER_SYNC_CONCURRENCY", default=50, cast=int),
+    "batch_size": config("CARRIER_SYNC_BATCH_SIZE", default=500, cast=int),
+}
+
+# ====== DEMAND FORECASTING ======
+# manage.py build_demand_forecasts (nightly): exponential smoothing over the
+# last history_days of paid sales. A tracked product needs restocking when its
+# stock covers fewer than lead_time_days + safety_days of forecast demand; the
+# suggestion tops it up to target_cover_days.
+DEMAND_FORECAST = {
+    "history_days": config("FORECAST_HISTORY_DAYS", default=90, cast=int),
+    "alpha": config("FORECAST_ALPHA", default=0.2, cast=float),
+    "horizon_days": config("FORECAST_HORIZON_DAYS", default=14, cast=int),
+    "lead_time_days": config("RESTOCK_LEAD_TIME_DAYS", default=7, cast=int),
+    "safety_days": config("RESTOCK_SAFETY_DAYS", default=3, cast=int),
+    "target_cover_days": config("RESTOCK_TARGET_COVER_DAYS", default=30, cast=int),
+}
+
+# ====== VENDOR BULK UPLOAD ======
+# CSV + zip product uploads (vendors.bulk_upload): images are decoded and
+# resized to fit image_size pixels in a pool of image_workers processes.
+VENDOR_BULK_UPLOAD = {
+    "image_workers": config("BULK_UPLOAD_IMAGE_WORKERS", default=2, cast=int),
+    "image_size": config("BULK_UPLOAD_IMAGE_SIZE", default=1200, cast=int),
+    "max_image_mb": config("BULK_UPLOAD_MAX_IMAGE_MB", default=10, cast=int),
+}
+
 # ====== PASSWORD VALIDATORS ======
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -0,0 +1,84 @@
+"""
+Stale-while-revalidate caching with single-flight refresh.
+
+A cached value is fresh for ``ttl`` seconds and may be served stale for
+``stale_ttl`` more. The first request to see a stale value takes a refresh
+lock (``cache.add``, so it is shared by every worker when the cache is
+Redis), recomputes in a background thread and keeps serving the stale value
+meanwhile; everyone else just gets the stale value. On a cold cache one
+request computes and the others wait for its result instead of running the
+same queries, for up to WAIT_SECONDS.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+LOCK_SECONDS = 60
+# Cold-cache waiters compute for themselves after this, rather than tie up a worker for the whole lock
+WAIT_SECONDS = 5
+WAIT_POLL_SECONDS = 0.1
+
+
+def _lock_key(key):
+    return f"{key}:refreshing"
+
+
+def _store(key, value, ttl, stale_ttl):
+    cache.set(key, {'value': value, 'fresh_until': time.time() + ttl}, ttl + stale_ttl)
+
+
+def _refresh(key, compute, ttl, stale_ttl):
+    try:
+        _store(key, compute(), ttl, stale_ttl)
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def _refresh_in_background(key, compute, ttl, stale_ttl):
+    def run():
+        close_old_connections()
+        try:
+            _refresh(key, compute, ttl, stale_ttl)
+        except Exception:
+            logger.exception("Background refresh of %s failed; serving stale data until it succeeds", key)
+        finally:
+            # The thread's own connection would otherwise stay open until the process exits
+            connections.close_all()
+
+    threading.Thread(target=run, name=f"swr-{key}", daemon=True).start()
+
+
+def get_or_refresh(key, compute, ttl=60, stale_ttl=600):
+    """Return ``(value, is_stale)`` for ``key``, computing it with ``compute()`` as described above."""
+    entry = cache.get(key)
+    if entry is not None:
+        stale = entry['fresh_until'] <= time.time()
+        if stale and cache.add(_lock_key(key), 1, LOCK_SECONDS):
+            _refresh_in_background(key, compute, ttl, stale_ttl)
+        return entry['value'], stale
+
+    if cache.add(_lock_key(key), 1, LOCK_SECONDS):
+        try:
+            value = compute()
+            _store(key, value, ttl, stale_ttl)
+        finally:
+            cache.delete(_lock_key(key))
+        return value, False
+
+    # Someone else is computing it; wait a little for their result rather than repeat the work
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value'], False
+        if cache.get(_lock_key(key)) is None:
+            break
+    value = compute()
+    _store(key, value, ttl, stale_ttl)
+    return value, False
@@ -20,11 +20,14 @@ from store import admin_views as admin_views
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
+from . import views
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('admin-dashboard/', admin_views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/data/', admin_views.admin_dashboard_data, name='admin_dashboard_data'),
+    path('admin-dashboard/cube/', admin_views.admin_sales_cube, name='admin_sales_cube'),
     path('custom-admin/', include('store.admin_urls')),  # Custom admin interface
     path('',include('store.urls')),
     path('cart/', include('cart.urls')),
@@ -33,6 +36,7 @@ urlpatterns = [
     path('transaction/', include('transaction.urls')),
     path('coupons/', include('coupons.urls')),
     path('vendors/', include('vendors.urls')),
+    path('health/providers/', views.provider_status, name='provider_status'),
 ]
 
 # Serve static and media files in development
@@ -0,0 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .resilience import BREAKERS
+
+
+@staff_member_required
+def provider_status(request):
+    """Circuit breaker state and counters for each outbound provider."""
+    return JsonResponse({'providers': [breaker.snapshot() for breaker in BREAKERS.values()]})
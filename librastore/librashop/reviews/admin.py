@@ -6,6 +6,7 @@ from . models import Review
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ['product', 'customer', 'rating','created_at', 'is_approved']
+    list_select_related = ['product', 'customer']
     list_filter = ['is_approved', 'rating']
     list_editable = ['is_approved']
     search_fields = ['comment']
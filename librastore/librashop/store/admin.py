@@ -1,6 +1,16 @@
+import logging
+
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.models import Permission
-from . models import Customer,Order,OrderItem,Product,Category,ShippingAdderss,Wishlist,ContactMessage,ProductImage
+from django.db.models import Count, Q
+from librashop.pagination import EstimatedCountPaginator
+from librashop.search import TrigramSearchMixin
+from . models import Customer,Order,OrderItem,Product,Category,ShippingAdderss,Wishlist,ContactMessage,ProductImage,Inventory,StockReservation,FlashSale
+from .inventory import adjust_stock, resize_flash_allocation
+from . import bulk_edit, deletion, flash_sale
+
+logger = logging.getLogger(__name__)
 
 
 # Register your models here.
@@ -12,11 +22,24 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'slug']
     prepopulated_fields = {'slug': ('name',)}
     ordering = ['name']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _product_count=Count('products', filter=Q(products__deleted_at=None)),
+        )
+
+    # Deletes only hide the rows; store.deletion purges them and their products in the background
+    def delete_model(self, request, obj):
+        deletion.soft_delete_categories([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        deletion.soft_delete_categories(list(queryset.values_list('pk', flat=True)))
     
     def product_count(self, obj):
         """Display number of products in this category"""
-        return obj.products.count()
+        return obj._product_count
     product_count.short_description = 'Products'
+    product_count.admin_order_field = '_product_count'
     
     def created_at(self, obj):
         """Display when category was created"""
@@ -37,21 +60,153 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['available', 'created', 'updated']
     list_editable = ['price', 'available']
     prepopulated_fields = {'slug':('name',)}
+    search_fields = ['name']
     inlines = [ProductImageInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['make_available', 'make_unavailable']
+
+    def _set_availability(self, request, queryset, available):
+        ids = list(queryset.values_list('pk', flat=True))
+        updated = bulk_edit.set_products(ids, available=available)
+        self.message_user(request, f"{updated} product(s) marked {'available' if available else 'unavailable'}.")
+
+    @admin.action(description='Mark selected products available')
+    def make_available(self, request, queryset):
+        self._set_availability(request, queryset, True)
+
+    @admin.action(description='Mark selected products unavailable')
+    def make_unavailable(self, request, queryset):
+        self._set_availability(request, queryset, False)
+
+    def delete_model(self, request, obj):
+        deletion.soft_delete_products([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        deletion.soft_delete_products(list(queryset.values_list('pk', flat=True)))
+
+
+class InventoryAdminForm(forms.ModelForm):
+    class Meta:
+        model = Inventory
+        fields = '__all__'
+
+    def clean(self):
+        """Refuse on-hand cuts bigger than the stock that isn't reserved."""
+        cleaned_data = super().clean()
+        on_hand = cleaned_data.get('on_hand')
+        if self.instance.pk and on_hand is not None:
+            delta = on_hand - self.initial.get('on_hand', on_hand)
+            available = Inventory.objects.filter(pk=self.instance.pk).values_list('available', flat=True).first() or 0
+            if delta < 0 and available < -delta:
+                self.add_error('on_hand', f'Cannot remove more stock than is currently available ({available}).')
+        return cleaned_data
+
+
+@admin.register(Inventory)
+class InventoryAdmin(admin.ModelAdmin):
+    form = InventoryAdminForm
+    list_display = ['product', 'on_hand', 'reserved', 'available', 'updated_at']
+    list_select_related = ['product']
+    search_fields = ['product__name']
+    readonly_fields = ['reserved', 'available', 'updated_at']
+    autocomplete_fields = ['product']
+
+    def save_model(self, request, obj, form, change):
+        """Apply on-hand edits as a delta so concurrent reservations are never overwritten."""
+        if not change:
+            obj.available = obj.on_hand
+            obj.save()
+            return
+        delta = obj.on_hand - form.initial.get('on_hand', obj.on_hand)
+        if delta and not adjust_stock(obj.product_id, delta):
+            # Checkouts reserved the stock between the form's check and this update
+            logger.warning("Stock edit of %s by %s lost to concurrent reservations", obj.product_id, request.user)
+
+
+@admin.register(FlashSale)
+class FlashSaleAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'sold', 'remaining', 'max_shoppers', 'starts_at', 'ends_at', 'active']
+    list_filter = ['active']
+    list_select_related = ['product']
+    autocomplete_fields = ['product']
+    readonly_fields = ['sold', 'allocated']
+
+    def remaining(self, obj):
+        """Live count from the cache counter"""
+        return flash_sale.remaining(obj)
+    remaining.short_description = 'Remaining'
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.save()
+        else:
+            # Only the form's fields: sold and the allocation are written concurrently by store.inventory
+            obj.save(update_fields=form.changed_data)
+            obj.refresh_from_db(fields=['allocated', 'allocation_returned'])
+            delta = obj.quantity - form.initial.get('quantity', obj.quantity)
+            if delta:
+                flash_sale.resize(obj, resize_flash_allocation(obj, delta))
+        flash_sale.invalidate_live_sales()
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'status', 'flash_sale', 'cart', 'order', 'created_at', 'expires_at']
+    list_filter = ['status']
+    list_select_related = ['product', 'flash_sale__product', 'cart', 'order']
+    readonly_fields = ['product', 'cart', 'order', 'flash_sale', 'quantity', 'status', 'created_at', 'expires_at']
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'email']
     list_filter = []
     search_fields = ['name', 'email']
     ordering = ['name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['customer', 'status', 'date_odered', 'last_updated', 'get_cart_total']
+class OrderAdmin(TrigramSearchMixin, admin.ModelAdmin):
+    list_display = ['customer', 'status', 'date_odered', 'last_updated', 'item_count', 'total']
     list_filter = ['status', 'date_odered', 'last_updated']
     search_fields = ['custamer__name', 'custamer__email', 'tracking_number']
     ordering = ['-date_odered']
+    readonly_fields = ['subtotal', 'discount', 'total', 'item_count']
+    # Totals are stored columns; only the customer needs joining
+    list_select_related = ['custamer']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['mark_paid', 'mark_cancelled', 'mark_complete']
+
+    def save_model(self, request, obj, form, change):
+        """Status edits go through bulk_edit.set_order_status, which keeps the rollups and vendor counters right."""
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+        status_fields = {'status', 'complete'}
+        other_fields = [name for name in form.changed_data if name not in status_fields]
+        if other_fields:
+            obj.save(update_fields=[*other_fields, 'last_updated'])
+        if status_fields.intersection(form.changed_data):
+            bulk_edit.set_order_status([obj.pk], status=obj.status, complete=obj.complete)
+
+    def _set_status(self, request, queryset, **values):
+        ids = list(queryset.values_list('pk', flat=True))
+        updated = bulk_edit.set_order_status(ids, **values)
+        self.message_user(request, f"{updated} of {len(ids)} order(s) updated.")
+
+    @admin.action(description='Mark selected orders paid')
+    def mark_paid(self, request, queryset):
+        self._set_status(request, queryset, status='paid')
+
+    @admin.action(description='Mark selected orders cancelled')
+    def mark_cancelled(self, request, queryset):
+        self._set_status(request, queryset, status='cancelled')
+
+    @admin.action(description='Mark selected orders complete')
+    def mark_complete(self, request, queryset):
+        self._set_status(request, queryset, complete=True)
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -59,6 +214,9 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ['date_added']
     search_fields = ['order__custamer__name', 'product__name']
     ordering = ['-date_added']
+    list_select_related = ['order', 'product']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def unit_price(self, obj):
         if obj.product and hasattr(obj.product, 'price') and obj.product.price is not None:
@@ -66,11 +224,14 @@ class OrderItemAdmin(admin.ModelAdmin):
         return obj.product_price
 
 @admin.register(ShippingAdderss)
-class ShippingAdderssAdmin(admin.ModelAdmin):
+class ShippingAdderssAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ['order', 'custamer', 'address', 'city', 'state', 'zipcode', 'date_added']
     list_filter = ['date_added']
     search_fields = ['order__custamer__name', 'custamer__name', 'address', 'city', 'state', 'zipcode']
     ordering = ['-date_added']
+    list_select_related = ['order', 'custamer']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 admin.site.register(Permission)
 
@@ -79,6 +240,7 @@ class WishlistAdmin(admin.ModelAdmin):
     list_display = ['user', 'product', 'added_at']
     list_filter = ['added_at']
     search_fields = ['user__username', 'product__name']
+    list_select_related = ['user', 'product']
 
 
 @admin.register(ContactMessage)
@@ -8,6 +8,9 @@ urlpatterns = [
     # Products
     path('products/', admin_views.admin_products_list, name='admin_products_list'),
     path('products/add/', admin_views.admin_product_add, name='admin_product_add'),
+    path('products/bulk-edit/', admin_views.admin_products_bulk_edit, name='admin_products_bulk_edit'),
+    path('products/bulk-edit/<str:job_id>/', admin_views.admin_bulk_edit_status, name='admin_bulk_edit_status'),
+    path('products/bulk-edit/<str:job_id>/progress/', admin_views.admin_bulk_edit_progress, name='admin_bulk_edit_progress'),
     path('products/<int:product_id>/edit/', admin_views.admin_product_edit, name='admin_product_edit'),
     path('products/<int:product_id>/delete/', admin_views.admin_product_delete, name='admin_product_delete'),
     
@@ -18,6 +21,7 @@ urlpatterns = [
     
     # Customers
     path('customers/', admin_views.admin_customers_list, name='admin_customers_list'),
+    path('customers/insights/', admin_views.admin_customer_insights, name='admin_customer_insights'),
     path('customers/<int:customer_id>/', admin_views.admin_customer_detail, name='admin_customer_detail'),
     
     # Coupons
@@ -2,20 +2,30 @@
 Custom Admin Views - Replicate Django admin functionality with custom interface
 """
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.db.models import Q, Sum, Count
-from django.core.paginator import Paginator
+from django.db.models.functions import Coalesce
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
 from django.utils.text import slugify
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date
+import time
 
-from .models import Product, Category, Order, OrderItem, Customer, ShippingAdderss
+from .models import (
+    Product, Category, Order, OrderItem, Customer, ShippingAdderss, DailySales, DailyOrderStats,
+    CustomerRFM, CohortRetention,
+)
 from .forms import ShippingAdderssForm
-from coupons.models import Coupon, OrderCoupon
+from librashop.pagination import paginate_list
+from librashop.reporting import DAY, day_window, time_series
+from librashop.search import search
+from librashop.swr import get_or_refresh
+from . import bulk_edit, deletion, sales_cube
+from coupons.models import Coupon
 
 
 # ============= REDIRECT TO DJANGO ADMIN =============
@@ -31,13 +41,28 @@ def admin_redirect(request, subpath: str = ""):
 
 # ============= PRODUCT MANAGEMENT =============
 
+# Keyset orderings (each ends with the primary key) and the columns each list template shows
+PRODUCT_LIST_ORDERING = ('-created', '-id')
+PRODUCT_LIST_FIELDS = (
+    'id', 'name', 'price', 'image', 'created', 'category__name',
+    'forecast__daily_units', 'forecast__days_of_cover', 'forecast__needs_restock', 'forecast__restock_units',
+)
+CUSTOMER_LIST_ORDERING = ('-id',)
+CUSTOMER_LIST_FIELDS = (
+    'id', 'name', 'email',
+    'rfm__segment', 'rfm__r_score', 'rfm__f_score', 'rfm__m_score', 'rfm__frequency', 'rfm__monetary',
+)
+COUPON_LIST_ORDERING = ('-valid_from', '-id')
+COUPON_LIST_FIELDS = ('id', 'code', 'active', 'discount_type', 'value', 'valid_from', 'valid_to')
+
 @staff_member_required
 def admin_products_list(request):
     """List all products with search and pagination"""
     query = request.GET.get('q', '')
     category_filter = request.GET.get('category', '')
+    restock_only = request.GET.get('restock') == '1'
     
-    products = Product.objects.all().order_by('-created')
+    products = Product.objects.select_related('category', 'forecast').only(*PRODUCT_LIST_FIELDS)
     
     if query:
         products = products.filter(
@@ -47,24 +72,71 @@ def admin_products_list(request):
     
     if category_filter:
         products = products.filter(category_id=category_filter)
+
+    if restock_only:
+        products = products.filter(forecast__needs_restock=True)
     
-    # Pagination
-    paginator = Paginator(products, 20)
-    page = request.GET.get('page', 1)
-    products_page = paginator.get_page(page)
+    page = paginate_list(request, products, PRODUCT_LIST_ORDERING)
     
-    categories = Category.objects.all()
+    categories = Category.objects.only('id', 'name')
     
     context = {
-        'products': products_page,
+        'products': page,
+        'page': page,
         'categories': categories,
         'query': query,
         'category_filter': category_filter,
-        'total_count': products.count(),
+        'restock_only': restock_only,
     }
     return render(request, 'custom_admin/products_list.html', context)
 
 
+@csrf_protect
+@staff_member_required
+def admin_products_bulk_edit(request):
+    """Upload a CSV of price/availability changes; valid files are applied in the background"""
+    errors = []
+    if request.method == 'POST':
+        upload = request.FILES.get('csv_file')
+        if not upload:
+            messages.error(request, 'Choose a CSV file to upload.')
+        else:
+            changes, errors = bulk_edit.read_product_csv(upload)
+            if not errors and not changes:
+                messages.warning(request, 'The file has no changes to apply.')
+            elif not errors:
+                job_id = bulk_edit.start_job(
+                    f'{upload.name}: {len(changes)} products',
+                    lambda progress: bulk_edit.update_products(changes, progress),
+                )
+                return redirect('admin_bulk_edit_status', job_id=job_id)
+
+    context = {
+        'errors': errors,
+        'fields': bulk_edit.PRODUCT_CSV_FIELDS,
+        'max_errors': bulk_edit.MAX_ERRORS,
+    }
+    return render(request, 'custom_admin/product_bulk_edit.html', context)
+
+
+@staff_member_required
+def admin_bulk_edit_status(request, job_id):
+    """Progress page for a bulk edit; polls admin_bulk_edit_progress"""
+    job = bulk_edit.job_status(job_id)
+    if job is None:
+        messages.error(request, 'That bulk edit has expired or never existed.')
+        return redirect('admin_products_bulk_edit')
+    return render(request, 'custom_admin/bulk_edit_status.html', {'job': job, 'job_id': job_id})
+
+
+@staff_member_required
+def admin_bulk_edit_progress(request, job_id):
+    job = bulk_edit.job_status(job_id)
+    if job is None:
+        return JsonResponse({'error': 'Unknown job'}, status=404)
+    return JsonResponse(job)
+
+
 @csrf_protect
 @staff_member_required
 def admin_product_add(request):
@@ -130,9 +202,8 @@ def admin_product_edit(request, product_id):
 def admin_product_delete(request, product_id):
     """Delete product"""
     product = get_object_or_404(Product, id=product_id)
-    product_name = product.name
-    product.delete()
-    messages.success(request, f'Product "{product_name}" deleted successfully!')
+    deletion.soft_delete_products([product.id])
+    messages.success(request, f'Product "{product.name}" deleted; its related records are removed in the background.')
     return redirect('admin_products_list')
 
 
@@ -177,9 +248,8 @@ def admin_order_update_status(request, order_id):
         status = request.POST.get('status')
         complete = request.POST.get('complete') == 'on'
         
-        order.status = status
-        order.complete = complete
-        order.save()
+        # Same path as the bulk actions: notifies the owner and repairs the sales rollups
+        bulk_edit.set_order_status([order.id], status=status, complete=complete)
         
         messages.success(request, f'Order #{order.id} status updated!')
         return redirect('admin_order_detail', order_id=order.id)
@@ -193,28 +263,58 @@ def admin_order_update_status(request, order_id):
 def admin_customers_list(request):
     """List all customers"""
     query = request.GET.get('q', '')
+    segment = request.GET.get('segment', '')
     
-    customers = Customer.objects.all().order_by('-id')
+    customers = Customer.objects.select_related('rfm').only(*CUSTOMER_LIST_FIELDS)
     
     if query:
-        customers = customers.filter(
-            Q(name__icontains=query) |
-            Q(email__icontains=query)
-        )
+        customers = search(customers, ['name', 'email'], query)
+    if segment:
+        customers = customers.filter(rfm__segment=segment)
     
-    # Pagination
-    paginator = Paginator(customers, 20)
-    page = request.GET.get('page', 1)
-    customers_page = paginator.get_page(page)
+    page = paginate_list(request, customers, CUSTOMER_LIST_ORDERING)
     
     context = {
-        'customers': customers_page,
+        'customers': page,
+        'page': page,
         'query': query,
-        'total_count': customers.count(),
+        'segment': segment,
+        'segments': CustomerRFM.SEGMENT_CHOICES,
     }
     return render(request, 'custom_admin/customers_list.html', context)
 
 
+@staff_member_required
+def admin_customer_insights(request):
+    """RFM segment sizes and the monthly cohort retention matrix (built by build_customer_analytics)"""
+    labels = dict(CustomerRFM.SEGMENT_CHOICES)
+    counts = dict(
+        CustomerRFM.objects.values_list('segment').annotate(n=Count('id')).order_by()
+    )
+    segments = [
+        {'code': code, 'label': labels[code], 'count': counts.get(code, 0)}
+        for code, _ in CustomerRFM.SEGMENT_CHOICES
+    ]
+
+    # Pivot (cohort, months_since) cells into one row per cohort
+    cells = CohortRetention.objects.order_by('cohort', 'months_since')
+    width = max((cell.months_since for cell in cells), default=-1) + 1
+    cohorts = {}
+    for cell in cells:
+        row = cohorts.setdefault(cell.cohort, {'cohort': cell.cohort, 'size': cell.cohort_size, 'rates': [None] * width})
+        row['rates'][cell.months_since] = {'percent': round(cell.rate * 100), 'shade': round(0.15 + 0.85 * cell.rate, 2)}
+
+    computed_at = CustomerRFM.objects.order_by('-computed_at').values_list('computed_at', flat=True).first()
+    context = {
+        'segments': segments,
+        'scored_count': sum(counts.values()),
+        'cohorts': list(cohorts.values()),
+        'months': range(width),
+        'computed_at': computed_at,
+    }
+    return render(request, 'custom_admin/customer_insights.html', context)
+
+
 @staff_member_required
 def admin_customer_detail(request, customer_id):
     """View customer details and orders"""
@@ -226,6 +326,7 @@ def admin_customer_detail(request, customer_id):
         'orders': orders,
         'total_orders': orders.count(),
         'completed_orders': orders.filter(complete=True).count(),
+        'rfm': CustomerRFM.objects.filter(customer=customer).first(),
     }
     return render(request, 'custom_admin/customer_detail.html', context)
 
@@ -237,17 +338,14 @@ def admin_coupons_list(request):
     """List all coupons"""
     from django.utils import timezone
     
-    coupons = Coupon.objects.all().order_by('-valid_from')
+    coupons = Coupon.objects.only(*COUPON_LIST_FIELDS)
     now = timezone.now()
     
-    # Pagination
-    paginator = Paginator(coupons, 20)
-    page = request.GET.get('page', 1)
-    coupons_page = paginator.get_page(page)
+    page = paginate_list(request, coupons, COUPON_LIST_ORDERING)
     
     context = {
-        'coupons': coupons_page,
-        'total_count': coupons.count(),
+        'coupons': page,
+        'page': page,
         'now': now,
     }
     return render(request, 'custom_admin/coupons_list.html', context)
@@ -398,125 +496,154 @@ def admin_category_edit(request, category_id):
 def admin_category_delete(request, category_id):
     """Delete category"""
     category = get_object_or_404(Category, id=category_id)
-    category_name = category.name
-    category.delete()
-    messages.success(request, f'Category "{category_name}" deleted successfully!')
+    deletion.soft_delete_categories([category.id])
+    messages.success(request, f'Category "{category.name}" deleted; its products are removed in the background.')
     return redirect('admin_categories_list')
 
 
 # ============= DASHBOARD (GRAPHICAL) =============
 
-@staff_member_required
-def admin_dashboard(request):
-    """Overview dashboard with key KPIs and charts."""
-    now = timezone.now()
-    start_date = now - timedelta(days=6)
-
-    # Orders per day (last 7 days)
-    orders_qs = (
-        Order.objects.filter(date_odered__date__gte=start_date.date())
-        .extra(select={'day': "date(date_odered)"})
-        .values('day')
-        .annotate(count=Count('id'))
-        .order_by('day')
-    )
-    orders_labels = [str(item['day']) for item in orders_qs]
-    orders_counts = [item['count'] for item in orders_qs]
-
-    # Revenue per day (paid orders only)
-    paid_orders = Order.objects.filter(date_odered__date__gte=start_date.date(), status='paid')
-    # compute revenue in Python to respect line_total helper safely
-    revenue_map = {}
-    for o in paid_orders:
-        d = o.date_odered.date()
-        revenue_map[d] = revenue_map.get(d, 0) + float(o.get_cart_total or 0)
-    revenue_labels = [str(d) for d in sorted(revenue_map.keys())]
-    revenue_values = [revenue_map[d] for d in sorted(revenue_map.keys())]
+DASHBOARD_CACHE_KEY = 'admin-dashboard:charts'
+DASHBOARD_FRESH_SECONDS = 60
+DASHBOARD_STALE_SECONDS = 600
+
+
+def dashboard_chart_data():
+    """Chart series and KPI figures for the dashboard (cached by admin_dashboard_data)."""
+    start, end = day_window(7)
+
+    # Orders per day (last 7 days), empty days included
+    orders_series = time_series(Order.objects.all(), 'date_odered', DAY, start, end, count=Count('id'))
+
+    # Revenue per day (paid orders only), from the daily rollups
+    revenue_series = time_series(DailyOrderStats.objects.all(), 'day', DAY, start, end, revenue=Sum('total'))
+    revenue_values = [float(item['revenue']) for item in revenue_series]
 
     # Top categories by product count
     top_categories_qs = (
         Category.objects.annotate(pcount=Count('products')).order_by('-pcount')[:5]
     )
-    top_cat_labels = [c.name for c in top_categories_qs]    
-    top_cat_counts = [c.pcount or 0 for c in top_categories_qs]
 
     # Order status breakdown
     status_map = dict(list(Order._meta.get_field('status').choices or []))
     status_counts_qs = (
         Order.objects.values('status').annotate(cnt=Count('id')).order_by()
     )
-    status_labels = [status_map.get(item['status'], item['status']) for item in status_counts_qs]
-    status_counts = [item['cnt'] for item in status_counts_qs]
 
-    # Coupon usage (requires OrderCoupon)
+    # Coupon usage (paid orders)
     coupon_usage_qs = (
-        OrderCoupon.objects.values('coupon__code').annotate(cnt=Count('id')).order_by('-cnt')[:7]
+        DailyOrderStats.objects.exclude(coupon=None)
+        .values('coupon__code').annotate(cnt=Sum('orders')).order_by('-cnt')[:7]
     )
-    coupon_labels = [item['coupon__code'] or 'N/A' for item in coupon_usage_qs]
-    coupon_counts = [item['cnt'] for item in coupon_usage_qs]
-        
-    # Top products by quantity (OrderItem)
+
+    # Top products by quantity
     top_products_qs = (
-        OrderItem.objects.values('product_name').annotate(qty=Sum('quantity')).order_by('-qty')[:7]
+        DailySales.objects.exclude(product=None)
+        .values('product__name').annotate(qty=Sum('units')).order_by('-qty')[:7]
     )
-    top_prod_labels = [item['product_name'] or 'Unknown' for item in top_products_qs]
-    top_prod_counts = [int(item['qty'] or 0) for item in top_products_qs]
 
+    status_counts = {item['status']: item['cnt'] for item in status_counts_qs}
+    return {
+        'orders_labels': [str(item['bucket']) for item in orders_series],
+        'orders_counts': [item['count'] for item in orders_series],
+        'revenue_labels': [str(item['bucket']) for item in revenue_series],
+        'revenue_values': revenue_values,
+        'top_cat_labels': [c.name for c in top_categories_qs],
+        'top_cat_counts': [c.pcount or 0 for c in top_categories_qs],
+        'status_labels': [status_map.get(status, status) for status in status_counts],
+        'status_counts': list(status_counts.values()),
+        'coupon_labels': [item['coupon__code'] or 'N/A' for item in coupon_usage_qs],
+        'coupon_counts': [item['cnt'] for item in coupon_usage_qs],
+        'top_prod_labels': [item['product__name'] or 'Unknown' for item in top_products_qs],
+        'top_prod_counts': [int(item['qty'] or 0) for item in top_products_qs],
+        'kpis': {
+            'total_products': Product.objects.count(),
+            'total_orders': sum(status_counts.values()),
+            'paid_orders': status_counts.get('paid', 0),
+            'total_customers': Customer.objects.count(),
+            'total_revenue': sum(revenue_values),
+        },
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+@staff_member_required
+def admin_dashboard(request):
+    """Dashboard page shell; charts and KPIs are loaded from admin_dashboard_data."""
     # Top selling products (for template list)
     top_products_list = (
-        OrderItem.objects.values('product__name')
-        .annotate(total_sold=Sum('quantity'))
+        DailySales.objects.exclude(product=None)
+        .values('product__name')
+        .annotate(total_sold=Sum('units'))
         .order_by('-total_sold')[:10]
     )
 
     # Low selling products (ascending by sold qty) as list of (id, {name, sold})
     low_sales_qs = (
-        OrderItem.objects.values('product_id', 'product__name')
-        .annotate(sold=Sum('quantity'))
-        .order_by('sold')[:10]
+        Product.objects.annotate(sold=Coalesce(Sum('daily_sales__units'), 0))
+        .values('id', 'name', 'sold')
+        .order_by('sold', 'id')[:10]
     )
-    low_selling = []
-    for row in low_sales_qs:
-        pid = row.get('product_id')
-        low_selling.append((pid, {
-            'name': row.get('product__name') or 'Unknown',
-            'sold': int(row.get('sold') or 0),
-        }))
-
-    # KPI aliases used by admin_dashboard.html
-    total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    total_customers = Customer.objects.count()
-    total_revenue = sum(revenue_values) if revenue_values else 0
+    low_selling = [(row['id'], {'name': row['name'], 'sold': row['sold']}) for row in low_sales_qs]
 
     context = {
-        'kpi_total_products': total_products,
-        'kpi_total_orders': total_orders,
-        'kpi_paid_orders': Order.objects.filter(status='paid').count(),
-        'kpi_customers': total_customers,
-
-        # Aliases matching template variables
-        'total_products': total_products,
-        'total_orders': total_orders,
-        'total_customers': total_customers,
-        'total_revenue': total_revenue,
-
-        # Lists for template sections
         'top_products': top_products_list,
         'low_selling': low_selling,
-
-        'orders_labels': orders_labels,
-        'orders_counts': orders_counts,
-        'revenue_labels': revenue_labels,
-        'revenue_values': revenue_values,
-        'top_cat_labels': top_cat_labels,
-        'top_cat_counts': top_cat_counts,
-
-        'status_labels': status_labels,
-        'status_counts': status_counts,
-        'coupon_labels': coupon_labels,
-        'coupon_counts': coupon_counts,
-        'top_prod_labels': top_prod_labels,
-        'top_prod_counts': top_prod_counts,
     }
     return render(request, 'admin_dashboard.html', context)
+
+
+@staff_member_required
+def admin_dashboard_data(request):
+    """Dashboard charts as JSON: cached, served stale while one worker refreshes."""
+    data, stale = get_or_refresh(
+        DASHBOARD_CACHE_KEY, dashboard_chart_data, DASHBOARD_FRESH_SECONDS, DASHBOARD_STALE_SECONDS,
+    )
+    response = JsonResponse({**data, 'stale': stale})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _id_list(value):
+    return [int(part) for part in value.split(',') if part.strip().isdigit()] if value else None
+
+
+@staff_member_required
+def admin_sales_cube(request):
+    """Ad-hoc sales slices from the in-memory cube.
+
+    ``?group_by=category|vendor|coupon|product|day|month&start=YYYY-MM-DD&end=YYYY-MM-DD``
+    plus optional comma-separated id filters ``category``, ``vendor``, ``coupon``
+    and ``product``. ``end`` is exclusive.
+    """
+    group_by = request.GET.get('group_by', 'category')
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            bounds[name] = parse_date(value) if value else None
+        except ValueError:
+            bounds[name] = None
+        if value and bounds[name] is None:
+            return JsonResponse({'error': f'{name} must be a date (YYYY-MM-DD)'}, status=400)
+    start, end = bounds['start'], bounds['end']
+    filters = {name: _id_list(request.GET.get(name)) for name in sales_cube.DIMENSIONS}
+
+    started = time.perf_counter()
+    sales_cube.cube.refresh()
+    try:
+        rows = sales_cube.cube.query(group_by, start, end, **filters)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    labels = sales_cube.cube.labels(group_by, [key for key, _, _, _ in rows])
+    return JsonResponse({
+        'group_by': group_by,
+        'rows': [
+            {'key': str(key) if key is not None else None, 'label': labels[key], 'units': units,
+             'revenue': paise / 100, 'orders': orders}
+            for key, units, paise, orders in rows
+        ],
+        'facts': len(sales_cube.cube.facts),
+        'elapsed_ms': round(elapsed_ms, 2),
+    })
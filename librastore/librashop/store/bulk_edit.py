@@ -0,0 +1,281 @@
+"""
+Bulk edits for products and orders.
+
+Changes are written with ``bulk_update`` in chunks of CHUNK_SIZE rows, each
+chunk in its own transaction, and ``progress(done, total)`` is called after
+every chunk. ``bulk_update`` skips ``save()`` and signals, so an edit ends
+with a single catalog version bump (products), or one round of order-state
+invalidation plus a rollup repair of the days touched (orders), instead of
+one per row.
+
+CSV edits from the custom admin run in a background thread (``start_job``)
+with their progress in the cache, for the status page to poll.
+"""
+import csv
+import io
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from vendors import stats as vendor_stats
+
+from . import rollups
+from .catalog import bump_catalog_version, bump_storefronts_version
+from .models import Order, Product
+from .order_events import publish_order_change
+from .order_state import forget_versions
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+JOB_TTL = 3600
+MAX_ERRORS = 50
+PRODUCT_CSV_FIELDS = ('price', 'available')
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+def write_in_chunks(model, objs, fields, chunk_size=CHUNK_SIZE):
+    """``bulk_update`` ``objs`` one transaction per chunk; yields the size of each chunk written."""
+    for start in range(0, len(objs), chunk_size):
+        chunk = objs[start:start + chunk_size]
+        with transaction.atomic():
+            model.objects.bulk_update(chunk, fields)
+        yield len(chunk)
+
+
+def _noop(done, total):
+    pass
+
+
+# ---- Products ----
+
+def update_products(changes, progress=None):
+    """Write ``{product_id: {field: value}}`` and bump the catalog version once; returns rows written."""
+    progress = progress or _noop
+    now = timezone.now()
+    # bulk_update sets the same columns on every row, so group products by which fields change
+    groups = defaultdict(list)
+    for pk, values in changes.items():
+        groups[tuple(sorted(values))].append(Product(pk=pk, updated=now, feed_hash='', **values))
+    total, done = len(changes), 0
+    progress(done, total)
+    try:
+        for fields, objs in groups.items():
+            # A blank feed_hash makes the next vendor feed sync rewrite the product
+            for written in write_in_chunks(Product, objs, [*fields, 'updated', 'feed_hash']):
+                done += written
+                progress(done, total)
+    finally:
+        # Chunks already committed are live even if a later one failed
+        if done:
+            bump_catalog_version()
+            bump_storefronts_version()
+    return done
+
+
+def set_products(product_ids, progress=None, **values):
+    """Set the same field values on every product in ``product_ids``."""
+    return update_products({pk: values for pk in product_ids}, progress)
+
+
+def _parse_price(raw):
+    try:
+        price = Decimal(raw)
+    except InvalidOperation:
+        raise ValueError(f"price {raw!r} is not a number")
+    if price < 0 or price != price.quantize(Decimal('0.01')):
+        raise ValueError(f"price {raw!r} must be positive with at most 2 decimals")
+    return price
+
+
+def _parse_available(raw):
+    value = raw.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"available {raw!r} must be yes/no, true/false or 1/0")
+
+
+PARSERS = {'price': _parse_price, 'available': _parse_available}
+
+
+def _resolve(pending, changes, errors):
+    """Move parsed rows into ``changes`` keyed by product id, with one query per kind of identifier."""
+    ids = {int(identifier) for kind, identifier, _, _ in pending if kind == 'id'}
+    slugs = {identifier for kind, identifier, _, _ in pending if kind == 'slug'}
+    known_ids = set(Product.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    by_slug = defaultdict(list)
+    for slug, pk in Product.objects.filter(slug__in=slugs).values_list('slug', 'pk'):
+        by_slug[slug].append(pk)
+    for kind, identifier, line, values in pending:
+        if kind == 'id':
+            pk = int(identifier) if int(identifier) in known_ids else None
+        else:
+            matches = by_slug.get(identifier, [])
+            if len(matches) > 1:
+                errors.append((line, f"slug {identifier!r} matches {len(matches)} products; use the id column"))
+                continue
+            pk = matches[0] if matches else None
+        if pk is None:
+            errors.append((line, f"no product with {kind} {identifier!r}"))
+        else:
+            changes.setdefault(pk, {}).update(values)
+
+
+def read_product_csv(file):
+    """Validate an uploaded CSV of product changes, reading it one row at a time.
+
+    Columns: ``id`` or ``slug`` to pick the product, and any of ``price`` and
+    ``available``; empty cells leave the field unchanged. Returns
+    ``(changes, errors)``: ``{product_id: {field: value}}`` and up to
+    MAX_ERRORS ``(line, message)`` pairs.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        header = [name.strip().lower() for name in reader.fieldnames or []]
+    except (UnicodeDecodeError, csv.Error) as exc:
+        return {}, [(1, f"unreadable CSV: {exc}")]
+    reader.fieldnames = header
+    key = 'id' if 'id' in header else 'slug' if 'slug' in header else None
+    fields = [name for name in PRODUCT_CSV_FIELDS if name in header]
+    if key is None or not fields:
+        return {}, [(1, f"header needs an id or slug column and at least one of: {', '.join(PRODUCT_CSV_FIELDS)}")]
+
+    changes, errors, pending = {}, [], []
+    try:
+        for row in reader:
+            if len(errors) >= MAX_ERRORS:
+                break
+            line = reader.line_num
+            identifier = (row.get(key) or '').strip()
+            if not identifier:
+                errors.append((line, f"missing {key}"))
+                continue
+            if key == 'id' and not identifier.isdigit():
+                errors.append((line, f"id {identifier!r} is not a number"))
+                continue
+            values = {}
+            for name in fields:
+                raw = (row.get(name) or '').strip()
+                if not raw:
+                    continue
+                try:
+                    values[name] = PARSERS[name](raw)
+                except ValueError as exc:
+                    errors.append((line, str(exc)))
+            if values:
+                pending.append((key, identifier, line, values))
+            if len(pending) >= CHUNK_SIZE:
+                _resolve(pending, changes, errors)
+                pending = []
+    except (UnicodeDecodeError, csv.Error) as exc:
+        errors.append((reader.line_num, f"unreadable CSV: {exc}"))
+    _resolve(pending, changes, errors)
+    return changes, sorted(errors)[:MAX_ERRORS]
+
+
+# ---- Orders ----
+
+def _day_runs(days):
+    """Consecutive runs of ``days`` as half-open (start, end) ranges."""
+    runs = []
+    for day in sorted(days):
+        if runs and runs[-1][1] == day:
+            runs[-1][1] = day + timedelta(days=1)
+        else:
+            runs.append([day, day + timedelta(days=1)])
+    return runs
+
+
+def set_order_status(order_ids, status=None, complete=None, progress=None):
+    """Set ``status`` and/or ``complete`` on the given orders; returns how many changed.
+
+    Owners' order-state versions are forgotten and their open streams notified
+    per chunk. For orders that moved into or out of the paid status, the
+    sales rollups are rebuilt for their days and their vendors' counters
+    adjusted.
+    """
+    progress = progress or _noop
+    now = timezone.now()
+    rows = Order.objects.filter(pk__in=order_ids).values(
+        'id', 'status', 'complete', 'date_odered', 'custamer__user_id',
+        'carrier', 'tracking_number', 'tracking_stage', 'shipped_at', 'delivered_at',
+    )
+    changed, sales_days, now_paid, no_longer_paid = [], set(), [], []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        new_status = status if status is not None else row['status']
+        new_complete = complete if complete is not None else row['complete']
+        if (new_status, new_complete) == (row['status'], row['complete']):
+            continue
+        if rollups.SALES_STATUS in (row['status'], new_status) and row['status'] != new_status:
+            sales_days.add(timezone.localdate(row['date_odered']))
+            (now_paid if new_status == rollups.SALES_STATUS else no_longer_paid).append(row['id'])
+        order = Order(
+            id=row['id'], status=new_status, complete=new_complete, last_updated=now,
+            carrier=row['carrier'], tracking_number=row['tracking_number'], tracking_stage=row['tracking_stage'],
+            shipped_at=row['shipped_at'], delivered_at=row['delivered_at'],
+        )
+        changed.append((row['custamer__user_id'], order))
+
+    total, done = len(changed), 0
+    progress(done, total)
+    for start in range(0, total, CHUNK_SIZE):
+        chunk = changed[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            Order.objects.bulk_update([order for _, order in chunk], ['status', 'complete', 'last_updated'])
+            user_ids = [user_id for user_id, _ in chunk]
+            transaction.on_commit(lambda user_ids=user_ids: forget_versions(user_ids))
+            for user_id, order in chunk:
+                publish_order_change(user_id, order)
+        done += len(chunk)
+        progress(done, total)
+
+    for start, end in _day_runs(sales_days):
+        rollups.rebuild(start, end)
+    vendor_stats.order_status_changed(now_paid, no_longer_paid)
+    return total
+
+
+# ---- Background jobs ----
+
+def _job_key(job_id):
+    return f"bulk-edit:job:{job_id}"
+
+
+def job_status(job_id):
+    """``{'label', 'state', 'done', 'total', 'result', 'error'}`` for a job, or None once expired."""
+    return cache.get(_job_key(job_id))
+
+
+def start_job(label, run):
+    """Run ``run(progress)`` in a background thread; returns the job id for ``job_status``."""
+    job_id = uuid.uuid4().hex
+    job = {'label': label, 'state': 'running', 'done': 0, 'total': None, 'result': None, 'error': None}
+    cache.set(_job_key(job_id), job, JOB_TTL)
+
+    def progress(done, total):
+        job.update(done=done, total=total)
+        cache.set(_job_key(job_id), job, JOB_TTL)
+
+    def work():
+        close_old_connections()
+        try:
+            job.update(state='done', result=run(progress))
+        except Exception as exc:
+            logger.exception("Bulk edit %s (%s) failed", job_id, label)
+            job.update(state='failed', error=str(exc))
+        finally:
+            cache.set(_job_key(job_id), job, JOB_TTL)
+            connections.close_all()
+
+    threading.Thread(target=work, name=f"bulk-edit-{job_id[:8]}", daemon=True).start()
+    return job_id
@@ -0,0 +1,57 @@
+"""
+Local stand-in for carrier tracking APIs.
+
+Serves the ``HTTPTrackingAdapter`` JSON protocol on ``/track/<number>`` so
+the sync can be exercised without real carriers (point the ``default``
+adapter's url at it). Every tracking number walks through the same event
+sequence, one step every ``step_seconds`` from server start, offset by a
+hash of the number so shipments are spread across stages. Numbers starting
+with ``LOST`` answer 404.
+"""
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+EVENT_SEQUENCE = ['label_created', 'picked_up', 'in_transit', 'out_for_delivery', 'delivered']
+
+
+def events_for(tracking_number, started, now, step_seconds):
+    # Each number "shipped" up to len(EVENT_SEQUENCE) - 1 steps before the server started
+    offset = zlib.crc32(tracking_number.encode()) % len(EVENT_SEQUENCE)
+    origin = started - timedelta(seconds=offset * step_seconds)
+    steps = min(len(EVENT_SEQUENCE), 1 + int((now - origin).total_seconds() // step_seconds))
+    return [
+        {'code': code, 'time': (origin + timedelta(seconds=i * step_seconds)).isoformat()}
+        for i, code in enumerate(EVENT_SEQUENCE[:steps])
+    ]
+
+
+def make_server(host='127.0.0.1', port=8765, step_seconds=60):
+    started = datetime.now(timezone.utc)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            prefix = '/track/'
+            number = unquote(self.path[len(prefix):]) if self.path.startswith(prefix) else ''
+            if not number or number.startswith('LOST'):
+                self._reply(404, {'error': 'unknown tracking number'})
+                return
+            events = events_for(number, started, datetime.now(timezone.utc), step_seconds)
+            self._reply(200, {'tracking_number': number, 'events': events})
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
@@ -0,0 +1,121 @@
+"""
+Carrier tracking sync.
+
+Open shipments (an order with a carrier and tracking number that is not yet
+delivered or cancelled) are read in primary-key chunks. Each chunk is polled
+concurrently on an event loop, bounded by a global semaphore and each
+carrier's rate limit, and the orders that moved forward are written back with
+one ``bulk_update`` per chunk.
+
+``bulk_update`` skips ``auto_now`` and signals, so ``last_updated`` is set
+here and the owners' order-status versions and event streams are updated by
+hand.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .carriers import CarrierError, adapter_for, load_adapters
+from .models import Order
+from .order_events import publish_order_change
+from .order_state import forget_versions
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STAGES = ('delivered', 'cancelled')
+# Forward order of the stages a carrier can move an order through
+STAGE_RANK = {stage: rank for rank, (stage, _) in enumerate(Order.TRACKING_STAGE_CHOICES) if stage != 'cancelled'}
+SHIPMENT_FIELDS = (
+    'id', 'status', 'carrier', 'tracking_number', 'tracking_stage',
+    'shipped_at', 'delivered_at', 'custamer__user_id',
+)
+UPDATE_FIELDS = ['tracking_stage', 'shipped_at', 'delivered_at', 'last_updated']
+
+
+def open_shipments():
+    return (
+        Order.objects.exclude(tracking_stage__in=CLOSED_STAGES)
+        .exclude(Q(carrier__isnull=True) | Q(carrier=''))
+        .exclude(Q(tracking_number__isnull=True) | Q(tracking_number=''))
+    )
+
+
+class CarrierSync:
+    def __init__(self, adapters=None, max_concurrent=None, batch_size=None):
+        config = getattr(settings, 'CARRIER_SYNC', {})
+        self.adapters = adapters if adapters is not None else load_adapters()
+        self.max_concurrent = max_concurrent or config.get('max_concurrent', 50)
+        self.batch_size = batch_size or config.get('batch_size', 500)
+
+    def run(self, orders=None):
+        """Sync every open shipment in ``orders`` (default: all); returns counts."""
+        shipments = (orders if orders is not None else open_shipments()).order_by('pk')
+        stats = {'polled': 0, 'updated': 0, 'failed': 0}
+        last_pk = 0
+        while True:
+            chunk = list(shipments.filter(pk__gt=last_pk).values(*SHIPMENT_FIELDS)[:self.batch_size])
+            if not chunk:
+                return stats
+            last_pk = chunk[-1]['id']
+            results = asyncio.run(self._poll(chunk))
+            stats['polled'] += len(chunk)
+            stats['failed'] += sum(1 for result in results if result is None)
+            stats['updated'] += self._apply(chunk, results)
+
+    async def _poll(self, shipments):
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def poll(shipment):
+            adapter = adapter_for(self.adapters, shipment['carrier'])
+            if adapter is None:
+                return None
+            async with semaphore:
+                try:
+                    return await adapter.track(shipment['tracking_number'])
+                except CarrierError as exc:
+                    logger.warning("Tracking order %s failed: %s", shipment['id'], exc)
+                    return None
+
+        return await asyncio.gather(*(poll(shipment) for shipment in shipments))
+
+    def _apply(self, shipments, results):
+        now = timezone.now()
+        changed = []
+        for shipment, update in zip(shipments, results):
+            order = self._advance(shipment, update, now)
+            if order is not None:
+                changed.append((shipment['custamer__user_id'], order))
+        if not changed:
+            return 0
+        with transaction.atomic():
+            Order.objects.bulk_update([order for _, order in changed], UPDATE_FIELDS, batch_size=self.batch_size)
+            user_ids = [user_id for user_id, _ in changed]
+            transaction.on_commit(lambda: forget_versions(user_ids))
+            for user_id, order in changed:
+                publish_order_change(user_id, order)
+        return len(changed)
+
+    def _advance(self, shipment, update, now):
+        """The order with its new tracking fields, or None if nothing moved forward."""
+        if update is None or update.stage is None:
+            return None
+        current = shipment['tracking_stage']
+        rank = STAGE_RANK.get(update.stage)
+        if rank is None:
+            # A stage this code doesn't know yet; keep the order's own and still take the times
+            logger.warning("Order %s: unknown tracking stage %r", shipment['id'], update.stage)
+            rank = -1
+        stage = update.stage if rank > STAGE_RANK.get(current, 0) else current
+        shipped_at = shipment['shipped_at'] or update.shipped_at
+        delivered_at = shipment['delivered_at'] or update.delivered_at
+        if (stage, shipped_at, delivered_at) == (current, shipment['shipped_at'], shipment['delivered_at']):
+            return None
+        return Order(
+            id=shipment['id'], status=shipment['status'], carrier=shipment['carrier'],
+            tracking_number=shipment['tracking_number'], tracking_stage=stage,
+            shipped_at=shipped_at, delivered_at=delivered_at, last_updated=now,
+        )
@@ -0,0 +1,170 @@
+"""
+Carrier tracking adapters.
+
+An adapter turns a tracking number into a ``TrackingUpdate``: the order's
+tracking stage (one of ``Order.TRACKING_STAGE_CHOICES``) plus when the parcel
+shipped and was delivered. Adapters are configured per carrier in
+``settings.CARRIER_ADAPTERS``, keyed by the lower-cased ``Order.carrier``,
+with a ``default`` entry for carriers that have none of their own.
+
+``HTTPTrackingAdapter`` speaks a plain JSON protocol::
+
+    GET <url with {tracking_number}>
+    {"events": [{"code": "picked_up", "time": "2026-01-02T10:00:00Z"}, ...]}
+
+which is what ``store.carrier_standin`` serves locally. Carriers with a
+different API subclass it and override ``parse`` (and ``EVENT_STAGES``).
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+DEFAULT_ADAPTER = 'store.carriers.HTTPTrackingAdapter'
+
+
+class CarrierError(Exception):
+    """Raised when a carrier can't report on a shipment (HTTP error, bad payload, unknown number)."""
+
+
+@dataclass
+class TrackingUpdate:
+    stage: str
+    shipped_at: datetime = None
+    delivered_at: datetime = None
+
+
+class RateLimiter:
+    """Spaces calls at most ``rate_per_second`` apart on one event loop.
+
+    Each caller books the next free slot and sleeps until it, so no lock is
+    needed and the limiter can be reused across event loops.
+    """
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self._next_slot = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class CarrierAdapter:
+    """Base class: subclasses implement ``fetch`` for one carrier's API."""
+
+    # Carrier event code -> tracking stage; codes not listed leave the stage alone
+    EVENT_STAGES = {
+        'label_created': 'packed',
+        'info_received': 'packed',
+        'picked_up': 'shipped',
+        'accepted': 'shipped',
+        'in_transit': 'shipped',
+        'arrived_at_facility': 'shipped',
+        'departed_facility': 'shipped',
+        'out_for_delivery': 'out_for_delivery',
+        'delivered': 'delivered',
+    }
+    SHIPPED_STAGES = ('shipped', 'out_for_delivery', 'delivered')
+
+    def __init__(self, name, rate_per_second=10, max_concurrent=10, timeout=None, **options):
+        self.name = name
+        self.limiter = RateLimiter(rate_per_second)
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout or getattr(settings, 'PROVIDER_TIMEOUT_SECONDS', 10)
+        self.options = options
+
+    async def fetch(self, tracking_number):
+        """Return the shipment's events as ``[(code, datetime), ...]`` in any order."""
+        raise NotImplementedError
+
+    async def track(self, tracking_number):
+        await self.limiter.wait()
+        events = sorted(await self.fetch(tracking_number), key=lambda event: event[1])
+        return self.summarise(events)
+
+    def summarise(self, events):
+        """Fold the event history into the latest stage and the shipped/delivered times."""
+        update = TrackingUpdate(stage=None)
+        for code, when in events:
+            stage = self.EVENT_STAGES.get(code)
+            if stage is None:
+                continue
+            update.stage = stage
+            if stage in self.SHIPPED_STAGES and update.shipped_at is None:
+                update.shipped_at = when
+            if stage == 'delivered':
+                update.delivered_at = when
+        return update
+
+
+class HTTPTrackingAdapter(CarrierAdapter):
+    """JSON-over-HTTP carrier API (see the module docstring for the payload).
+
+    ``requests`` is blocking, so calls run on the adapter's own thread pool,
+    sized to its ``max_concurrent``, with one keep-alive session per thread.
+    """
+
+    def __init__(self, name, url, **options):
+        super().__init__(name, **options)
+        self.url = url
+        self._executor = None
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _get(self, tracking_number):
+        url = self.url.format(tracking_number=quote(tracking_number, safe=''))
+        try:
+            response = self._session().get(url, timeout=self.timeout)
+        except requests.RequestException as exc:
+            raise CarrierError(f"{self.name}: {exc}") from exc
+        if response.status_code != 200:
+            raise CarrierError(f"{self.name}: HTTP {response.status_code} for {tracking_number}")
+        try:
+            return response.json()
+        except ValueError as exc:
+            raise CarrierError(f"{self.name}: invalid JSON for {tracking_number}") from exc
+
+    async def fetch(self, tracking_number):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix=f"carrier-{self.name}")
+        payload = await asyncio.get_running_loop().run_in_executor(self._executor, self._get, tracking_number)
+        return self.parse(payload)
+
+    def parse(self, payload):
+        events = []
+        for event in payload.get('events') or []:
+            when = parse_datetime(event.get('time') or '')
+            if event.get('code') and when:
+                events.append((event['code'], when))
+        return events
+
+
+def load_adapters(config=None):
+    """Build the configured adapters: {carrier name: adapter}."""
+    config = config if config is not None else getattr(settings, 'CARRIER_ADAPTERS', {})
+    adapters = {}
+    for name, options in config.items():
+        options = dict(options)
+        adapter_class = import_string(options.pop('adapter', DEFAULT_ADAPTER))
+        adapters[name.lower()] = adapter_class(name.lower(), **options)
+    return adapters
+
+
+def adapter_for(adapters, carrier):
+    return adapters.get((carrier or '').strip().lower()) or adapters.get('default')
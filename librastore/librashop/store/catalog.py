@@ -0,0 +1,95 @@
+"""
+Catalog cache generation.
+
+Anything cached from products and categories is keyed with the current
+catalog version, so bumping the version makes every such entry unreachable
+at once without tracking individual keys (old entries just expire). Product
+and Category saves bump it through signals; bulk edits, which skip signals,
+call ``bump_catalog_version`` once when they finish.
+
+Vendor storefronts are keyed with their own vendor's version instead, so a
+change to one vendor's products or settings only invalidates that store,
+plus a storefronts version for changes that reach every store (categories,
+admin bulk edits and deletions).
+
+A version key that was evicted (or never set) is re-seeded from the wall
+clock in milliseconds. Old entries can only be served again if the new seed
+is not past every version already handed out, i.e. if the key was bumped
+more times than milliseconds have passed since the old seed, less any clock
+skew between the two servers involved. That holds as long as the web
+servers' clocks are kept in sync (NTP); a server whose clock runs well
+behind the others can bring back stale entries after an eviction.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'catalog:version'
+STOREFRONTS_VERSION_KEY = 'storefronts:version'
+CACHE_SECONDS = 300
+
+
+def _seed():
+    # Past every earlier version while bumps stay slower than one per millisecond
+    # and the servers' clocks agree (see the module docstring)
+    return int(time.time() * 1000)
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        seed = _seed()
+        cache.add(key, seed, None)
+        version = cache.get(key, seed)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted or never set: re-seed past the old versions
+        cache.add(key, _seed(), None)
+        cache.incr(key)
+
+
+def _vendor_version_key(vendor_id):
+    return f'vendor:{vendor_id}:version'
+
+
+def catalog_version():
+    return _version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    _bump(VERSION_KEY)
+
+
+def bump_vendor_version(vendor_id):
+    if vendor_id:
+        _bump(_vendor_version_key(vendor_id))
+
+
+def bump_storefronts_version():
+    _bump(STOREFRONTS_VERSION_KEY)
+
+
+def _cached(key, compute, timeout):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def cached(name, compute, timeout=CACHE_SECONDS):
+    """``compute()``'s result cached for the current catalog version."""
+    return _cached(f"catalog:{catalog_version()}:{name}", compute, timeout)
+
+
+def vendor_cached(vendor_id, name, compute, timeout=CACHE_SECONDS):
+    """``compute()``'s result cached for the vendor's current version (and the storefronts version)."""
+    versions = cache.get_many([_vendor_version_key(vendor_id), STOREFRONTS_VERSION_KEY])
+    vendor_version = versions.get(_vendor_version_key(vendor_id)) or _version(_vendor_version_key(vendor_id))
+    storefronts_version = versions.get(STOREFRONTS_VERSION_KEY) or _version(STOREFRONTS_VERSION_KEY)
+    return _cached(f"vendor:{vendor_id}:{vendor_version}:{storefronts_version}:{name}", compute, timeout)
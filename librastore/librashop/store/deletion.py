@@ -0,0 +1,137 @@
+"""
+Soft delete with a chunked background purge for categories and products.
+
+Deleting from the admin only stamps ``deleted_at`` (one small UPDATE). The
+default managers hide soft-deleted rows, and every product of a soft-deleted
+category, so the storefront loses them at once; the catalog version is
+bumped so cached pages follow.
+
+The purge then removes the rows for real without one long cascade: products
+go CHUNK_SIZE at a time, and before each chunk its dependents are deleted
+(CASCADE) or detached (SET_NULL, e.g. order items keep their snapshots) in
+chunks of their own, each in a short transaction. It runs in a background
+thread after the delete commits, and ``purge_deleted_catalog`` picks up
+anything an interrupted run left behind.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+from .bulk_edit import start_job
+from .catalog import bump_catalog_version, bump_storefronts_version
+from .models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+PURGE_LOCK_KEY = 'catalog:purge:lock'
+PURGE_LOCK_SECONDS = 3600
+
+
+def _delete_in_chunks(queryset):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            queryset.model._base_manager.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def _detach_in_chunks(queryset, field_name):
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return
+        with transaction.atomic():
+            queryset.model._base_manager.filter(pk__in=ids).update(**{field_name: None})
+
+
+def _purge_dependents(model, ids, skip=()):
+    """Delete or detach, in chunks, the rows that reference ``model`` rows ``ids``."""
+    for relation in model._meta.related_objects:
+        if relation.many_to_many or relation.related_model in skip:
+            continue
+        field = relation.field
+        related = relation.related_model._base_manager.filter(**{f'{field.name}__in': ids})
+        if relation.on_delete is models.CASCADE:
+            _delete_in_chunks(related)
+        elif relation.on_delete is models.SET_NULL:
+            _detach_in_chunks(related, field.name)
+        # Anything else (PROTECT, DO_NOTHING, ...) is left to the final delete to enforce
+
+
+def purge_products(products):
+    """Hard-delete ``products`` (a queryset) chunk by chunk; returns how many were deleted."""
+    deleted = 0
+    while True:
+        ids = list(products.values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return deleted
+        _purge_dependents(Product, ids)
+        with transaction.atomic():
+            Product.all_objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def purge_category(category_id):
+    """Hard-delete a category after its products; returns how many products went with it."""
+    deleted = purge_products(Product.all_objects.filter(category_id=category_id))
+    _purge_dependents(Category, [category_id], skip=(Product,))
+    with transaction.atomic():
+        Category.all_objects.filter(pk=category_id).delete()
+    return deleted
+
+
+def purge_deleted():
+    """Purge every soft-deleted category and product; returns (categories, products) removed."""
+    category_ids = list(Category.all_objects.exclude(deleted_at=None).values_list('pk', flat=True))
+    products = sum(purge_category(category_id) for category_id in category_ids)
+    products += purge_products(Product.all_objects.exclude(deleted_at=None))
+    if category_ids or products:
+        logger.info("Purged %d deleted categories and %d products", len(category_ids), products)
+    return len(category_ids), products
+
+
+def _purge_all(progress):
+    # One purge at a time; the running one loops until nothing is left, so it also takes later deletes
+    if not cache.add(PURGE_LOCK_KEY, True, PURGE_LOCK_SECONDS):
+        return None
+    try:
+        categories = products = 0
+        while True:
+            purged = purge_deleted()
+            if purged == (0, 0):
+                return categories, products
+            categories, products = categories + purged[0], products + purged[1]
+    finally:
+        cache.delete(PURGE_LOCK_KEY)
+
+
+def _purge_later(label):
+    transaction.on_commit(lambda: start_job(label, _purge_all))
+
+
+def soft_delete_products(product_ids):
+    """Hide products now and purge them in the background; returns how many were hidden."""
+    hidden = Product.all_objects.filter(pk__in=product_ids, deleted_at=None).update(
+        deleted_at=timezone.now(), available=False,
+    )
+    if hidden:
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(bump_storefronts_version)
+        _purge_later(f'purge {hidden} products')
+    return hidden
+
+
+def soft_delete_categories(category_ids):
+    """Hide categories (and with them their products) now and purge them in the background."""
+    hidden = Category.all_objects.filter(pk__in=category_ids, deleted_at=None).update(deleted_at=timezone.now())
+    if hidden:
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(bump_storefronts_version)
+        _purge_later(f'purge {hidden} categories')
+    return hidden
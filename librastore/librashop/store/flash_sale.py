@@ -0,0 +1,229 @@
+"""
+Flash-sale mode: cache-resident stock counters and checkout admission control.
+
+During a live sale the hot path never writes to a contended database row:
+
+* as the sale starts, its units move from the product's available stock
+  to reserved in one update (``inventory.allocate_flash_sale``), so no
+  other checkout or stock check can count them;
+* remaining units are an integer in the cache, claimed with atomic decr;
+* each claim is recorded as an insert-only StockReservation row, and
+  ``inventory.commit_cart`` sells it from the reserved units at placement;
+* FlashSale.sold is brought up to date in batches by ``flush_sold``, and
+  the unsold allocation of an ended sale goes back to available stock (both
+  from the ``flush_flash_sales`` command);
+* shoppers enter checkout through an admission window that lets at most
+  ``max_shoppers`` in per window. Admitted shoppers carry a signed cookie;
+  everyone else gets a static waiting-room page.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import FlashSale, StockReservation
+
+logger = logging.getLogger(__name__)
+
+LIVE_SALES_KEY = 'flash:live'
+LIVE_SALES_TTL = 30
+PASS_SALT = 'flash-sale-admission'
+
+
+def admission_window():
+    return getattr(settings, 'FLASH_SALE_ADMISSION_SECONDS', 600)
+
+
+def live_sales():
+    """{product_id: FlashSale} for sales that are live now, cached for a few seconds."""
+    sales = cache.get(LIVE_SALES_KEY)
+    if sales is None:
+        now = timezone.now()
+        upcoming = now + timedelta(seconds=LIVE_SALES_TTL)
+        sales = {
+            sale.product_id: sale
+            for sale in FlashSale.objects.filter(
+                active=True, starts_at__lte=upcoming, ends_at__gt=now,
+            ).select_related('product')
+        }
+        from .inventory import allocate_flash_sale
+        for sale in sales.values():
+            if sale.allocated is None:
+                allocate_flash_sale(sale)
+        cache.set(LIVE_SALES_KEY, sales, LIVE_SALES_TTL)
+    now = timezone.now()
+    return {product_id: sale for product_id, sale in sales.items() if sale.is_live(now)}
+
+
+def sale_for_product(product_id):
+    return live_sales().get(product_id)
+
+
+def sales_for_products(product_ids):
+    sales = live_sales()
+    return [sales[product_id] for product_id in product_ids if product_id in sales]
+
+
+# ---- Stock counter ----
+
+def _stock_key(sale):
+    return f"flash:{sale.pk}:remaining"
+
+
+def _init_counter(sale):
+    # Rebuilt from the database if the cache lost it: allocation minus
+    # everything held or already sold through the sale
+    taken = StockReservation.objects.filter(
+        flash_sale=sale, status__in=[StockReservation.HELD, StockReservation.COMMITTED],
+    ).aggregate(total=Sum('quantity'))['total'] or 0
+    allocated = sale.quantity if sale.allocated is None else sale.allocated
+    cache.add(_stock_key(sale), max(allocated - taken, 0), None)
+
+
+def remaining(sale):
+    value = cache.get(_stock_key(sale))
+    if value is None:
+        _init_counter(sale)
+        value = cache.get(_stock_key(sale), 0)
+    return max(value, 0)
+
+
+def claim(sale, quantity):
+    """Atomically take ``quantity`` units from the sale; False if not enough are left."""
+    key = _stock_key(sale)
+    try:
+        left = cache.decr(key, quantity)
+    except ValueError:
+        _init_counter(sale)
+        left = cache.decr(key, quantity)
+    if left < 0:
+        cache.incr(key, quantity)
+        return False
+    return True
+
+
+def give_back(sale, quantity):
+    try:
+        cache.incr(_stock_key(sale), quantity)
+    except ValueError:
+        # Counter is gone; it is rebuilt from reservations on next use
+        pass
+
+
+def resize(sale, delta):
+    """Apply a change to the sale's allocation to a live counter (rebuilt lazily if absent)."""
+    if cache.get(_stock_key(sale)) is None:
+        return
+    if delta > 0:
+        give_back(sale, delta)
+    elif delta < 0:
+        cache.decr(_stock_key(sale), -delta)
+
+
+def invalidate_live_sales():
+    cache.delete(LIVE_SALES_KEY)
+
+
+def flush_sold(sale):
+    """Write committed flash-sale units behind to FlashSale.sold (Inventory changes at commit)."""
+    committed = StockReservation.objects.filter(
+        flash_sale=sale, status=StockReservation.COMMITTED,
+    ).aggregate(total=Sum('quantity'))['total'] or 0
+    delta = committed - sale.sold
+    if delta <= 0:
+        return 0
+    # Optimistic check on the old value so two flushers never apply a delta twice
+    if not FlashSale.objects.filter(pk=sale.pk, sold=sale.sold).update(sold=committed):
+        return 0
+    sale.sold = committed
+    return delta
+
+
+# ---- Admission control ----
+
+def _pass_cookie(sale):
+    return f"flash_pass_{sale.pk}"
+
+
+def has_pass(request, sale):
+    try:
+        holder = request.get_signed_cookie(_pass_cookie(sale), salt=PASS_SALT, max_age=admission_window())
+    except (KeyError, signing.BadSignature):
+        return False
+    return holder == str(request.user.pk)
+
+
+def _take_slot(sale):
+    """The window counter key the slot was taken from, or None if the window is full."""
+    window = int(time.time()) // admission_window()
+    key = f"flash:{sale.pk}:admitted:{window}"
+    cache.add(key, 0, admission_window() * 2)
+    try:
+        if cache.incr(key) <= sale.max_shoppers:
+            return key
+    except ValueError:
+        return None
+    # Refused: undo the increment so the counter keeps matching the shoppers let in
+    _return_slot(key)
+    return None
+
+
+def _return_slot(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        # The window has expired along with its counter
+        pass
+
+
+def admit(request, sales):
+    """Admit the shopper to every sale in ``sales``.
+
+    Returns the list of sales the shopper was newly admitted to (pass the
+    list to ``grant_passes``), or None if they have to wait. A shopper who
+    has to wait for one sale gives back the slots taken in the others, so
+    no slot is used up without a pass being granted for it.
+    """
+    admitted, taken = [], []
+    for sale in sales:
+        if has_pass(request, sale):
+            continue
+        key = _take_slot(sale)
+        if key is None:
+            for key in taken:
+                _return_slot(key)
+            return None
+        admitted.append(sale)
+        taken.append(key)
+    return admitted
+
+
+def grant_passes(request, response, sales):
+    for sale in sales:
+        response.set_signed_cookie(
+            _pass_cookie(sale), str(request.user.pk), salt=PASS_SALT,
+            max_age=admission_window(), httponly=True, samesite='Lax',
+            secure=settings.SESSION_COOKIE_SECURE,
+        )
+    return response
+
+
+def waiting_room(request, sale):
+    """Cheap holding page: rendered without context processors, so no database access."""
+    retry_after = getattr(settings, 'FLASH_SALE_RETRY_SECONDS', 15)
+    html = render_to_string('flash_waiting_room.html', {
+        'product_name': sale.product.name,
+        'retry_after': retry_after,
+        'retry_url': request.get_full_path(),
+    })
+    response = HttpResponse(html, status=503)
+    response['Retry-After'] = str(retry_after)
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,105 @@
+"""
+Demand forecasting and restock suggestions.
+
+Units sold per product per local day over the last ``history_days`` (today
+excluded, it isn't over yet) come from one grouped query over paid orders'
+items and are laid out as a products x days NumPy matrix. Simple exponential
+smoothing is linear in the observations, so every product's smoothed daily
+demand is a single matrix-vector product with the weights
+``alpha * (1 - alpha) ** age``, seeded with the first week's average.
+Forecasts, days of cover and restock suggestions replace the ProductForecast
+table in one transaction; pages only ever read that table.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from librashop.reporting import day_window, in_range
+
+from .models import Inventory, OrderItem, ProductForecast
+from .rollups import sales_orders
+
+SEED_DAYS = 7
+WRITE_BATCH_SIZE = 5000
+
+
+def _weights(days, alpha):
+    """Smoothing weight of each day in the window, oldest first."""
+    ages = np.arange(days - 1, -1, -1)
+    return alpha * (1 - alpha) ** ages
+
+
+def _read_sales(start, end):
+    """``(product_id, day, units)`` rows for paid orders placed in [start, end)."""
+    return (
+        OrderItem.objects
+        .filter(order__in=in_range(sales_orders(), 'date_odered', start, end))
+        .exclude(product=None)
+        .values('product_id', day=TruncDate('order__date_odered', tzinfo=timezone.get_current_timezone()))
+        .annotate(units=Sum('quantity'))
+        .values_list('product_id', 'day', 'units')
+        .order_by()
+        .iterator(chunk_size=5000)
+    )
+
+
+def compute(today=None, options=None):
+    """Unsaved ProductForecast rows for every product that sold in the window or tracks stock."""
+    options = {**settings.DEMAND_FORECAST, **(options or {})}
+    days, alpha = options['history_days'], options['alpha']
+    today = today or timezone.localdate()
+    start, end = day_window(days, today - timedelta(days=1))
+
+    sales = list(_read_sales(start, end))
+    stock_by_product = dict(Inventory.objects.values_list('product_id', 'available'))
+    product_ids = np.array(sorted({row[0] for row in sales} | stock_by_product.keys()), dtype=np.int64)
+    if not len(product_ids):
+        return []
+
+    matrix = np.zeros((len(product_ids), days))
+    if sales:
+        sold_ids, sold_days, units = zip(*sales)
+        rows = np.searchsorted(product_ids, np.array(sold_ids, dtype=np.int64))
+        columns = np.array([(day - start).days for day in sold_days])
+        matrix[rows, columns] = np.array(units, dtype=float)
+
+    seed = matrix[:, :SEED_DAYS].mean(axis=1)
+    demand = matrix @ _weights(days, alpha) + seed * (1 - alpha) ** days
+
+    tracked = np.array([pid in stock_by_product for pid in product_ids.tolist()])
+    stock = np.array([stock_by_product.get(pid, 0) for pid in product_ids.tolist()], dtype=float)
+    selling = demand > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(selling, np.maximum(stock, 0) / demand, np.inf)
+    needs_restock = tracked & selling & (cover < options['lead_time_days'] + options['safety_days'])
+    restock = np.where(needs_restock, np.ceil(demand * options['target_cover_days'] - stock), 0).clip(min=0)
+    forecast = np.rint(demand * options['horizon_days'])
+
+    now = timezone.now()
+    return [
+        ProductForecast(
+            product_id=int(product_ids[i]),
+            daily_units=round(float(demand[i]), 3),
+            forecast_units=int(forecast[i]),
+            stock=int(stock[i]) if tracked[i] else None,
+            days_of_cover=round(float(cover[i]), 1) if tracked[i] and selling[i] else None,
+            restock_units=int(restock[i]),
+            needs_restock=bool(needs_restock[i]),
+            computed_at=now,
+        )
+        for i in range(len(product_ids))
+    ]
+
+
+def build(today=None):
+    """Recompute and store every forecast; returns (products forecast, products needing restock)."""
+    forecasts = compute(today)
+    with transaction.atomic():
+        ProductForecast.objects.all().delete()
+        ProductForecast.objects.bulk_create(forecasts, batch_size=WRITE_BATCH_SIZE)
+    return len(forecasts), sum(forecast.needs_restock for forecast in forecasts)
@@ -0,0 +1,288 @@
+"""
+Stock reservation without long row locks.
+
+Every stock change is a single conditional UPDATE, e.g. reserving runs
+``UPDATE inventory SET available = available - q, reserved = reserved + q
+WHERE product_id = p AND available >= q``. A row count of 0 means there was
+not enough stock, so two checkouts can never both take the last unit.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from . import flash_sale
+from .models import FlashSale, Inventory, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Raised when a cart asks for more units than are available."""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(f"Only {available} of {product} available")
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_MINUTES', 35))
+
+
+def in_stock_only(products):
+    """Filter a Product queryset to items that can be bought (untracked products always can).
+
+    Adds a LEFT JOIN on Inventory's unique product_id index to the Product
+    query, so the filter costs one index probe per product row scanned.
+    Products in a live flash sale with units left count as in stock, since
+    the sale's units are set aside from ``available``.
+    """
+    out_of_stock = Q(inventory__available__lte=0)
+    on_sale = [product_id for product_id, sale in flash_sale.live_sales().items() if flash_sale.remaining(sale) > 0]
+    if on_sale:
+        out_of_stock &= ~Q(pk__in=on_sale)
+    return products.exclude(out_of_stock)
+
+
+def adjust_stock(product_id, delta):
+    """Add (or with a negative delta remove) on-hand units; returns False if that would go below zero."""
+    rows = Inventory.objects.filter(product_id=product_id, available__gte=-delta)
+    return rows.update(on_hand=F('on_hand') + delta, available=F('available') + delta) == 1
+
+
+def _take(product_id, quantity):
+    return Inventory.objects.filter(product_id=product_id, available__gte=quantity).update(
+        available=F('available') - quantity,
+        reserved=F('reserved') + quantity,
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def _take_up_to(product_id, quantity):
+    """Reserve as many of ``quantity`` units as are available; returns how many."""
+    available = Inventory.objects.filter(product_id=product_id).values_list('available', flat=True).first() or 0
+    quantity = min(quantity, max(available, 0))
+    while quantity and not _take(product_id, quantity):
+        available = Inventory.objects.filter(product_id=product_id).values_list('available', flat=True).first() or 0
+        quantity = min(quantity, max(available, 0))
+    return quantity
+
+
+def _give_back(product_id, quantity):
+    Inventory.objects.filter(product_id=product_id, reserved__gte=quantity).update(
+        available=F('available') + quantity,
+        reserved=F('reserved') - quantity,
+        updated_at=timezone.now(),
+    )
+
+
+def _sell_reserved(product_id, quantity):
+    Inventory.objects.filter(product_id=product_id, reserved__gte=quantity).update(
+        on_hand=F('on_hand') - quantity,
+        reserved=F('reserved') - quantity,
+        updated_at=timezone.now(),
+    )
+
+
+# ---- Flash-sale allocations ----
+
+def allocate_flash_sale(sale):
+    """Move a starting sale's units from available to reserved stock, so no other path can sell them.
+
+    If less than the sale's quantity is available, the sale only sells what
+    could be set aside. Returns the units allocated.
+    """
+    with transaction.atomic():
+        # Claiming the step first means concurrent callers allocate once
+        if not FlashSale.objects.filter(pk=sale.pk, allocated=None).update(allocated=0):
+            sale.refresh_from_db(fields=['allocated', 'allocation_returned'])
+            return sale.allocated
+        tracked = Inventory.objects.filter(product_id=sale.product_id).exists()
+        units = _take_up_to(sale.product_id, sale.quantity) if tracked else sale.quantity
+        FlashSale.objects.filter(pk=sale.pk).update(allocated=units)
+    sale.allocated = units
+    if units < sale.quantity:
+        logger.warning("Flash sale %s allocated %s of %s units; that is all product %s had available",
+                       sale.pk, units, sale.quantity, sale.product_id)
+        # A counter made from the quantity before the allocation
+        flash_sale.resize(sale, units - sale.quantity)
+    return units
+
+
+def resize_flash_allocation(sale, delta):
+    """Grow or shrink a started sale's allocation after its quantity was edited; returns the change made."""
+    if sale.allocated is None:
+        # Not started: the allocation is taken from the new quantity
+        return delta
+    if sale.allocation_returned:
+        return 0
+    tracked = Inventory.objects.filter(product_id=sale.product_id).exists()
+    if delta > 0:
+        units = _take_up_to(sale.product_id, delta) if tracked else delta
+    else:
+        # Only units nobody has claimed can go back
+        units = -min(-delta, flash_sale.remaining(sale))
+        if units and tracked:
+            _give_back(sale.product_id, -units)
+    FlashSale.objects.filter(pk=sale.pk).update(allocated=F('allocated') + units)
+    sale.allocated += units
+    return units
+
+
+def return_flash_allocation(sale, now=None):
+    """Put an ended sale's unsold allocation back on sale; returns the units returned.
+
+    Waits until the sale holds no stock, so a paid hold always finds its units reserved.
+    """
+    now = now or timezone.now()
+    if sale.allocated is None or sale.allocation_returned or sale.ends_at > now:
+        return 0
+    if StockReservation.objects.filter(flash_sale=sale, status=StockReservation.HELD).exists():
+        return 0
+    with transaction.atomic():
+        if not FlashSale.objects.filter(pk=sale.pk, allocation_returned=False).update(allocation_returned=True):
+            return 0
+        sale.refresh_from_db(fields=['allocated'])
+        sold = StockReservation.objects.filter(
+            flash_sale=sale, status=StockReservation.COMMITTED,
+        ).aggregate(total=Sum('quantity'))['total'] or 0
+        unsold = max(sale.allocated - sold, 0)
+        if unsold:
+            _give_back(sale.product_id, unsold)
+    sale.allocation_returned = True
+    return unsold
+
+
+def _reclaim_flash(sale, quantity):
+    """Take an expired hold's units back from the sale, if it is still selling from its allocation."""
+    return (
+        FlashSale.objects.filter(pk=sale.pk, allocation_returned=False).exists()
+        and flash_sale.claim(sale, quantity)
+    )
+
+
+def reserve_cart(cart):
+    """Hold stock for every tracked product in the cart; all-or-nothing.
+
+    Any reservations the cart already holds (an earlier, abandoned checkout
+    session) are released first. Raises InsufficientStock if any line cannot
+    be covered, in which case nothing stays reserved.
+    """
+    release_cart(cart)
+    expires_at = timezone.now() + reservation_ttl()
+    # Products are reserved in id order so concurrent carts never deadlock
+    items = sorted(cart.items.select_related('product__inventory'), key=lambda item: item.product_id)
+    sales = flash_sale.live_sales()
+    claimed = []
+    try:
+        with transaction.atomic():
+            reservations = []
+            for item in items:
+                sale = sales.get(item.product_id)
+                if sale:
+                    # Flash-sale units come from the cache counter, not the Inventory row
+                    if not flash_sale.claim(sale, item.quantity):
+                        raise InsufficientStock(item.product, flash_sale.remaining(sale))
+                    claimed.append((sale, item.quantity))
+                else:
+                    try:
+                        inventory = item.product.inventory
+                    except Inventory.DoesNotExist:
+                        continue
+                    if not _take(item.product_id, item.quantity):
+                        inventory.refresh_from_db(fields=['available'])
+                        raise InsufficientStock(item.product, max(inventory.available, 0))
+                reservations.append(StockReservation(
+                    product_id=item.product_id,
+                    cart=cart,
+                    flash_sale=sale,
+                    quantity=item.quantity,
+                    expires_at=expires_at,
+                ))
+            StockReservation.objects.bulk_create(reservations)
+    except Exception:
+        # The database rolled back; the cache counters have to be put back by hand
+        for sale, quantity in claimed:
+            flash_sale.give_back(sale, quantity)
+        raise
+    return expires_at
+
+
+def _release(reservations, status):
+    released = 0
+    for reservation in reservations:
+        # Flip the status first so a reservation is only ever given back once
+        flipped = StockReservation.objects.filter(pk=reservation.pk, status=StockReservation.HELD).update(status=status)
+        if not flipped:
+            continue
+        if reservation.flash_sale_id:
+            flash_sale.give_back(reservation.flash_sale, reservation.quantity)
+        else:
+            _give_back(reservation.product_id, reservation.quantity)
+        released += 1
+    return released
+
+
+def release_cart(cart):
+    """Return any stock still held for this cart."""
+    with transaction.atomic():
+        held = StockReservation.objects.filter(cart=cart, status=StockReservation.HELD).select_related('flash_sale')
+        return _release(list(held), StockReservation.RELEASED)
+
+
+def commit_cart(cart, order):
+    """Turn the cart's held stock into sold stock at order placement.
+
+    Held units, including flash-sale units (which sit in the sale's
+    allocation), are already reserved in Inventory. Reservations the sweeper
+    already expired are taken from the sale or from available stock again
+    if possible; if that is gone too the shortfall is logged, because the
+    customer has already paid.
+    """
+    reservations = StockReservation.objects.filter(
+        cart=cart, status__in=[StockReservation.HELD, StockReservation.EXPIRED],
+    ).select_related('flash_sale')
+    for reservation in reservations:
+        was_held = StockReservation.objects.filter(pk=reservation.pk, status=StockReservation.HELD).update(
+            status=StockReservation.COMMITTED, order=order,
+        )
+        if not was_held:
+            StockReservation.objects.filter(pk=reservation.pk).update(status=StockReservation.COMMITTED, order=order)
+        sale = reservation.flash_sale
+        if was_held or (sale and _reclaim_flash(sale, reservation.quantity)):
+            _sell_reserved(reservation.product_id, reservation.quantity)
+            continue
+        taken = Inventory.objects.filter(product_id=reservation.product_id, available__gte=reservation.quantity).update(
+            on_hand=F('on_hand') - reservation.quantity,
+            available=F('available') - reservation.quantity,
+            updated_at=timezone.now(),
+        )
+        if sale:
+            # Sold from outside the allocation: count it in, so the unsold units returned at the end stay right
+            FlashSale.objects.filter(pk=sale.pk, allocation_returned=False).update(
+                allocated=F('allocated') + reservation.quantity,
+            )
+        if not taken:
+            logger.warning(
+                "Order %s paid after its reservation expired; %s x product %s could not be re-reserved",
+                order.pk, reservation.quantity, reservation.product_id,
+            )
+
+
+def release_expired(now=None, batch_size=500):
+    """Give back stock for held reservations past their expiry; returns how many were released."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        batch = list(
+            StockReservation.objects.filter(status=StockReservation.HELD, expires_at__lt=now)
+            .select_related('flash_sale').order_by('expires_at')[:batch_size]
+        )
+        if not batch:
+            return released
+        with transaction.atomic():
+            released += _release(batch, StockReservation.EXPIRED)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import Order
+from store.totals import refresh_order_totals
+
+
+class Command(BaseCommand):
+    help = "Fill the stored subtotal/discount/total/item_count columns on orders, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute every order, not only those with no stored item count.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.order_by('pk')
+        if not options['all']:
+            orders = orders.filter(item_count=0)
+
+        # Keyset over the primary key so each batch is an index range scan
+        last_pk = 0
+        updated = 0
+        while True:
+            ids = list(orders.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += refresh_order_totals(ids)
+            last_pk = ids[-1]
+            self.stdout.write(f"Updated {updated} orders (up to #{last_pk})")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled totals for {updated} orders."))
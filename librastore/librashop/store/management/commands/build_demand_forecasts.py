@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import forecasting
+
+
+class Command(BaseCommand):
+    help = "Forecast daily demand per product from paid sales and store restock suggestions (run nightly)."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        products, restock = forecasting.build()
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {products} products ({restock} need restocking) in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import bulk_edit
+
+
+class Command(BaseCommand):
+    help = "Apply a CSV of product price/availability changes (id or slug, price, available) in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to apply')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as file:
+            changes, errors = bulk_edit.read_product_csv(file)
+        if errors:
+            for line, message in errors:
+                self.stderr.write(f"line {line}: {message}")
+            raise CommandError("Nothing was changed; fix the rows above.")
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} products updated")
+
+        updated = bulk_edit.update_products(changes, progress)
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} products."))
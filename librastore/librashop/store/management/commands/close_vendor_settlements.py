@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vendors import settlement
+
+
+class Command(BaseCommand):
+    help = "Write vendor settlement statements for a period (default: last month). Safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day of the period (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Day after the period (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        start, end = settlement.previous_month()
+        start, end = options['start'] or start, options['end'] or end
+        if start >= end:
+            raise CommandError("--start must be before --end")
+        try:
+            statements = settlement.settle(start, end)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for statement in statements:
+            self.stdout.write(f"{statement.vendor_id}: {statement.orders} orders, payable {statement.payable}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(statements)} statements for {start} to {end}."))
@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store import flash_sale
+from store.inventory import return_flash_allocation
+from store.models import FlashSale
+
+
+class Command(BaseCommand):
+    help = "Write flash-sale units sold behind to FlashSale.sold and return ended sales' unsold units to stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and flush every N seconds (default: flush once and exit).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Sales that ended recently still get their last commits written behind
+            since = timezone.now() - timedelta(days=1)
+            flushed = returned = 0
+            for sale in FlashSale.objects.filter(ends_at__gte=since).select_related('product'):
+                flushed += flash_sale.flush_sold(sale)
+                returned += return_flash_allocation(sale)
+            self.stdout.write(f"Flushed {flushed} sold flash-sale units; returned {returned} unsold units to stock.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
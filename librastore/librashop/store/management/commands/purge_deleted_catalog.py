@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import deletion
+
+
+class Command(BaseCommand):
+    help = "Finish purging soft-deleted categories and products, in chunks (safe to re-run)."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        categories, products = deletion.purge_deleted()
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {categories} categories and {products} products in {time.monotonic() - started:.1f}s."
+        ))
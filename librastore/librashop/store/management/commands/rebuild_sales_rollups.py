@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store import rollups
+from store.models import DailyOrderStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollups from paid orders (everything, or a recent window)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--days', type=int, help='Rebuild only the last N days (e.g. a nightly reconcile).')
+        parser.add_argument('--chunk-days', type=int, default=31)
+        parser.add_argument(
+            '--if-empty', action='store_true',
+            help='Do nothing if rollups already exist (for deploy scripts).',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and DailyOrderStats.objects.exists():
+            self.stdout.write("Rollups already present; skipping.")
+            return
+
+        end = timezone.localdate() + timedelta(days=1)
+        if options['days']:
+            start = end - timedelta(days=options['days'])
+        elif options['since']:
+            try:
+                start = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+        else:
+            start = rollups.first_sales_day()
+            if start is None:
+                self.stdout.write("No paid orders to roll up.")
+                return
+
+        for chunk_start, chunk_end, (sales_rows, stats_rows) in rollups.rebuild_range(start, end, options['chunk_days']):
+            self.stdout.write(f"{chunk_start} to {chunk_end}: {sales_rows} sales rows, {stats_rows} order rows")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups from {start}."))
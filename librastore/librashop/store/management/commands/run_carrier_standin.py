@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from store.carrier_standin import make_server
+
+
+class Command(BaseCommand):
+    help = "Serve fake carrier tracking data locally for the carrier sync (development and tests)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--step-seconds', type=int, default=60, help='Seconds between tracking events.')
+
+    def handle(self, *args, **options):
+        server = make_server(options['host'], options['port'], options['step_seconds'])
+        self.stdout.write(f"Carrier stand-in on http://{options['host']}:{options['port']}/track/<number>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
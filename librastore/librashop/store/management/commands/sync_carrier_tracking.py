@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.carrier_sync import CarrierSync
+
+
+class Command(BaseCommand):
+    help = "Poll carrier tracking APIs for open shipments and bulk-update order tracking stages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None, help='Carrier calls in flight at once.')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and sync every N seconds (default: sync once and exit).',
+        )
+
+    def handle(self, *args, **options):
+        sync = CarrierSync(max_concurrent=options['concurrency'], batch_size=options['batch_size'])
+        while True:
+            started = time.monotonic()
+            stats = sync.run()
+            self.stdout.write(
+                f"Polled {stats['polled']} shipments in {time.monotonic() - started:.1f}s: "
+                f"{stats['updated']} updated, {stats['failed']} failed."
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vendors import feed_sync
+from vendors.models import Vendor
+
+
+class Command(BaseCommand):
+    help = "Sync a vendor's products with its full catalog CSV; only changed rows are written."
+
+    def add_arguments(self, parser):
+        parser.add_argument('vendor', help='Vendor slug.')
+        parser.add_argument('feed', help='Path to the catalog CSV.')
+
+    def handle(self, *args, **options):
+        try:
+            vendor = Vendor.objects.get(slug=options['vendor'])
+        except Vendor.DoesNotExist:
+            raise CommandError(f"No vendor with slug {options['vendor']!r}")
+        try:
+            with open(options['feed'], 'rb') as feed:
+                result = feed_sync.sync_feed(vendor, feed)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} created, {result.updated} updated, {result.unchanged} unchanged, "
+            f"{result.unlisted} marked unavailable, {result.error_count} rows with errors."
+        ))
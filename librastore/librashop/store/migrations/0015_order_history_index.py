@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_flash_sale'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['custamer', '-date_odered', '-id'], name='order_customer_history_idx'),
+        ),
+    ]
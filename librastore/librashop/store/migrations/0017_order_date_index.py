@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date_odered'], name='order_date_idx'),
+        ),
+    ]
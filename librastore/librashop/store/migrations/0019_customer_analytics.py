@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_order_last_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortRetention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort', models.DateField(help_text='First day of the month of the first paid order')),
+                ('months_since', models.PositiveSmallIntegerField()),
+                ('customers', models.PositiveIntegerField()),
+                ('cohort_size', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['cohort', 'months_since'],
+                'unique_together': {('cohort', 'months_since')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerRFM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recency_days', models.PositiveIntegerField()),
+                ('frequency', models.PositiveIntegerField()),
+                ('monetary', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('r_score', models.PositiveSmallIntegerField()),
+                ('f_score', models.PositiveSmallIntegerField()),
+                ('m_score', models.PositiveSmallIntegerField()),
+                ('segment', models.CharField(choices=[('champions', 'Champions'), ('loyal', 'Loyal'), ('potential', 'Potential loyalists'), ('new', 'New customers'), ('need_attention', 'Need attention'), ('at_risk', 'At risk'), ('hibernating', 'Hibernating')], db_index=True, max_length=20)),
+                ('first_order_at', models.DateTimeField()),
+                ('last_order_at', models.DateTimeField()),
+                ('computed_at', models.DateTimeField()),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rfm', to='store.customer')),
+            ],
+        ),
+    ]
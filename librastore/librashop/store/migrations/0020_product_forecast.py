@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_customer_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_units', models.FloatField(help_text='Smoothed units sold per day')),
+                ('forecast_units', models.PositiveIntegerField(help_text='Expected units sold over the forecast horizon')),
+                ('stock', models.IntegerField(blank=True, help_text='Available units when computed; empty if untracked', null=True)),
+                ('days_of_cover', models.FloatField(blank=True, help_text='Days the stock lasts at daily_units', null=True)),
+                ('restock_units', models.PositiveIntegerField(default=0)),
+                ('needs_restock', models.BooleanField(db_index=True, default=False)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='store.product')),
+            ],
+        ),
+    ]
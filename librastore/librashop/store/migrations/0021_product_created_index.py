@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_product_forecast'),
+        ('vendors', '0003_alter_vendor_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created', '-id'], name='product_created_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations
+
+# The DDL as it stood when this migration was written; librashop.search may
+# change later, and replaying this migration must still build the same schema.
+
+POSTGRES_CREATE = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_customer_name_trgm" ON "store_customer" USING gin ((UPPER("name"::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_customer_email_trgm" ON "store_customer" USING gin ((UPPER("email"::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_order_tracking_number_trgm" ON "store_order" USING gin ((UPPER("tracking_number"::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_shippingadderss_address_trgm" ON "store_shippingadderss" USING gin ((UPPER("address"::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_shippingadderss_city_trgm" ON "store_shippingadderss" USING gin ((UPPER("city"::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_shippingadderss_state_trgm" ON "store_shippingadderss" USING gin ((UPPER("state"::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "store_shippingadderss_zipcode_trgm" ON "store_shippingadderss" USING gin ((UPPER("zipcode"::text)) gin_trgm_ops)',
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_customer_name_trgm"',
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_customer_email_trgm"',
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_order_tracking_number_trgm"',
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_shippingadderss_address_trgm"',
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_shippingadderss_city_trgm"',
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_shippingadderss_state_trgm"',
+    'DROP INDEX CONCURRENTLY IF EXISTS "store_shippingadderss_zipcode_trgm"',
+]
+
+SQLITE_CREATE = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "store_customer_search" USING fts5("name", "email", content=\'store_customer\', content_rowid=\'id\', tokenize=\'trigram\')',
+    'CREATE TRIGGER IF NOT EXISTS "store_customer_search_ai" AFTER INSERT ON "store_customer" BEGIN INSERT INTO "store_customer_search" (rowid, "name", "email") VALUES (new.id, new."name", new."email"); END',
+    'CREATE TRIGGER IF NOT EXISTS "store_customer_search_ad" AFTER DELETE ON "store_customer" BEGIN INSERT INTO "store_customer_search" ("store_customer_search", rowid, "name", "email") VALUES (\'delete\', old.id, old."name", old."email"); END',
+    'CREATE TRIGGER IF NOT EXISTS "store_customer_search_au" AFTER UPDATE ON "store_customer" BEGIN INSERT INTO "store_customer_search" ("store_customer_search", rowid, "name", "email") VALUES (\'delete\', old.id, old."name", old."email"); INSERT INTO "store_customer_search" (rowid, "name", "email") VALUES (new.id, new."name", new."email"); END',
+    'INSERT INTO "store_customer_search" ("store_customer_search") VALUES (\'rebuild\')',
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "store_order_search" USING fts5("tracking_number", content=\'store_order\', content_rowid=\'id\', tokenize=\'trigram\')',
+    'CREATE TRIGGER IF NOT EXISTS "store_order_search_ai" AFTER INSERT ON "store_order" BEGIN INSERT INTO "store_order_search" (rowid, "tracking_number") VALUES (new.id, new."tracking_number"); END',
+    'CREATE TRIGGER IF NOT EXISTS "store_order_search_ad" AFTER DELETE ON "store_order" BEGIN INSERT INTO "store_order_search" ("store_order_search", rowid, "tracking_number") VALUES (\'delete\', old.id, old."tracking_number"); END',
+    'CREATE TRIGGER IF NOT EXISTS "store_order_search_au" AFTER UPDATE ON "store_order" BEGIN INSERT INTO "store_order_search" ("store_order_search", rowid, "tracking_number") VALUES (\'delete\', old.id, old."tracking_number"); INSERT INTO "store_order_search" (rowid, "tracking_number") VALUES (new.id, new."tracking_number"); END',
+    'INSERT INTO "store_order_search" ("store_order_search") VALUES (\'rebuild\')',
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "store_shippingadderss_search" USING fts5("address", "city", "state", "zipcode", content=\'store_shippingadderss\', content_rowid=\'id\', tokenize=\'trigram\')',
+    'CREATE TRIGGER IF NOT EXISTS "store_shippingadderss_search_ai" AFTER INSERT ON "store_shippingadderss" BEGIN INSERT INTO "store_shippingadderss_search" (rowid, "address", "city", "state", "zipcode") VALUES (new.id, new."address", new."city", new."state", new."zipcode"); END',
+    'CREATE TRIGGER IF NOT EXISTS "store_shippingadderss_search_ad" AFTER DELETE ON "store_shippingadderss" BEGIN INSERT INTO "store_shippingadderss_search" ("store_shippingadderss_search", rowid, "address", "city", "state", "zipcode") VALUES (\'delete\', old.id, old."address", old."city", old."state", old."zipcode"); END',
+    'CREATE TRIGGER IF NOT EXISTS "store_shippingadderss_search_au" AFTER UPDATE ON "store_shippingadderss" BEGIN INSERT INTO "store_shippingadderss_search" ("store_shippingadderss_search", rowid, "address", "city", "state", "zipcode") VALUES (\'delete\', old.id, old."address", old."city", old."state", old."zipcode"); INSERT INTO "store_shippingadderss_search" (rowid, "address", "city", "state", "zipcode") VALUES (new.id, new."address", new."city", new."state", new."zipcode"); END',
+    'INSERT INTO "store_shippingadderss_search" ("store_shippingadderss_search") VALUES (\'rebuild\')',
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS "store_customer_search_ai"',
+    'DROP TRIGGER IF EXISTS "store_customer_search_ad"',
+    'DROP TRIGGER IF EXISTS "store_customer_search_au"',
+    'DROP TABLE IF EXISTS "store_customer_search"',
+    'DROP TRIGGER IF EXISTS "store_order_search_ai"',
+    'DROP TRIGGER IF EXISTS "store_order_search_ad"',
+    'DROP TRIGGER IF EXISTS "store_order_search_au"',
+    'DROP TABLE IF EXISTS "store_order_search"',
+    'DROP TRIGGER IF EXISTS "store_shippingadderss_search_ai"',
+    'DROP TRIGGER IF EXISTS "store_shippingadderss_search_ad"',
+    'DROP TRIGGER IF EXISTS "store_shippingadderss_search_au"',
+    'DROP TABLE IF EXISTS "store_shippingadderss_search"',
+]
+
+
+def _run(schema_editor, statements):
+    vendor = schema_editor.connection.vendor
+    if vendor in statements:
+        with schema_editor.connection.cursor() as cursor:
+            for sql in statements[vendor]:
+                cursor.execute(sql)
+
+
+def create_indexes(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE})
+
+
+def drop_indexes(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP})
+
+
+class Migration(migrations.Migration):
+    # Postgres builds the trigram indexes CONCURRENTLY, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('store', '0021_product_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
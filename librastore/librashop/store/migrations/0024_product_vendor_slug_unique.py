@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+def dedupe_vendor_slugs(apps, schema_editor):
+    # Earlier products of a vendor could share a slug; all but the oldest get their id appended
+    Product = apps.get_model('store', 'Product')
+    duplicates = (
+        Product.objects.exclude(vendor=None)
+        .values('vendor_id', 'slug')
+        .annotate(rows=models.Count('id'), first=models.Min('id'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        products = Product.objects.filter(vendor_id=duplicate['vendor_id'], slug=duplicate['slug'])
+        for product in products.exclude(pk=duplicate['first']):
+            product.slug = f"{product.slug[:190]}-{product.pk}"
+            product.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_soft_delete'),
+        ('vendors', '0006_settlements'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_vendor_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('vendor', 'slug'), name='product_vendor_slug_unique'),
+        ),
+    ]
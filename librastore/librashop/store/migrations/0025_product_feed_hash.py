@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0024_product_vendor_slug_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='feed_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0025_product_feed_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashsale',
+            name='allocated',
+            field=models.PositiveIntegerField(editable=False, help_text='Units set aside from Inventory; empty until the sale starts', null=True),
+        ),
+        migrations.AddField(
+            model_name='flashsale',
+            name='allocation_returned',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
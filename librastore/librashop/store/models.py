@@ -5,10 +5,27 @@ from django.conf import settings
 
 # Create your models here.
 
+class LiveCategoryManager(models.Manager):
+    """Hides soft-deleted categories (see store.deletion)."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at=None)
+
+
+class LiveProductManager(models.Manager):
+    """Hides soft-deleted products and every product of a soft-deleted category."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at=None, category__deleted_at=None)
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.CharField(max_length=100, unique=True)
     hero_video = models.FileField(upload_to='videos/categories/', blank=True, null=True)
+    # Set when deleted from the admin; the row and its products are purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = LiveCategoryManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ('name',)
@@ -29,9 +46,126 @@ class Product(models.Model):
     available = models.BooleanField(blank=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Hash of the vendor feed row last written to this product; blank once edited any other way
+    feed_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    objects = LiveProductManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pages of the custom admin products list
+            models.Index(fields=['-created', '-id'], name='product_created_idx'),
+        ]
+        constraints = [
+            # Vendor bulk uploads upsert on it (vendors.bulk_upload)
+            models.UniqueConstraint(fields=['vendor', 'slug'], name='product_vendor_slug_unique'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Edited outside the vendor feed: the next sync rewrites it from its feed row
+        self.feed_hash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'feed_hash' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'feed_hash']
+        super().save(*args, **kwargs)
+
+    @property
+    def stock(self):
+        """Units available to sell, or None when stock isn't tracked for this product."""
+        try:
+            return self.inventory.available
+        except Inventory.DoesNotExist:
+            return None
+
+
+class Inventory(models.Model):
+    """Stock levels for a product. Products without a row are not stock-tracked.
+
+    ``available`` is always ``on_hand - reserved`` and is only ever changed
+    with conditional F() updates (see store.inventory), never read-modify-write.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='inventory')
+    on_hand = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0)
+    available = models.IntegerField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'inventory'
+
+    def __str__(self):
+        return f"{self.product} ({self.available} available)"
+
+
+class FlashSale(models.Model):
+    """A limited-quantity drop for one product.
+
+    While a sale is live its remaining units are counted in the cache (see
+    store.flash_sale); ``sold`` is written behind from committed reservations.
+    As it starts, its units move from the product's available stock into
+    reserved (``allocated``), and whatever is left unsold goes back once it
+    has ended (``allocation_returned``).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='flash_sales')
+    quantity = models.PositiveIntegerField(help_text='Units allocated to the sale')
+    sold = models.PositiveIntegerField(default=0, editable=False)
+    allocated = models.PositiveIntegerField(
+        null=True, editable=False, help_text='Units set aside from Inventory; empty until the sale starts'
+    )
+    allocation_returned = models.BooleanField(default=False, editable=False)
+    max_shoppers = models.PositiveIntegerField(
+        default=100, help_text='Shoppers admitted into checkout per admission window'
+    )
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['-starts_at']
+
+    def __str__(self):
+        return f"Flash sale: {self.product} ({self.starts_at:%Y-%m-%d %H:%M})"
+
+    def is_live(self, now):
+        return self.active and self.starts_at <= now < self.ends_at
+
+
+class StockReservation(models.Model):
+    """Units held for a cart between checkout-session creation and order placement."""
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+        (EXPIRED, 'Expired'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    cart = models.ForeignKey('cart.Cart', on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    order = models.ForeignKey('store.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    # Set when the units came from a flash sale's cache counter instead of Inventory
+    flash_sale = models.ForeignKey(FlashSale, on_delete=models.CASCADE, null=True, blank=True, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=HELD)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} ({self.status})"
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -86,6 +220,21 @@ class Order(models.Model):
     shipped_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True)
+    # Denormalized totals, computed from the OrderItem price snapshots
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Serves keyset-paginated order history per customer
+            models.Index(fields=['custamer', '-date_odered', '-id'], name='order_customer_history_idx'),
+            # Range predicates of the dashboard series (librashop.reporting)
+            models.Index(fields=['date_odered'], name='order_date_idx'),
+            # Incremental refresh of the sales cube (changed since a watermark)
+            models.Index(fields=['last_updated'], name='order_last_updated_idx'),
+        ]
 
     def __str__(self):
         return str(self.id) 
@@ -103,15 +252,19 @@ class Order(models.Model):
 
     @property
     def get_cart_total(self):
-        """Sum of all order item line totals."""
-        items = self.orderitem_set.all()
-        return sum([(item.line_total or 0) for item in items])
+        """Sum of all order item line totals (stored column)."""
+        return self.subtotal
 
     @property
     def get_cart_items(self):
-        """Total quantity of items in the order."""
-        items = self.orderitem_set.all()
-        return sum([(item.quantity or 0) for item in items])
+        """Total quantity of items in the order (stored column)."""
+        return self.item_count
+
+    def recalculate_totals(self):
+        """Recompute the stored totals from this order's items and reload them."""
+        from .totals import refresh_order_totals
+        refresh_order_totals([self.pk])
+        self.refresh_from_db(fields=['subtotal', 'discount', 'total', 'item_count'])
     
 
 class OrderItem(models.Model):
@@ -126,13 +279,13 @@ class OrderItem(models.Model):
 
     @property
     def line_total(self):
-        """Return total price for this item (quantity * unit price)."""
+        """Return total price for this item (quantity * snapshotted unit price)."""
         try:
             unit_price = None
-            if self.product and hasattr(self.product, 'price') and self.product.price is not None:
-                unit_price = self.product.price
-            elif self.product_price is not None:
+            if self.product_price is not None:
                 unit_price = self.product_price
+            elif self.product and hasattr(self.product, 'price') and self.product.price is not None:
+                unit_price = self.product.price
             else:
                 unit_price = 0
             return (self.quantity or 0) * unit_price
@@ -145,6 +298,115 @@ class OrderItem(models.Model):
         return self.line_total
         
 
+
+class DailySales(models.Model):
+    """Units and gross revenue of paid orders per day, product, category, vendor and coupon.
+
+    Category and vendor are the product's at the time of sale. Rows are
+    added to at order placement (store.rollups.record_order) and rebuilt from
+    orders by the rebuild_sales_rollups command; ``key`` identifies the row
+    for those increments.
+    """
+    key = models.CharField(max_length=80, unique=True, editable=False)
+    day = models.DateField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    coupon = models.ForeignKey('coupons.Coupon', on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"{self.day}: {self.units} x {self.product_id}"
+
+
+class DailyOrderStats(models.Model):
+    """Paid orders per day and coupon, with their summed subtotal, discount and total."""
+    key = models.CharField(max_length=40, unique=True, editable=False)
+    day = models.DateField(db_index=True)
+    coupon = models.ForeignKey('coupons.Coupon', on_delete=models.SET_NULL, null=True, related_name='daily_order_stats')
+    orders = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily order stats'
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} orders"
+
+
+class CustomerRFM(models.Model):
+    """Recency/frequency/monetary scores of a customer's paid orders.
+
+    Written in bulk by store.customer_analytics (the build_customer_analytics
+    command); scores are quintiles, 5 being the best.
+    """
+    SEGMENT_CHOICES = [
+        ('champions', 'Champions'),
+        ('loyal', 'Loyal'),
+        ('potential', 'Potential loyalists'),
+        ('new', 'New customers'),
+        ('need_attention', 'Need attention'),
+        ('at_risk', 'At risk'),
+        ('hibernating', 'Hibernating'),
+    ]
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='rfm')
+    recency_days = models.PositiveIntegerField()
+    frequency = models.PositiveIntegerField()
+    monetary = models.DecimalField(max_digits=14, decimal_places=2)
+    r_score = models.PositiveSmallIntegerField()
+    f_score = models.PositiveSmallIntegerField()
+    m_score = models.PositiveSmallIntegerField()
+    segment = models.CharField(max_length=20, choices=SEGMENT_CHOICES, db_index=True)
+    first_order_at = models.DateTimeField()
+    last_order_at = models.DateTimeField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.customer} ({self.get_segment_display()})"
+
+    @property
+    def score(self):
+        return f"{self.r_score}{self.f_score}{self.m_score}"
+
+
+class CohortRetention(models.Model):
+    """Customers of a monthly acquisition cohort who ordered again ``months_since`` months later."""
+    cohort = models.DateField(help_text='First day of the month of the first paid order')
+    months_since = models.PositiveSmallIntegerField()
+    customers = models.PositiveIntegerField()
+    cohort_size = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('cohort', 'months_since')
+        ordering = ['cohort', 'months_since']
+
+    @property
+    def rate(self):
+        return self.customers / self.cohort_size if self.cohort_size else 0
+
+
+
+class ProductForecast(models.Model):
+    """Nightly demand forecast and restock suggestion for a product (see store.forecasting)."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecast')
+    daily_units = models.FloatField(help_text='Smoothed units sold per day')
+    forecast_units = models.PositiveIntegerField(help_text='Expected units sold over the forecast horizon')
+    stock = models.IntegerField(null=True, blank=True, help_text='Available units when computed; empty if untracked')
+    days_of_cover = models.FloatField(null=True, blank=True, help_text='Days the stock lasts at daily_units')
+    restock_units = models.PositiveIntegerField(default=0)
+    needs_restock = models.BooleanField(default=False, db_index=True)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product}: {self.daily_units:.1f}/day"
+
 class ShippingAdderss(models.Model):
     custamer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
     order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True)
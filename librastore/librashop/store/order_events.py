@@ -0,0 +1,255 @@
+"""
+Push channel for order tracking updates (Server-Sent Events).
+
+Delivery is an in-process pub/sub: every open stream is an asyncio.Queue
+registered under its user id, and an order save hands the new tracking
+state to the queues of the owner's streams in this process. With several
+worker processes on Postgres, the same event is also sent with
+``pg_notify``; a listener thread in each process relays events that
+originated in another process.
+
+The stream itself is a bare ASGI app (``order_events_app``, mounted by
+``librashop.asgi``) rather than a Django view: a Django request keeps a
+worker thread pinned for as long as its response is open, while an idle
+stream here is only a coroutine waiting on its queue. The session lookup
+runs once, in the shared thread pool, and gives its database connection
+back before streaming starts.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import uuid
+from collections import defaultdict
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import connection, connections, transaction
+from django.http.cookie import parse_cookie
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'order_events'
+QUEUE_SIZE = 20
+KEEPALIVE_SECONDS = 25
+# Sent to the browser: how long EventSource waits before reconnecting
+RECONNECT_MILLISECONDS = 10000
+
+# Tracking stage progress mapping
+TRACKING_PROGRESS = {
+    'placed': {'percent': 5, 'label': 'Placed'},
+    'confirmed': {'percent': 20, 'label': 'Confirmed'},
+    'packed': {'percent': 40, 'label': 'Packed'},
+    'shipped': {'percent': 65, 'label': 'Shipped'},
+    'out_for_delivery': {'percent': 85, 'label': 'Out for delivery'},
+    'delivered': {'percent': 100, 'label': 'Delivered'},
+    'cancelled': {'percent': 0, 'label': 'Cancelled'},
+}
+
+# Identifies this process in NOTIFY payloads so it skips its own events
+_ORIGIN = uuid.uuid4().hex
+
+
+def tracking_progress(order):
+    stage = getattr(order, 'tracking_stage', 'placed') or 'placed'
+    return stage, TRACKING_PROGRESS.get(stage, TRACKING_PROGRESS['placed'])
+
+
+def order_payload(order):
+    """The tracking state a customer's order page shows, as sent to pollers and streams."""
+    stage, progress = tracking_progress(order)
+    return {
+        'id': order.id,
+        'status': order.status,
+        'tracking_stage': stage,
+        'tracking_label': progress['label'],
+        'percent': progress['percent'],
+        'tracking_number': getattr(order, 'tracking_number', '') or '',
+        'carrier': getattr(order, 'carrier', '') or '',
+    }
+
+
+class OrderEventBroker:
+    """Fan-out of order events to the open streams in this process."""
+
+    def __init__(self):
+        self._streams = defaultdict(set)
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, user_id):
+        """Register a stream for ``user_id``; must be called on the event loop that will read it."""
+        queue = asyncio.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._streams[user_id].add((asyncio.get_running_loop(), queue))
+        self._start_listener()
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            streams = self._streams.get(user_id)
+            if streams:
+                streams.difference_update({entry for entry in streams if entry[1] is queue})
+                if not streams:
+                    del self._streams[user_id]
+
+    def deliver(self, user_id, event):
+        """Hand ``event`` to the user's streams; safe to call from any thread."""
+        with self._lock:
+            streams = list(self._streams.get(user_id, ()))
+        for loop, queue in streams:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The stream's loop has shut down; its queue goes with it
+                pass
+
+    def stream_count(self):
+        with self._lock:
+            return sum(len(streams) for streams in self._streams.values())
+
+    def _start_listener(self):
+        if connection.vendor != 'postgresql' or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=_listen, name='order-events-listener', daemon=True)
+                self._listener.start()
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # A stream that far behind catches up from my_orders_status when it reconnects
+        pass
+
+
+broker = OrderEventBroker()
+
+
+# ---- Publishing ----
+
+def publish(user_id, event):
+    """Send ``event`` to the user's streams in every process."""
+    broker.deliver(user_id, event)
+    if connection.vendor == 'postgresql':
+        message = json.dumps({'origin': _ORIGIN, 'user': user_id, 'event': event})
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, message])
+        except Exception:
+            logger.exception("Could not notify other processes about order %s", event.get('id'))
+
+
+def publish_order_change(user_id, order):
+    """Push the order's tracking state to its owner once the current transaction commits."""
+    if not user_id:
+        return
+    event = order_payload(order)
+    transaction.on_commit(lambda: publish(user_id, event))
+
+
+def _listen():
+    # Dedicated autocommit connection; LISTEN only works outside a transaction
+    while True:
+        try:
+            raw = connection.get_new_connection(connection.get_connection_params())
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            while True:
+                if select.select([raw], [], [], KEEPALIVE_SECONDS) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    _relay(raw.notifies.pop(0).payload)
+        except Exception:
+            logger.exception("Order event listener lost its connection; reconnecting")
+            threading.Event().wait(5)
+
+
+def _relay(payload):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    if message.get('origin') != _ORIGIN:
+        broker.deliver(message.get('user'), message.get('event'))
+
+
+# ---- ASGI endpoint ----
+
+def _session_user_id(session_key):
+    try:
+        engine = import_module(settings.SESSION_ENGINE)
+
+        class SessionRequest:
+            session = engine.SessionStore(session_key)
+
+        user = get_user(SessionRequest())
+        return user.pk if user.is_authenticated else None
+    finally:
+        # This is a shared pool thread; don't leave a connection open per stream
+        connections.close_all()
+
+
+async def _send_status(send, status):
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'cache-control', b'no-store')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _frame(event):
+    return f"event: order\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def order_events_app(scope, receive, send):
+    """Stream the signed-in customer's order updates as ``event: order`` messages."""
+    headers = dict(scope.get('headers', []))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    user_id = None
+    if session_key:
+        user_id = await sync_to_async(_session_user_id, thread_sensitive=False)(session_key)
+    if user_id is None:
+        await _send_status(send, 403)
+        return
+
+    queue = broker.subscribe(user_id)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    next_event = None
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-store'),
+            # Tell nginx-style proxies not to buffer the stream
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': f"retry: {RECONNECT_MILLISECONDS}\n\n".encode(), 'more_body': True})
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                break
+            if next_event in done:
+                chunk = _frame(next_event.result())
+                next_event = None
+            else:
+                chunk = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        broker.unsubscribe(user_id, queue)
+        disconnected.cancel()
+        if next_event is not None:
+            next_event.cancel()
@@ -0,0 +1,42 @@
+"""
+Per-customer order-state versions.
+
+Each user's orders have a version string cached under their user id, derived
+from ``max(Order.last_updated)`` and the order count. Anything that changes
+an order forgets the cached version (the Order post_save signal does this;
+bulk updates must call ``forget_versions`` themselves), so an unchanged
+version means nothing a poller could see has changed.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Order
+
+VERSION_TTL = 300
+
+
+def _key(user_id):
+    return f"orders:version:{user_id}"
+
+
+def order_state_version(user_id):
+    """Cached version for the user's orders; computed with one aggregate on a miss."""
+    version = cache.get(_key(user_id))
+    if version is None:
+        state = Order.objects.filter(custamer__user_id=user_id).aggregate(
+            latest=Max('last_updated'), count=Count('id'),
+        )
+        latest = state['latest'].timestamp() if state['latest'] else 0
+        version = f"{state['count']}-{latest:.6f}"
+        # Bounded lifetime covers a version computed just before a concurrent change
+        cache.set(_key(user_id), version, VERSION_TTL)
+    return version
+
+
+def cached_order_state_version(user_id):
+    """The cached version only, or None; never touches the database."""
+    return cache.get(_key(user_id))
+
+
+def forget_versions(user_ids):
+    cache.delete_many([_key(user_id) for user_id in set(user_ids) if user_id])
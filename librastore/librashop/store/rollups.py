@@ -0,0 +1,137 @@
+"""
+Daily sales rollups (DailySales, DailyOrderStats) for the admin dashboards.
+
+Only paid orders are counted, bucketed by their local date. ``record_order``
+adds a newly placed order to its buckets with conditional F() increments;
+``rebuild`` recomputes a date range from the orders themselves with grouped
+queries, which also repairs anything the increments missed (refunds,
+cancellations, items edited after placement).
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from librashop.reporting import in_range
+
+from .models import DailyOrderStats, DailySales, Order, OrderItem
+from .totals import line_amount
+
+SALES_STATUS = 'paid'
+
+
+def sales_orders():
+    return Order.objects.filter(status=SALES_STATUS)
+
+
+def sales_key(day, product_id, category_id, vendor_id, coupon_id):
+    return f"{day:%Y%m%d}:{product_id or 0}:{category_id or 0}:{vendor_id or 0}:{coupon_id or 0}"
+
+
+def order_stats_key(day, coupon_id):
+    return f"{day:%Y%m%d}:{coupon_id or 0}"
+
+
+def _add(model, key, fields, amounts):
+    """Add ``amounts`` to the row for ``key``, creating it if needed."""
+    increments = {name: F(name) + value for name, value in amounts.items()}
+    if model.objects.filter(key=key).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(key=key, **fields, **amounts)
+    except IntegrityError:
+        # Another placement created the row first
+        model.objects.filter(key=key).update(**increments)
+
+
+def record_order(order):
+    """Add a just-placed order to the rollups (call inside the placement transaction)."""
+    from coupons.models import OrderCoupon
+
+    if order.status != SALES_STATUS:
+        return
+    day = timezone.localdate(order.date_odered)
+    coupon_id = OrderCoupon.objects.filter(order=order).values_list('coupon_id', flat=True).first()
+    lines = (
+        OrderItem.objects.filter(order=order)
+        .values('product_id', category_id=F('product__category_id'), vendor_id=F('product__vendor_id'))
+        .annotate(units=Sum('quantity'), gross=Sum(line_amount()))
+        .order_by('product_id')
+    )
+    for line in lines:
+        _add(DailySales, sales_key(day, line['product_id'], line['category_id'], line['vendor_id'], coupon_id), {
+            'day': day,
+            'product_id': line['product_id'],
+            'category_id': line['category_id'],
+            'vendor_id': line['vendor_id'],
+            'coupon_id': coupon_id,
+        }, {'units': line['units'] or 0, 'revenue': line['gross'] or 0})
+    _add(DailyOrderStats, order_stats_key(day, coupon_id), {'day': day, 'coupon_id': coupon_id}, {
+        'orders': 1, 'subtotal': order.subtotal, 'discount': order.discount, 'total': order.total,
+    })
+
+
+def first_sales_day():
+    first = sales_orders().aggregate(first=Min('date_odered'))['first']
+    return timezone.localdate(first) if first else None
+
+
+def rebuild(start, end):
+    """Recompute the rollups for days in [start, end); returns (sales rows, order-stat rows)."""
+    orders = in_range(sales_orders(), 'date_odered', start, end)
+    local_day = TruncDate('date_odered', tzinfo=timezone.get_current_timezone())
+    sales = (
+        OrderItem.objects.filter(order__in=orders)
+        .values(
+            'product_id',
+            day=TruncDate('order__date_odered', tzinfo=timezone.get_current_timezone()),
+            category_id=F('product__category_id'),
+            vendor_id=F('product__vendor_id'),
+            coupon_id=F('order__ordercoupon__coupon_id'),
+        )
+        .annotate(units=Sum('quantity'), gross=Sum(line_amount()))
+        .order_by()
+    )
+    stats = (
+        orders.values(day=local_day, coupon_id=F('ordercoupon__coupon_id'))
+        .annotate(
+            order_count=Count('id'),
+            sum_subtotal=Sum('subtotal'), sum_discount=Sum('discount'), sum_total=Sum('total'),
+        )
+        .order_by()
+    )
+    sales_rows = [
+        DailySales(
+            key=sales_key(row['day'], row['product_id'], row['category_id'], row['vendor_id'], row['coupon_id']),
+            day=row['day'], product_id=row['product_id'], category_id=row['category_id'],
+            vendor_id=row['vendor_id'], coupon_id=row['coupon_id'],
+            units=row['units'] or 0, revenue=row['gross'] or 0,
+        )
+        for row in sales
+    ]
+    stats_rows = [
+        DailyOrderStats(
+            key=order_stats_key(row['day'], row['coupon_id']), day=row['day'], coupon_id=row['coupon_id'],
+            orders=row['order_count'], subtotal=row['sum_subtotal'] or 0,
+            discount=row['sum_discount'] or 0, total=row['sum_total'] or 0,
+        )
+        for row in stats
+    ]
+    with transaction.atomic():
+        DailySales.objects.filter(day__gte=start, day__lt=end).delete()
+        DailyOrderStats.objects.filter(day__gte=start, day__lt=end).delete()
+        DailySales.objects.bulk_create(sales_rows, batch_size=1000)
+        DailyOrderStats.objects.bulk_create(stats_rows, batch_size=1000)
+    return len(sales_rows), len(stats_rows)
+
+
+def rebuild_range(start, end, chunk_days=31):
+    """Rebuild [start, end) one chunk of days at a time; yields (chunk_start, chunk_end, counts)."""
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+        yield chunk_start, chunk_end, rebuild(chunk_start, chunk_end)
+        chunk_start = chunk_end
@@ -0,0 +1,232 @@
+"""
+In-memory columnar sales cube for ad-hoc dashboard slicing.
+
+Every item line of a paid order is one fact, held in NumPy columns: the
+order id, the local order day (datetime64[D]), dictionary-encoded product,
+category, vendor and coupon codes (int32, code 0 = none), units, and the
+gross line amount in integer paise (int64). Group-by and filter queries are
+answered with boolean masks and ``bincount`` over those columns instead of
+a new ORM aggregate per slice.
+
+Each worker process keeps its own cube. It is refreshed incrementally from
+orders whose ``last_updated`` moved past the last refresh (their facts are
+replaced wholesale), and reloaded in full periodically to pick up what
+``last_updated`` doesn't show: deleted orders and items edited after
+placement.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Category, Order, OrderItem, Product
+from .rollups import SALES_STATUS
+
+REFRESH_SECONDS = 30
+FULL_RELOAD_SECONDS = 3600
+# Orders saved just before a refresh may commit after it; re-read this much overlap
+WATERMARK_OVERLAP = timedelta(seconds=60)
+DIMENSIONS = ('product', 'category', 'vendor', 'coupon')
+TIME_GROUPS = ('day', 'month')
+
+
+class Dimension:
+    """Append-only dictionary encoding of a foreign key: id <-> dense int code."""
+
+    def __init__(self):
+        self.ids = [None]
+        self._codes = {None: 0}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self, raw_id):
+        code = self._codes.get(raw_id)
+        if code is None:
+            code = self._codes[raw_id] = len(self.ids)
+            self.ids.append(raw_id)
+        return code
+
+    def codes_for(self, raw_ids):
+        return np.array([self._codes[raw_id] for raw_id in raw_ids if raw_id in self._codes], dtype=np.int32)
+
+
+@dataclass
+class Facts:
+    order_id: np.ndarray
+    day: np.ndarray
+    product: np.ndarray
+    category: np.ndarray
+    vendor: np.ndarray
+    coupon: np.ndarray
+    units: np.ndarray
+    paise: np.ndarray
+
+    def __len__(self):
+        return len(self.order_id)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_columns({name: [] for name in cls.__dataclass_fields__})
+
+    @classmethod
+    def from_columns(cls, columns):
+        return cls(
+            order_id=np.asarray(columns['order_id'], dtype=np.int64),
+            day=np.asarray(columns['day'], dtype='datetime64[D]'),
+            product=np.asarray(columns['product'], dtype=np.int32),
+            category=np.asarray(columns['category'], dtype=np.int32),
+            vendor=np.asarray(columns['vendor'], dtype=np.int32),
+            coupon=np.asarray(columns['coupon'], dtype=np.int32),
+            units=np.asarray(columns['units'], dtype=np.int32),
+            paise=np.asarray(columns['paise'], dtype=np.int64),
+        )
+
+    def select(self, mask):
+        return Facts(**{name: getattr(self, name)[mask] for name in self.__dataclass_fields__})
+
+    def concat(self, other):
+        return Facts(**{
+            name: np.concatenate([getattr(self, name), getattr(other, name)])
+            for name in self.__dataclass_fields__
+        })
+
+
+class SalesCube:
+    def __init__(self):
+        self.dimensions = {name: Dimension() for name in DIMENSIONS}
+        self.facts = Facts.empty()
+        self.watermark = None
+        self.refreshed_at = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    # ---- Loading ----
+
+    def _read(self, orders):
+        """Fact columns for the item lines of ``orders`` (a paid-order queryset)."""
+        rows = (
+            OrderItem.objects.filter(order__in=orders)
+            .annotate(day=TruncDate('order__date_odered', tzinfo=timezone.get_current_timezone()))
+            .values_list(
+                'order_id', 'day', 'product_id', 'product__category_id', 'product__vendor_id',
+                'order__ordercoupon__coupon_id', 'quantity', 'product_price', 'product__price',
+            )
+        )
+        columns = {name: [] for name in Facts.__dataclass_fields__}
+        encode = {name: self.dimensions[name].encode for name in DIMENSIONS}
+        for order_id, day, product, category, vendor, coupon, quantity, price, live_price in rows.iterator(chunk_size=5000):
+            quantity = quantity or 0
+            unit_price = price if price is not None else live_price
+            columns['order_id'].append(order_id)
+            columns['day'].append(day)
+            columns['product'].append(encode['product'](product))
+            columns['category'].append(encode['category'](category))
+            columns['vendor'].append(encode['vendor'](vendor))
+            columns['coupon'].append(encode['coupon'](coupon))
+            columns['units'].append(quantity)
+            columns['paise'].append(quantity * int((unit_price or 0) * 100))
+        return Facts.from_columns(columns)
+
+    def _load_all(self):
+        watermark = Order.objects.aggregate(latest=Max('last_updated'))['latest']
+        self.facts = self._read(Order.objects.filter(status=SALES_STATUS))
+        self.watermark = watermark
+        self.loaded_at = time.monotonic()
+
+    def _apply_changes(self):
+        since = self.watermark - WATERMARK_OVERLAP
+        changed = list(Order.objects.filter(last_updated__gt=since).values_list('id', 'last_updated'))
+        if not changed:
+            return
+        changed_ids = [order_id for order_id, _ in changed]
+        kept = self.facts.select(~np.isin(self.facts.order_id, changed_ids))
+        fresh = self._read(Order.objects.filter(id__in=changed_ids, status=SALES_STATUS))
+        self.facts = kept.concat(fresh)
+        self.watermark = max(self.watermark, max(updated for _, updated in changed))
+
+    def refresh(self, force=False):
+        """Bring the cube up to date if it is older than REFRESH_SECONDS (or ``force``)."""
+        now = time.monotonic()
+        if not force and self.refreshed_at is not None and now - self.refreshed_at < REFRESH_SECONDS:
+            return
+        with self._lock:
+            if not force and self.refreshed_at is not None and now - self.refreshed_at < REFRESH_SECONDS:
+                return
+            if self.watermark is None or now - self.loaded_at > FULL_RELOAD_SECONDS:
+                self._load_all()
+            else:
+                self._apply_changes()
+            self.refreshed_at = time.monotonic()
+
+    # ---- Querying ----
+
+    def _mask(self, facts, start, end, filters):
+        mask = np.ones(len(facts), dtype=bool)
+        if start is not None:
+            mask &= facts.day >= np.datetime64(start, 'D')
+        if end is not None:
+            mask &= facts.day < np.datetime64(end, 'D')
+        for name, ids in filters.items():
+            if ids:
+                mask &= np.isin(getattr(facts, name), self.dimensions[name].codes_for(ids))
+        return mask
+
+    def query(self, group_by='category', start=None, end=None, **filters):
+        """Units, gross revenue (paise) and order count per ``group_by`` over [start, end).
+
+        ``group_by`` is a dimension (product, category, vendor, coupon) or
+        ``day``/``month``; ``filters`` map dimensions to lists of ids.
+        Returns ``[(key, units, paise, orders), ...]``, largest revenue first
+        for dimensions and in time order for day/month.
+        """
+        if group_by not in DIMENSIONS + TIME_GROUPS:
+            raise ValueError(f"Unknown group: {group_by}")
+        facts = self.facts
+        selected = facts.select(self._mask(facts, start, end, filters))
+        if group_by in TIME_GROUPS:
+            days = selected.day if group_by == 'day' else selected.day.astype('datetime64[M]')
+            keys, groups = np.unique(days, return_inverse=True)
+            size = len(keys)
+        else:
+            groups = getattr(selected, group_by)
+            size = len(self.dimensions[group_by])
+            keys = np.array(self.dimensions[group_by].ids, dtype=object)
+        units = np.bincount(groups, weights=selected.units, minlength=size)
+        paise = np.bincount(groups, weights=selected.paise, minlength=size)
+        # Distinct orders per group: unique (group, order) pairs, then count per group
+        stride = int(selected.order_id.max(initial=0)) + 1
+        pairs = np.unique(groups.astype(np.int64) * stride + selected.order_id)
+        orders = np.bincount(pairs // stride, minlength=size)
+        present = np.flatnonzero(orders)
+        if group_by not in TIME_GROUPS:
+            present = present[np.argsort(-paise[present], kind='stable')]
+        return [(keys[i], int(units[i]), int(paise[i]), int(orders[i])) for i in present]
+
+    def labels(self, group_by, keys):
+        """Display names for the keys a query returned."""
+        if group_by == 'day':
+            return {key: str(key) for key in keys}
+        if group_by == 'month':
+            return {key: str(key)[:7] for key in keys}
+        ids = [key for key in keys if key is not None]
+        if group_by == 'product':
+            names = dict(Product.objects.filter(id__in=ids).values_list('id', 'name'))
+        elif group_by == 'category':
+            names = dict(Category.objects.filter(id__in=ids).values_list('id', 'name'))
+        elif group_by == 'vendor':
+            from vendors.models import Vendor
+            names = dict(Vendor.objects.filter(id__in=ids).values_list('id', 'store_name'))
+        else:
+            from coupons.models import Coupon
+            names = dict(Coupon.objects.filter(id__in=ids).values_list('id', 'code'))
+        names[None] = 'None'
+        return {key: names.get(key, f"#{key}") for key in keys}
+
+
+cube = SalesCube()
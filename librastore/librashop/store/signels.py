@@ -1,5 +1,6 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
+from django.db import connections, transaction
 from django.conf import settings
 from .models import Customer
 
@@ -14,4 +15,72 @@ def create_or_update_customer(sender, instance, created, **kwargs):
         if hasattr(instance, 'customer'):
             instance.customer.name = instance.username
             instance.customer.email = instance.email
-            instance.customer.save()
\ No newline at end of file
+            instance.customer.save()
+
+@receiver([post_save, post_delete], sender='store.OrderItem')
+def refresh_order_totals_on_item_change(sender, instance, **kwargs):
+    """Keep the stored order totals in sync when items are edited after placement."""
+    from .totals import refresh_order_totals
+    if instance.order_id:
+        refresh_order_totals([instance.order_id])
+
+
+@receiver([post_save, post_delete], sender='store.Order')
+def forget_order_state_version(sender, instance, signal, **kwargs):
+    """Make the owner's order-status pollers see the change, and push it to their open streams."""
+    from .order_events import publish_order_change
+    from .order_state import forget_versions
+    if instance.custamer_id:
+        user_id = Customer.objects.filter(pk=instance.custamer_id).values_list('user_id', flat=True).first()
+        transaction.on_commit(lambda: forget_versions([user_id]))
+        if signal is post_save:
+            publish_order_change(user_id, instance)
+
+
+@receiver([post_save, post_delete], sender='store.Product')
+@receiver([post_save, post_delete], sender='store.Category')
+def bump_catalog_version(sender, **kwargs):
+    """Cached catalog pages are keyed by the catalog version; bulk edits bump it themselves."""
+    from .catalog import bump_catalog_version
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver([post_save, post_delete], sender='store.Product')
+def bump_vendor_storefront(sender, instance, **kwargs):
+    """A product change only invalidates its own vendor's storefront."""
+    from .catalog import bump_vendor_version
+    transaction.on_commit(lambda: bump_vendor_version(instance.vendor_id))
+
+
+@receiver([post_save, post_delete], sender='store.Category')
+def bump_storefronts(sender, **kwargs):
+    """Category names and visibility show on every storefront."""
+    from .catalog import bump_storefronts_version
+    transaction.on_commit(bump_storefronts_version)
+
+
+@receiver([post_save, post_delete], sender='vendors.Vendor')
+def bump_vendor_settings(sender, instance, **kwargs):
+    """Store name, logo and address changes (VendorSettingsForm) show on the storefront."""
+    from .catalog import bump_vendor_version
+    transaction.on_commit(lambda: bump_vendor_version(instance.pk))
+
+
+@receiver([post_save, post_delete], sender='reviews.Review')
+def count_vendor_rating(sender, instance, signal, created=False, **kwargs):
+    """Keep the product vendor's rating counters (vendors.stats) in step with its reviews."""
+    from vendors import stats
+    if signal is post_delete:
+        stats.add_review(instance, sign=-1)
+    elif created:
+        stats.add_review(instance)
+    else:
+        stats.review_edited(instance)
+
+
+@receiver(post_migrate)
+def repair_search_indexes(sender, using, **kwargs):
+    """SQLite drops a table's triggers when a migration rebuilds it; put the search ones back."""
+    if sender.name == 'store':
+        from librashop.search import repair_indexes
+        repair_indexes(connections[using])
@@ -1,3 +1,364 @@
-from django.test import TestCase
+import threading
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from coupons.models import Coupon, OrderCoupon
+from librashop.pagination import keyset_page
+
+from . import carrier_standin, flash_sale
+from .carrier_sync import CarrierSync
+from .carriers import TrackingUpdate, load_adapters
+from .inventory import (
+    InsufficientStock, adjust_stock, commit_cart, in_stock_only, release_cart, release_expired, reserve_cart,
+    return_flash_allocation,
+)
+from .models import Category, FlashSale, Inventory, Order, OrderItem, Product, StockReservation
+from .views import record_order_coupon
+
+
+class StockTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Books', slug='books')
+
+    def product(self, slug, on_hand=None):
+        product = Product.objects.create(name=slug, slug=slug, category=self.category, price=10, available=True)
+        if on_hand is not None:
+            Inventory.objects.create(product=product, on_hand=on_hand, available=on_hand)
+        return product
+
+    def cart(self, *lines):
+        cart = Cart.objects.create()
+        for product, quantity in lines:
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        return cart
+
+    def stock(self, product):
+        return Inventory.objects.values_list('on_hand', 'reserved', 'available').get(product=product)
+
+
+class ReserveCartTests(StockTestCase):
+    def test_reserves_tracked_lines_only(self):
+        tracked, untracked = self.product('tracked', on_hand=5), self.product('untracked')
+        cart = self.cart((tracked, 2), (untracked, 3))
+        reserve_cart(cart)
+        self.assertEqual(self.stock(tracked), (5, 2, 3))
+        self.assertEqual(StockReservation.objects.filter(cart=cart, status=StockReservation.HELD).count(), 1)
+
+    def test_not_enough_stock_reserves_nothing(self):
+        plenty, scarce = self.product('plenty', on_hand=10), self.product('scarce', on_hand=1)
+        cart = self.cart((plenty, 3), (scarce, 2))
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_cart(cart)
+        self.assertEqual(raised.exception.product, scarce)
+        self.assertEqual(raised.exception.available, 1)
+        # The line that did fit is rolled back with the one that didn't
+        self.assertEqual(self.stock(plenty), (10, 0, 10))
+        self.assertFalse(StockReservation.objects.filter(cart=cart).exists())
+
+    def test_last_unit_goes_to_one_cart(self):
+        product = self.product('last', on_hand=1)
+        reserve_cart(self.cart((product, 1)))
+        with self.assertRaises(InsufficientStock):
+            reserve_cart(self.cart((product, 1)))
+        self.assertEqual(self.stock(product), (1, 1, 0))
+
+    def test_rereserving_releases_the_earlier_hold(self):
+        product = self.product('again', on_hand=5)
+        cart = self.cart((product, 2))
+        reserve_cart(cart)
+        reserve_cart(cart)
+        self.assertEqual(self.stock(product), (5, 2, 3))
+        self.assertEqual(StockReservation.objects.filter(cart=cart, status=StockReservation.RELEASED).count(), 1)
+
+    def test_release_cart_returns_stock(self):
+        product = self.product('released', on_hand=4)
+        cart = self.cart((product, 3))
+        reserve_cart(cart)
+        self.assertEqual(release_cart(cart), 1)
+        self.assertEqual(self.stock(product), (4, 0, 4))
+
+
+class AdjustStockTests(StockTestCase):
+    def test_refuses_to_go_below_zero(self):
+        product = self.product('adjusted', on_hand=3)
+        reserve_cart(self.cart((product, 2)))
+        self.assertFalse(adjust_stock(product.pk, -2))
+        self.assertTrue(adjust_stock(product.pk, -1))
+        self.assertEqual(self.stock(product), (2, 2, 0))
+
+
+class ReleaseExpiredTests(StockTestCase):
+    def test_releases_only_expired_holds(self):
+        product = self.product('expiring', on_hand=5)
+        old, fresh = self.cart((product, 2)), self.cart((product, 1))
+        reserve_cart(old)
+        reserve_cart(fresh)
+        StockReservation.objects.filter(cart=old).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(self.stock(product), (5, 1, 4))
+        self.assertEqual(StockReservation.objects.get(cart=old).status, StockReservation.EXPIRED)
+        # Nothing left to release
+        self.assertEqual(release_expired(), 0)
+
+
+class CommitCartTests(StockTestCase):
+    def test_commit_turns_held_into_sold(self):
+        product = self.product('sold', on_hand=5)
+        cart = self.cart((product, 2))
+        reserve_cart(cart)
+        order = Order.objects.create(status='paid')
+        commit_cart(cart, order)
+        self.assertEqual(self.stock(product), (3, 0, 3))
+        reservation = StockReservation.objects.get(cart=cart)
+        self.assertEqual((reservation.status, reservation.order), (StockReservation.COMMITTED, order))
+
+    def test_committing_twice_sells_once(self):
+        product = self.product('twice', on_hand=5)
+        cart = self.cart((product, 2))
+        reserve_cart(cart)
+        order = Order.objects.create(status='paid')
+        commit_cart(cart, order)
+        commit_cart(cart, order)
+        self.assertEqual(self.stock(product), (3, 0, 3))
+
+    def test_expired_hold_is_taken_from_available_again(self):
+        product = self.product('late', on_hand=5)
+        cart = self.cart((product, 2))
+        reserve_cart(cart)
+        StockReservation.objects.filter(cart=cart).update(expires_at=timezone.now() - timedelta(minutes=1))
+        release_expired()
+        commit_cart(cart, Order.objects.create(status='paid'))
+        self.assertEqual(self.stock(product), (3, 0, 3))
+        self.assertEqual(StockReservation.objects.get(cart=cart).status, StockReservation.COMMITTED)
+
+    def test_expired_hold_sold_out_meanwhile_is_still_committed(self):
+        product = self.product('gone', on_hand=2)
+        late = self.cart((product, 2))
+        reserve_cart(late)
+        StockReservation.objects.filter(cart=late).update(expires_at=timezone.now() - timedelta(minutes=1))
+        release_expired()
+        reserve_cart(self.cart((product, 2)))
+        with self.assertLogs('store.inventory', 'WARNING'):
+            commit_cart(late, Order.objects.create(status='paid'))
+        # The other cart's hold is untouched
+        self.assertEqual(self.stock(product), (2, 2, 0))
+        self.assertEqual(StockReservation.objects.get(cart=late).status, StockReservation.COMMITTED)
+
+
+class FlashSaleStockTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product_on_sale = self.product('drop', on_hand=10)
+        now = timezone.now()
+        self.sale = FlashSale.objects.create(
+            product=self.product_on_sale, quantity=4,
+            starts_at=now - timedelta(minutes=1), ends_at=now + timedelta(hours=1),
+        )
+        flash_sale.live_sales()
+
+    def end_sale(self):
+        FlashSale.objects.filter(pk=self.sale.pk).update(ends_at=timezone.now() - timedelta(seconds=1))
+        flash_sale.invalidate_live_sales()
+        return FlashSale.objects.get(pk=self.sale.pk)
+
+    def test_allocation_is_set_aside_as_the_sale_starts(self):
+        self.assertEqual(FlashSale.objects.get(pk=self.sale.pk).allocated, 4)
+        self.assertEqual(self.stock(self.product_on_sale), (10, 4, 6))
+        # Regular stock checks can't see the sale's units
+        self.assertFalse(adjust_stock(self.product_on_sale.pk, -7))
+
+    def test_sale_product_counts_as_in_stock_while_units_are_left(self):
+        Inventory.objects.filter(product=self.product_on_sale).update(on_hand=4, available=0)
+        self.assertEqual(in_stock_only(Product.objects.filter(pk=self.product_on_sale.pk)).count(), 1)
+
+    def test_sale_units_are_sold_once(self):
+        cart = self.cart((self.product_on_sale, 3))
+        reserve_cart(cart)
+        self.assertEqual(flash_sale.remaining(self.sale), 1)
+        commit_cart(cart, Order.objects.create(status='paid'))
+        self.assertEqual(self.stock(self.product_on_sale), (7, 1, 6))
+
+        # The unsold unit goes back once the sale is over, and only once
+        sale = self.end_sale()
+        self.assertEqual(return_flash_allocation(sale), 1)
+        self.assertEqual(return_flash_allocation(FlashSale.objects.get(pk=sale.pk)), 0)
+        self.assertEqual(self.stock(self.product_on_sale), (7, 0, 7))
+
+    def test_allocation_waits_for_open_holds(self):
+        cart = self.cart((self.product_on_sale, 2))
+        reserve_cart(cart)
+        sale = self.end_sale()
+        self.assertEqual(return_flash_allocation(sale), 0)
+        commit_cart(cart, Order.objects.create(status='paid'))
+        self.assertEqual(return_flash_allocation(FlashSale.objects.get(pk=sale.pk)), 2)
+        self.assertEqual(self.stock(self.product_on_sale), (8, 0, 8))
+
+
+
+class FlashAdmissionTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.first, self.second = [
+            FlashSale.objects.create(
+                product=self.product(slug, on_hand=5), quantity=2, max_shoppers=1,
+                starts_at=now - timedelta(minutes=1), ends_at=now + timedelta(hours=1),
+            )
+            for slug in ('first', 'second')
+        ]
+
+    def shopper(self, username):
+        request = RequestFactory().get('/checkout/')
+        request.user = get_user_model().objects.create_user(username, password='x')
+        return request
+
+    def test_waiting_for_one_sale_gives_back_the_others(self):
+        self.assertEqual(flash_sale.admit(self.shopper('one'), [self.second]), [self.second])
+        # The second sale is full, so the first sale's slot is returned rather than used up
+        self.assertIsNone(flash_sale.admit(self.shopper('two'), [self.first, self.second]))
+        self.assertEqual(flash_sale.admit(self.shopper('three'), [self.first]), [self.first])
+        self.assertIsNone(flash_sale.admit(self.shopper('four'), [self.first]))
+
+
+class RecordOrderCouponTests(StockTestCase):
+    def test_discount_leaves_out_shipping_and_tax(self):
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code='TEN', discount_type='Percentage', value=10,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+        order = Order.objects.create(status='paid')
+        OrderItem.objects.create(order=order, product=self.product('coupon'), quantity=2, product_name='x', product_price=100)
+        request = RequestFactory().get('/')
+        request.session = {'coupon_code': 'ten'}
+        # 10% off the lines, plus 30.00 of shipping and tax and 5.00 taken off by Stripe
+        session = SimpleNamespace(
+            amount_subtotal=18000, amount_total=20500, total_details=SimpleNamespace(amount_discount=500),
+        )
+        record_order_coupon(request, order, session)
+        recorded = OrderCoupon.objects.get(order=order)
+        self.assertEqual((recorded.coupon, recorded.discount_amount), (coupon, Decimal('25.00')))
+
+class KeysetPageTests(TestCase):
+    ORDERING = ['-date_odered', '-id']
+
+    def setUp(self):
+        orders = [Order.objects.create() for _ in range(7)]
+        # Ties on the leading field must still give every order one position
+        placed = timezone.now()
+        Order.objects.filter(pk__in=[order.pk for order in orders[:4]]).update(date_odered=placed)
+        Order.objects.filter(pk__in=[order.pk for order in orders[4:]]).update(date_odered=placed - timedelta(days=1))
+        self.expected = list(Order.objects.order_by(*self.ORDERING).values_list('pk', flat=True))
+
+    def test_pages_cover_every_row_once(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = keyset_page(Order.objects.all(), self.ORDERING, cursor, per_page=3)
+            self.assertEqual(page.is_first, cursor is None)
+            seen += [order.pk for order in page]
+            pages += 1
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_tampered_cursor_starts_over(self):
+        page = keyset_page(Order.objects.all(), self.ORDERING, per_page=3)
+        tampered = keyset_page(Order.objects.all(), self.ORDERING, page.next_cursor + 'x', per_page=3)
+        self.assertTrue(tampered.is_first)
+        self.assertEqual([order.pk for order in tampered], self.expected[:3])
+
+
+class CarrierSyncTests(TestCase):
+    # Long enough that no shipment moves on to its next event while a test runs
+    STEP_SECONDS = 3600
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = carrier_standin.make_server(port=0, step_seconds=cls.STEP_SECONDS)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.url = f'http://{host}:{port}/track/{{tracking_number}}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def sync(self, *orders):
+        adapters = load_adapters({'default': {'url': self.url, 'rate_per_second': 0}})
+        return CarrierSync(adapters).run(Order.objects.filter(pk__in=[order.pk for order in orders]))
+
+    def shipment(self, last_event, **fields):
+        """An order whose tracking number the stand-in reports as having reached ``last_event``."""
+        steps = carrier_standin.EVENT_SEQUENCE.index(last_event)
+        number = next(
+            f'T{i}' for i in range(1000) if zlib.crc32(f'T{i}'.encode()) % len(carrier_standin.EVENT_SEQUENCE) == steps
+        )
+        return Order.objects.create(status='paid', carrier='post', tracking_number=number, **fields)
+
+    def test_stage_moves_forward(self):
+        order = self.shipment('in_transit', tracking_stage='packed')
+        self.assertEqual(self.sync(order), {'polled': 1, 'updated': 1, 'failed': 0})
+        order.refresh_from_db()
+        self.assertEqual(order.tracking_stage, 'shipped')
+        self.assertIsNotNone(order.shipped_at)
+        self.assertIsNone(order.delivered_at)
+
+    def test_stage_moving_back_is_ignored(self):
+        order = self.shipment('label_created', tracking_stage='out_for_delivery')
+        self.assertEqual(self.sync(order)['updated'], 0)
+        order.refresh_from_db()
+        self.assertEqual(order.tracking_stage, 'out_for_delivery')
+
+    def test_recorded_times_are_kept(self):
+        shipped_at = timezone.now() - timedelta(days=3)
+        order = self.shipment('delivered', tracking_stage='shipped', shipped_at=shipped_at)
+        self.sync(order)
+        order.refresh_from_db()
+        self.assertEqual((order.tracking_stage, order.shipped_at), ('delivered', shipped_at))
+        self.assertIsNotNone(order.delivered_at)
+
+        # Moved back by hand, the order is rewritten but its recorded delivery time still wins
+        delivered_at = timezone.now() - timedelta(days=1)
+        Order.objects.filter(pk=order.pk).update(tracking_stage='out_for_delivery', delivered_at=delivered_at)
+        self.assertEqual(self.sync(order)['updated'], 1)
+        order.refresh_from_db()
+        self.assertEqual((order.tracking_stage, order.delivered_at), ('delivered', delivered_at))
+
+    def test_second_run_writes_nothing(self):
+        orders = [self.shipment('picked_up'), self.shipment('out_for_delivery'), self.shipment('label_created')]
+        self.assertEqual(self.sync(*orders)['updated'], 3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.sync(*orders), {'polled': 3, 'updated': 0, 'failed': 0})
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(writes, [])
+
+    def test_unknown_stage_keeps_the_batch_going(self):
+        class NewStages:
+            async def track(self, tracking_number):
+                if tracking_number == 'NEW':
+                    return TrackingUpdate(stage='held_at_customs')
+                return TrackingUpdate(stage='shipped', shipped_at=timezone.now())
+
+        new = Order.objects.create(status='paid', carrier='post', tracking_number='NEW', tracking_stage='packed')
+        known = Order.objects.create(status='paid', carrier='post', tracking_number='OLD', tracking_stage='packed')
+        with self.assertLogs('store.carrier_sync', 'WARNING'):
+            stats = CarrierSync({'default': NewStages()}).run(Order.objects.filter(pk__in=[new.pk, known.pk]))
+        self.assertEqual(stats, {'polled': 2, 'updated': 1, 'failed': 0})
+        self.assertEqual(Order.objects.get(pk=new.pk).tracking_stage, 'packed')
+        self.assertEqual(Order.objects.get(pk=known.pk).tracking_stage, 'shipped')
@@ -0,0 +1,58 @@
+"""
+Maintenance of the denormalized Order totals (subtotal, discount, total, item_count).
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderItem
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Decimal('0.00')
+
+
+def line_amount():
+    """quantity * snapshotted price; the live product price only covers legacy rows without a snapshot."""
+    return ExpressionWrapper(
+        Coalesce(F('quantity'), 0) * Coalesce(F('product_price'), F('product__price'), Value(ZERO)),
+        output_field=MONEY,
+    )
+
+
+def compute_order_totals(order_ids):
+    """Return {order_id: (subtotal, discount, item_count)} using two grouped queries."""
+    from coupons.models import OrderCoupon
+
+    order_ids = list(order_ids)
+    totals = {order_id: (ZERO, ZERO, 0) for order_id in order_ids}
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('order_id')
+        .annotate(subtotal=Sum(line_amount()), items=Sum('quantity'))
+        .order_by()
+    )
+    for row in rows:
+        totals[row['order_id']] = (row['subtotal'] or ZERO, ZERO, row['items'] or 0)
+    discounts = OrderCoupon.objects.filter(order_id__in=order_ids).values_list('order_id', 'discount_amount')
+    for order_id, discount_amount in discounts:
+        subtotal, _, items = totals[order_id]
+        totals[order_id] = (subtotal, min(discount_amount or ZERO, subtotal), items)
+    return totals
+
+
+def refresh_order_totals(order_ids, batch_size=500):
+    """Recompute and store totals for the given orders; returns the number of orders updated."""
+    totals = compute_order_totals(order_ids)
+    orders = []
+    for order_id, (subtotal, discount, items) in totals.items():
+        orders.append(Order(
+            pk=order_id,
+            subtotal=subtotal,
+            discount=discount,
+            total=subtotal - discount,
+            item_count=items,
+        ))
+    # bulk_update skips auto_now, so tracking timestamps are left alone
+    Order.objects.bulk_update(orders, ['subtotal', 'discount', 'total', 'item_count'], batch_size=batch_size)
+    return len(orders)
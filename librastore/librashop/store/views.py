@@ -1,17 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.db.models import Q, Sum, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.staticfiles import finders
 from django.templatetags.static import static
+from django.http import HttpResponse
+from django.db import transaction
+from decimal import Decimal
 import stripe
 import logging
 
-from .models import Product, Customer, Order, OrderItem, ShippingAdderss, Category
+from librashop.resilience import stripe_breaker, ProviderUnavailable
+from librashop.reporting import MONTH, month_window, time_series
+from .models import Product, Customer, Order, OrderItem, ShippingAdderss, Category, DailySales, DailyOrderStats
 from .forms import ShippingAdderssForm
+from .inventory import commit_cart, in_stock_only
+from . import catalog, flash_sale, rollups
 from cart.models import Cart, CartItem, Wishlist, WishlistItem
+from vendors import order_index
  
 # Create your views here.
 
@@ -20,16 +29,9 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 
-def home(request):
-    """
-    Home page view - displays all categories with their products in grid layout.
-    Each category shows up to 8 products.
-    """
-    # Get all categories
-    categories = Category.objects.all()
-    all_categories = categories  # expose full list for category cards section
-    
-    # Build a list of categories with their products
+def _home_sections():
+    """(all categories, categories with up to 8 products each, featured products), evaluated for caching."""
+    categories = list(Category.objects.all())
     categories_with_products = []
     for category in categories:
         # Include products linked via FK and avoid duplicates
@@ -39,8 +41,8 @@ def home(request):
         )
         # Deduplicate by slug: keep newest per slug
         latest_per_slug = Product.objects.filter(slug=OuterRef('slug')).order_by('-created', '-id').values('id')[:1]
-        products = products.annotate(latest_id=Subquery(latest_per_slug)).filter(id=F('latest_id'))[:8]
-        if products.exists():  # Only show categories that have products
+        products = list(products.annotate(latest_id=Subquery(latest_per_slug)).filter(id=F('latest_id'))[:8])
+        if products:  # Only show categories that have products
             categories_with_products.append({
                 'category': category,
                 'products': products
@@ -51,6 +53,16 @@ def home(request):
         featured_products = list(Product.objects.filter(available=True).order_by('-created')[:3])
     except Exception:
         featured_products = []
+    return categories, categories_with_products, featured_products
+
+
+def home(request):
+    """
+    Home page view - displays all categories with their products in grid layout.
+    Each category shows up to 8 products.
+    """
+    # Catalog sections are the same for everyone; rebuilt when the catalog version moves
+    all_categories, categories_with_products, featured_products = catalog.cached('home', _home_sections)
     
     # Build hero images list (configurable via settings.HOME_HERO_IMAGES)
     try:
@@ -82,7 +94,10 @@ def home(request):
 def shop(request):
     q = request.GET.get('q', '').strip()
     sort = request.GET.get('sort', '').strip()
+    in_stock = request.GET.get('in_stock') == '1'
     products = Product.objects.all()
+    if in_stock:
+        products = in_stock_only(products)
     if q:
         products = products.filter(
             Q(name__icontains=q) |
@@ -108,14 +123,17 @@ def shop(request):
         # Default sorting: newest first
         products = products.order_by('-created')
     
-    context = {'products': products, 'q': q, 'sort': sort}
+    context = {'products': products, 'q': q, 'sort': sort, 'in_stock': in_stock}
     return render(request, 'shop.html', context)
 
 def category_shop(request, slug):
     category = get_object_or_404(Category, slug=slug)
     q = request.GET.get('q', '').strip()
     sort = request.GET.get('sort', '').strip()
+    in_stock = request.GET.get('in_stock') == '1'
     products = Product.objects.filter(Q(category=category)).distinct()
+    if in_stock:
+        products = in_stock_only(products)
     # Deduplicate by slug within this category view
     latest_per_slug = Product.objects.filter(slug=OuterRef('slug')).order_by('-created', '-id').values('id')[:1]
     products = products.annotate(latest_id=Subquery(latest_per_slug)).filter(id=F('latest_id'))
@@ -145,6 +163,7 @@ def category_shop(request, slug):
         'products': products,
         'q': q,
         'sort': sort,
+        'in_stock': in_stock,
         'hero_video_url': hero_video_url,
     }
     return render(request, 'category_shop.html', context)
@@ -208,6 +227,12 @@ def checkout(request):
     if not cart_instance.items.exists():
         messages.error(request, "Your Cart Is Empty")
         return redirect('cart_summary')
+
+    # Flash-sale products only let a limited number of shoppers into checkout
+    sales = flash_sale.sales_for_products(cart_instance.items.values_list('product_id', flat=True))
+    admitted = flash_sale.admit(request, sales)
+    if admitted is None:
+        return flash_sale.waiting_room(request, sales[0])
     
     # Coupon calculations (display only; Stripe amounts adjusted in transaction/views.py)
     discount = 0
@@ -238,7 +263,7 @@ def checkout(request):
 
             request.session['shipping_address_id'] = shipping_address.id
 
-            return redirect('create_checkout_session')
+            return flash_sale.grant_passes(request, redirect('create_checkout_session'), admitted)
         
 
     else:
@@ -253,17 +278,41 @@ def checkout(request):
          'applied_coupon': applied_coupon,
          'form': form
     }
-    return render(request,'checkout.html', context)
+    return flash_sale.grant_passes(request, render(request,'checkout.html', context), admitted)
 
 
     
 
+def record_order_coupon(request, order, session):
+     """Store the applied coupon against the order; the discount is what Stripe actually took off."""
+     code = request.session.pop('coupon_code', None)
+     if not code:
+          return
+     from coupons.models import Coupon, OrderCoupon
+     coupon = Coupon.objects.filter(code__iexact=code).first()
+     subtotal = sum(
+          (item.quantity or 0) * (item.product_price or 0)
+          for item in order.orderitem_set.all()
+     )
+     # amount_total also carries shipping and tax, so work from the line items only:
+     # the coupon is priced into their unit amounts (transaction/views.py), and
+     # total_details holds anything Stripe itself took off on top
+     amount_subtotal = getattr(session, 'amount_subtotal', None)
+     if amount_subtotal is None:
+          return
+     total_details = getattr(session, 'total_details', None)
+     stripe_discount = getattr(total_details, 'amount_discount', None) or 0
+     discount = max(Decimal(subtotal) - Decimal(amount_subtotal) / 100 + Decimal(stripe_discount) / 100, Decimal('0'))
+     if coupon:
+          OrderCoupon.objects.create(order=order, coupon=coupon, discount_amount=discount.quantize(Decimal('0.01')))
+
+
 @login_required  
 def order_success(request):
         session_id = request.GET.get('session_id')
         if session_id:
              try:
-                  session = stripe.checkout.Session.retrieve(session_id)
+                  session = stripe_breaker.call(stripe.checkout.Session.retrieve, session_id)
                   if session.payment_status == 'paid':
                        # Locate the cart: if user is authenticated, use customer cart; otherwise use session cart
                        cart_instance = None
@@ -292,22 +341,30 @@ def order_success(request):
                             }
                        )
                         
-                       order = Order.objects.create(
-                             custamer = customer,
-                             complete = True,
-                             status='paid',
-                             transaction_id = session.payment_intent
-                       )
-                       for cart_item in cart_instance.items.all():
-                            prod = cart_item.product
-                            OrderItem.objects.create(
-                                 order=order,
-                                 product=prod,
-                                 quantity=cart_item.quantity,
-                                 product_name=(prod.name if prod else None),
-                                 product_price=(prod.price if prod else None),
-                                 product_image=(prod.image.url if (prod and getattr(prod, 'image', None)) else None),
+                       with transaction.atomic():
+                            order = Order.objects.create(
+                                  custamer = customer,
+                                  complete = True,
+                                  status='paid',
+                                  transaction_id = session.payment_intent
                             )
+                            order_items = []
+                            for cart_item in cart_instance.items.select_related('product'):
+                                 prod = cart_item.product
+                                 order_items.append(OrderItem(
+                                      order=order,
+                                      product=prod,
+                                      quantity=cart_item.quantity,
+                                      product_name=(prod.name if prod else None),
+                                      product_price=(prod.price if prod else None),
+                                      product_image=(prod.image.url if (prod and getattr(prod, 'image', None)) else None),
+                                 ))
+                            OrderItem.objects.bulk_create(order_items)
+                            commit_cart(cart_instance, order)
+                            record_order_coupon(request, order, session)
+                            order.recalculate_totals()
+                            rollups.record_order(order)
+                            order_index.record_order(order)
                        shipping_address_id = request.session.get('shipping_address_id')
                        if shipping_address_id:
                             shipping_address = ShippingAdderss.objects.get(id = shipping_address_id)
@@ -322,6 +379,15 @@ def order_success(request):
                   else:
                        return render(request, 'order_cancel.html')
                   
+             except ProviderUnavailable as e:
+                  # The cart is left untouched so reloading this page can still place the order
+                  logger.warning(f"Deferred order confirmation: {e}")
+                  response = HttpResponse(
+                       "We could not confirm your payment right now. Please refresh this page in a minute.",
+                       status=503,
+                  )
+                  response['Retry-After'] = str(stripe_breaker.recovery_timeout)
+                  return response
              except (Cart.DoesNotExist, ShippingAdderss.DoesNotExist, Exception) as e:
                   logger.error(f"Error in order_success: {e}")
                   return render(request, 'order_cancel.html')
@@ -394,55 +460,38 @@ def admin_dashboard(request):
     total_orders = Order.objects.count()
     total_customers = Customer.objects.count()
     
-    # Calculate total revenue from completed orders
-    total_revenue = 0
-    completed_orders = Order.objects.filter(complete=True)
-    for order in completed_orders:
-        try:
-            total_revenue += order.get_cart_total
-        except:
-            pass
+    # Sales figures come from the daily rollups, not from scanning orders
+    total_revenue = DailyOrderStats.objects.aggregate(total=Sum('total'))['total'] or 0
     
     # Top selling products (most ordered)
-    top_products = OrderItem.objects.values('product__name', 'product__id').annotate(
-        total_sold=Sum('quantity'),
-        revenue=Sum('quantity')
+    top_products = DailySales.objects.exclude(product=None).values('product__name', 'product__id').annotate(
+        total_sold=Sum('units'),
+        revenue=Sum('revenue')
     ).order_by('-total_sold')[:10]
     
-    # Low selling products (least ordered or never ordered)
-    all_products = Product.objects.all()
-    product_sales = {}
-    for product in all_products:
-        sold = OrderItem.objects.filter(product=product).aggregate(Sum('quantity'))['quantity__sum'] or 0
-        product_sales[product.id] = {
-            'name': product.name,
-            'sold': sold,  
-            'sold': sold,   
-            'price': product.price,    
-            'price': product.price,     
-            'stock': getattr(product, 'stock', 0)
-        }
-    
-    # Sort by lowest sales
-    low_selling = sorted(product_sales.items(), key=lambda x: x[1]['sold'])[:10]
+    # Low selling products (least ordered or never ordered), one grouped query
+    least_sold = Product.objects.select_related('inventory').annotate(
+        sold=Coalesce(Sum('daily_sales__units'), 0)
+    ).order_by('sold', 'id')[:10]
+    low_selling = [
+        (product.id, {'name': product.name, 'sold': product.sold, 'price': product.price, 'stock': product.stock})
+        for product in least_sold
+    ]
     
     # Recent orders
     recent_orders = Order.objects.all().order_by('-date_odered')[:10]
     
     # Category-wise sales
-    category_sales = OrderItem.objects.values('product__category__name').annotate(
-        total=Sum('quantity')
+    category_sales = DailySales.objects.values('category__name').annotate(
+        total=Sum('units')
     ).order_by('-total')[:5]
     
-    # Monthly revenue (last 6 months)
-    from datetime import datetime, timedelta
-    six_months_ago = datetime.now() - timedelta(days=180)
-    monthly_orders = Order.objects.filter(
-        date_odered__gte=six_months_ago,
-        complete=True
-    ).extra(select={'month': 'strftime("%%Y-%%m", date_odered)'}).values('month').annotate(
-        count=Count('id')
-    ).order_by('month')
+    # Paid orders per month (last 6 months), from the daily rollups
+    start, end = month_window(6)
+    monthly_orders = [
+        {'month': item['bucket'].strftime('%Y-%m'), 'count': item['count']}
+        for item in time_series(DailyOrderStats.objects.all(), 'day', MONTH, start, end, count=Sum('orders'))
+    ]
     
     context = {
         'total_products': total_products,
@@ -16,10 +16,17 @@ from transaction.models import Order, Transaction, OrderItem
 from store.models import Product
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
+from store.inventory import reserve_cart, release_cart, InsufficientStock
+from store import flash_sale
+from datetime import timedelta
+from django.utils import timezone
+from librashop.resilience import stripe_breaker, email_breaker, ProviderUnavailable, EMAIL_FAILURES
+import logging
 
 
 # Create your views here.
 
+logger = logging.getLogger(__name__)
 User = get_user_model()
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -94,13 +101,18 @@ def handle_completed_checkout_session(session):
 
             email_subject = 'Your Order Confirmation from LIBRA'
             email_body = render_to_string('emails/order_confirmation.html', {'order':order})
-            send_mail(
-                  email_subject,
-                  email_body,
-                  settings.DEFAULT_FROM_EMAIL,
-                  [user.email],
-                  fail_silently=False,  
-            )
+            # A mail outage must not roll back a paid order
+            try:
+                  email_breaker.call(
+                        send_mail,
+                        email_subject,
+                        email_body,
+                        settings.DEFAULT_FROM_EMAIL,
+                        [user.email],
+                        fail_silently=False,
+                  )
+            except (ProviderUnavailable,) + EMAIL_FAILURES as e:
+                  logger.error(f"Order confirmation email for order {order.id} not sent: {e}")
 
 @login_required
 def create_checkout_session(request):
@@ -180,6 +192,19 @@ def create_checkout_session(request):
          messages.error(request, "Your Cart Is Empty Or Contains Invalid Items!")
          return redirect('cart_summary')
     
+    # Flash-sale products: only admitted shoppers may open a payment session
+    sales = flash_sale.sales_for_products([it.product_id for it in items])
+    admitted = flash_sale.admit(request, sales)
+    if admitted is None:
+        return flash_sale.waiting_room(request, sales[0])
+
+    # Hold stock for the length of the Stripe session so it cannot be oversold
+    try:
+        reserved_until = reserve_cart(cart)
+    except InsufficientStock as e:
+        messages.error(request, f"Sorry, only {e.available} of {e.product.name} left in stock.")
+        return flash_sale.grant_passes(request, redirect('cart_summary'), admitted)
+
     # Get shipping address for Indian export compliance
     from store.models import ShippingAdderss
     shipping_address = None
@@ -231,16 +256,27 @@ def create_checkout_session(request):
                 'allowed_countries': ['IN'],  # India
             }
         
-        checkout_session = stripe.checkout.Session.create(**session_params)
+        # Stripe must stop accepting payment before the reservation lapses (Stripe minimum is 30 min)
+        session_expires_at = reserved_until - timedelta(minutes=1)
+        if session_expires_at - timezone.now() > timedelta(minutes=30):
+            session_params['expires_at'] = int(session_expires_at.timestamp())
+
+        checkout_session = stripe_breaker.call(stripe.checkout.Session.create, **session_params)
         session_url = getattr(checkout_session, "url", None)
         if not session_url:
+            release_cart(cart)
             messages.error(request, "Unable to start checkout: no session URL returned.")
-            return redirect('checkout')
-        return redirect(session_url, code=303)
+            return flash_sale.grant_passes(request, redirect('checkout'), admitted)
+        return flash_sale.grant_passes(request, redirect(session_url, code=303), admitted)
         
+    except ProviderUnavailable:
+            release_cart(cart)
+            messages.error(request, "Payments are temporarily unavailable. Please try again in a few minutes.")
+            return flash_sale.grant_passes(request, redirect('checkout'), admitted)
     except Exception as e:
+            release_cart(cart)
             messages.error(request, f"An error occurred during checkout : {e}")
-            return redirect('checkout')
+            return flash_sale.grant_passes(request, redirect('checkout'), admitted)
     
 
 
@@ -1,3 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from store.models import Customer, Order
+
+
+class MyOrdersStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user('buyer', password='x')
+        self.client.force_login(user)
+        self.order = Order.objects.create(custamer=Customer.objects.get(user=user), status='paid')
+        self.url = reverse('my_orders_status')
+
+    def test_unchanged_version_answers_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_order_change_gives_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = 'cancelled'
+            self.order.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_since_returns_only_later_changes(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual((data['orders'], data['total_orders'], data['cursor']), ([], 1, cursor))
+
+    def test_bad_since_is_a_400(self):
+        for value in ('2024-13-45T99:00', 'yesterday'):
+            response = self.client.get(self.url, {'since': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
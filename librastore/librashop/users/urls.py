@@ -9,6 +9,7 @@ urlpatterns = [
     path('profile/', views.user_profile, name='profile'),
     path('orders/', views.my_orders, name='orders'),
     path('orders/status/', views.my_orders_status, name='my_orders_status'),
+    path('orders/events/', views.my_orders_events, name='my_orders_events'),
     path('wishlist/', views.wishlist, name='wishlist'),
     path('wishlist/add/<int:product_id>/', views.add_to_wishlist, name='add_to_wishlist'),
     path('wishlist/remove/<int:wishlist_id>/', views.remove_from_wishlist, name='remove_from_wishlist'),
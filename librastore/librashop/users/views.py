@@ -9,12 +9,29 @@ from store.models import Order, OrderItem, Wishlist, Product, ContactMessage, Cu
 from django.contrib.auth.decorators import login_required
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, HttpResponseNotModified
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from store.order_state import order_state_version, cached_order_state_version
+from store.order_events import order_payload, tracking_progress
+from django.db.models import Prefetch
+from librashop.pagination import keyset_page
 
 
 
 # Create your views here.
 
+ORDERS_PER_PAGE = 10
+# Newest first; id breaks ties so the keyset cursor is unique
+ORDER_HISTORY_ORDERING = ('-date_odered', '-id')
+
+
+def customer_orders(customer):
+    """A customer's orders with their items (and products) loaded in one extra query."""
+    items = OrderItem.objects.select_related('product')
+    return Order.objects.filter(custamer=customer).prefetch_related(Prefetch('orderitem_set', queryset=items))
+
+
 def signup(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
@@ -73,11 +90,12 @@ def order_history(request):
     
     if customer:
         # Filter orders by customer (note: field is misspelled as 'custamer' in model)
-        orders = Order.objects.filter(custamer=customer).order_by('-date_odered')
+        orders = customer_orders(customer)
     else:
         orders = Order.objects.none()
-    
-    context = {'orders': orders}
+
+    page = keyset_page(orders, ORDER_HISTORY_ORDERING, request.GET.get('cursor'), ORDERS_PER_PAGE)
+    context = {'orders': page, 'page': page}
     return render(request, 'order_history.html', context)
 
 
@@ -116,38 +134,16 @@ def my_orders(request):
         }
     )
     
-    # Debug: Print customer info
-    print(f"DEBUG - User: {request.user.username}, Customer ID: {customer.id}, Customer Name: {customer.name}")
-    
-    # Get all orders for this customer
-    orders = Order.objects.filter(custamer=customer).order_by('-date_odered')
-    
-    # Debug: Print order count
-    print(f"DEBUG - Orders found: {orders.count()}")
-    
-    # Tracking stage progress mapping
-    tracking_progress = {
-        'placed': {'percent': 5, 'label': 'Placed'},
-        'confirmed': {'percent': 20, 'label': 'Confirmed'},
-        'packed': {'percent': 40, 'label': 'Packed'},
-        'shipped': {'percent': 65, 'label': 'Shipped'},
-        'out_for_delivery': {'percent': 85, 'label': 'Out for delivery'},
-        'delivered': {'percent': 100, 'label': 'Delivered'},
-        'cancelled': {'percent': 0, 'label': 'Cancelled'},
-    }
+    orders = customer_orders(customer)
+    page = keyset_page(orders, ORDER_HISTORY_ORDERING, request.GET.get('cursor'), ORDERS_PER_PAGE)
 
-    # Get order items for each order
     orders_with_items = []
-    for order in orders:
-        items = OrderItem.objects.filter(order=order).select_related('product')
-        order_total = sum(getattr(item, 'line_total', 0) for item in items)
-        stage = getattr(order, 'tracking_stage', 'placed') or 'placed'
-        progress = tracking_progress.get(stage, tracking_progress['placed'])
-        print(f"DEBUG - Order {order.id}: {items.count()} items, Total: {order_total}")
+    for order in page:
+        _, progress = tracking_progress(order)
         orders_with_items.append({
             'order': order,
-            'items': items,
-            'total': order_total,
+            'items': order.orderitem_set.all(),
+            'total': order.total,
             'tracking': {
                 'percent': progress['percent'],
                 'label': progress['label'],
@@ -159,46 +155,61 @@ def my_orders(request):
     context = {
         'orders_with_items': orders_with_items,
         'total_orders': orders.count(),
+        'page': page,
     }
     return render(request, 'my_orders.html', context)
 
 
 @login_required
 def my_orders_status(request):
-    """Lightweight JSON for polling order tracking/status without reloading the page"""
-    from store.models import Customer
-    customer, _ = Customer.objects.get_or_create(
-        user=request.user,
-        defaults={
-            'name': request.user.get_full_name() or request.user.username,
-            'email': request.user.email or 'no-email@example.com'
-        }
-    )
-    tracking_progress = {
-        'placed': {'percent': 5, 'label': 'Placed'},
-        'confirmed': {'percent': 20, 'label': 'Confirmed'},
-        'packed': {'percent': 40, 'label': 'Packed'},
-        'shipped': {'percent': 65, 'label': 'Shipped'},
-        'out_for_delivery': {'percent': 85, 'label': 'Out for delivery'},
-        'delivered': {'percent': 100, 'label': 'Delivered'},
-        'cancelled': {'percent': 0, 'label': 'Cancelled'},
-    }
-    orders = Order.objects.filter(custamer=customer).order_by('-date_odered')
+    """Lightweight JSON for polling order tracking/status without reloading the page.
+
+    Answers ``If-None-Match`` with a 304 straight from the cached order-state
+    version, and with ``?since=<cursor>`` only returns orders changed after
+    the cursor from the previous response.
+    """
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    version = cached_order_state_version(request.user.pk)
+    if version is not None and quote_etag(version) in if_none_match:
+        response = HttpResponseNotModified()
+        response['ETag'] = quote_etag(version)
+        return response
+
+    value = request.GET.get('since')
+    try:
+        since = parse_datetime(value) if value else None
+    except ValueError:
+        since = None
+    if value and since is None:
+        return JsonResponse({'error': 'since must be a cursor from a previous response'}, status=400)
+
+    version = order_state_version(request.user.pk)
+    orders = Order.objects.filter(custamer__user=request.user)
+    changed = orders.filter(last_updated__gt=since) if since else orders
     payload = []
-    for o in orders:
-        stage = getattr(o, 'tracking_stage', 'placed') or 'placed'
-        progress = tracking_progress.get(stage, tracking_progress['placed'])
-        payload.append({
-            'id': o.id,
-            'status': o.status,
-            'tracking_stage': stage,
-            'tracking_label': progress['label'],
-            'percent': progress['percent'],
-            'tracking_number': getattr(o, 'tracking_number', '') or '',
-            'carrier': getattr(o, 'carrier', '') or '',
-        })
-    return JsonResponse({'orders': payload})
+    cursor = since
+    for o in changed.order_by('-date_odered'):
+        payload.append(order_payload(o))
+        if cursor is None or o.last_updated > cursor:
+            cursor = o.last_updated
+    response = JsonResponse({
+        'orders': payload,
+        'total_orders': orders.count(),
+        'cursor': cursor.isoformat() if cursor else '',
+    })
+    response['ETag'] = quote_etag(version)
+    return response
+
+
+
+def my_orders_events(request):
+    """Order event stream placeholder for non-ASGI servers.
 
+    Under ASGI, ``librashop.asgi`` answers this path with the live stream
+    (``store.order_events``). Anywhere else a 204 tells EventSource not to
+    reconnect, and the page falls back to polling ``my_orders_status``.
+    """
+    return HttpResponse(status=204)
 
 @login_required
 def wishlist(request):
@@ -1,9 +1,27 @@
 from django.contrib import admin
-from . models import Vendor
+from . models import Vendor, SettlementStatement
 
 # Register your models here.
 
 @admin.register(Vendor)
 class VendorAdmin(admin.ModelAdmin):
     list_display = ['store_name', 'owner_name', 'phone']
-    prepopulated_fields = {'slug':('store_name',)}
\ No newline at end of file
+    prepopulated_fields = {'slug':('store_name',)}
+
+
+@admin.register(SettlementStatement)
+class SettlementStatementAdmin(admin.ModelAdmin):
+    """Read-only: statements are written by close_vendor_settlements."""
+    list_display = ['vendor', 'period_start', 'period_end', 'orders', 'gross', 'discount', 'refunds', 'payable']
+    list_filter = ['period_start']
+    list_select_related = ['vendor']
+    search_fields = ['vendor__store_name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,301 @@
+"""
+Bulk product upload for vendors: a CSV of products plus an optional zip of images.
+
+The CSV is read one row at a time and written CHUNK_SIZE rows at a time.
+For each chunk, valid rows have their images read from the zip one member at
+a time (the zip is only ever seeked into, never loaded whole), decoded and
+resized in a process pool, and the products upserted with one
+``bulk_create(update_conflicts=True)`` on (vendor, slug): a slug the vendor
+already uses updates that product instead of adding another. Rows with
+errors are reported by CSV line and skipped; the rest are written.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import zipfile
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from librashop.images import resize_image
+from store.bulk_edit import PARSERS
+from store.catalog import bump_catalog_version, bump_vendor_version
+from store.models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+MAX_ERRORS = 100
+BROKEN_POOL = "image processing stopped after a worker crashed; upload it again"
+REQUIRED_COLUMNS = ('name', 'price', 'category')
+OPTIONAL_COLUMNS = ('slug', 'description', 'available', 'image')
+# Written on every upsert; 'image' only when the row brings one, so re-uploads keep existing images.
+# feed_hash goes back to blank so the next feed sync rewrites the product (vendors.feed_sync)
+UPDATE_FIELDS = ['name', 'category', 'description', 'price', 'available', 'updated', 'deleted_at', 'feed_hash']
+
+
+class Upload:
+    """Counts and per-line errors of one upload."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+class _Images:
+    """Image members of the uploaded zip by name and by bare file name, resized in a process pool."""
+
+    def __init__(self, file, options):
+        self.zip = zipfile.ZipFile(file)
+        self.members = {}
+        for info in self.zip.infolist():
+            if not info.is_dir():
+                self.members.setdefault(info.filename, info)
+                self.members.setdefault(info.filename.rsplit('/', 1)[-1], info)
+        self.max_bytes = options['max_image_mb'] * 1024 * 1024
+        self.size = options['image_size']
+        self.workers = max(1, options['image_workers'])
+        self.pool = None
+        self.broken = False
+
+    def check(self, name):
+        """The zip member for ``name``; raises ValueError if it can't be used."""
+        info = self.members.get(name)
+        if info is None:
+            raise ValueError(f"image {name!r} is not in the zip")
+        if info.file_size > self.max_bytes:
+            raise ValueError(f"image {name!r} is over {self.max_bytes // (1024 * 1024)} MB")
+        return info
+
+    def resize(self, infos, save):
+        """Resize each member and hand its JPEG bytes to ``save(index, data)`` as soon as it is done.
+
+        Returns what ``save`` returned, or the ValueError, for each member.
+        Only a window of images is in memory at once. If a worker dies (a
+        crash, or memory exhausted by a hostile image), the pool is shut
+        down and every member not yet done gets an error.
+        """
+        if self.pool is None and not self.broken:
+            # spawn: workers only import Pillow, never a copy of this process's connections and threads
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        window = self.workers * 2
+        results = []
+        for start in range(0, len(infos), window):
+            futures = [self._submit(info) for info in infos[start:start + window]]
+            for future in futures:
+                try:
+                    data = future.result() if isinstance(future, Future) else future
+                except (ValueError, MemoryError) as exc:
+                    results.append(ValueError(str(exc) or "too large to process"))
+                    continue
+                except BrokenProcessPool:
+                    self._break()
+                    results.append(ValueError(BROKEN_POOL))
+                    continue
+                results.append(data if isinstance(data, ValueError) else save(len(results), data))
+        return results
+
+    def _submit(self, info):
+        """A future for the member's resize, or the ValueError that stops it before it starts."""
+        if self.broken:
+            return ValueError(BROKEN_POOL)
+        try:
+            return self.pool.submit(resize_image, self.zip.read(info), self.size)
+        except (zipfile.BadZipFile, zlib.error, EOFError) as exc:
+            return ValueError(f"damaged in the zip ({exc})")
+        except BrokenProcessPool:
+            self._break()
+            return ValueError(BROKEN_POOL)
+
+    def _break(self):
+        if not self.broken:
+            logger.warning("Image resize pool broke; skipping the remaining images of this upload")
+            self.broken = True
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.zip.close()
+
+
+def open_csv(file, upload, optional=OPTIONAL_COLUMNS):
+    """A DictReader over an uploaded product CSV, or None (with the error recorded) if its header won't do."""
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        header = [name.strip().lower() for name in reader.fieldnames or []]
+    except (UnicodeDecodeError, csv.Error) as exc:
+        upload.error(1, f"unreadable CSV: {exc}")
+        return None
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        upload.error(1, f"header is missing: {', '.join(missing)} (optional: {', '.join(optional)})")
+        return None
+    reader.fieldnames = header
+    return reader
+
+
+def row_slug(row):
+    """The product slug a CSV row stands for: its ``slug`` column, else its slugified name."""
+    slug = slugify((row.get('slug') or '').strip() or (row.get('name') or '').strip())
+    return slug[:Product._meta.get_field('slug').max_length]
+
+
+def parse_row(row, line, categories, slugs, images=None):
+    """A dict of product values for a CSV row; raises ValueError with the first problem found."""
+    name = (row.get('name') or '').strip()
+    if not name:
+        raise ValueError("missing name")
+    if len(name) > Product._meta.get_field('name').max_length:
+        raise ValueError("name is too long")
+    slug = row_slug(row)
+    if not slug:
+        raise ValueError(f"no usable slug in {name!r}")
+    if slug in slugs:
+        raise ValueError(f"slug {slug!r} is already used on line {slugs[slug]}")
+    raw_price = (row.get('price') or '').strip()
+    if not raw_price:
+        raise ValueError("missing price")
+    category_key = (row.get('category') or '').strip()
+    if not category_key:
+        raise ValueError("missing category")
+    category_id = categories.get(category_key)
+    if category_id is None:
+        raise ValueError(f"no category with slug or name {category_key!r}")
+    raw_available = (row.get('available') or '').strip()
+    image_name = (row.get('image') or '').strip()
+    if image_name and images is None:
+        raise ValueError(f"image {image_name!r} given but no zip was uploaded")
+    values = {
+        'name': name,
+        'slug': slug,
+        'category_id': category_id,
+        'description': (row.get('description') or '').strip(),
+        'price': PARSERS['price'](raw_price),
+        'available': PARSERS['available'](raw_available) if raw_available else True,
+        'image': images.check(image_name) if image_name else None,
+    }
+    slugs[slug] = line
+    return values
+
+
+def load_categories(rows, categories):
+    """Add the categories named by ``rows`` (slug or name) to ``categories``, with one query."""
+    keys = {(row.get('category') or '').strip() for _, row in rows} - categories.keys() - {''}
+    if keys:
+        for pk, slug, name in Category.objects.filter(Q(slug__in=keys) | Q(name__in=keys)).values_list('pk', 'slug', 'name'):
+            categories.setdefault(slug, pk)
+            categories.setdefault(name, pk)
+
+
+def _write_chunk(vendor, rows, categories, slugs, images, upload):
+    load_categories(rows, categories)
+    parsed = []
+    for line, row in rows:
+        try:
+            parsed.append((line, parse_row(row, line, categories, slugs, images)))
+        except ValueError as exc:
+            upload.error(line, str(exc))
+
+    with_images = [(line, values) for line, values in parsed if values['image'] is not None]
+    if with_images:
+        image_field = Product._meta.get_field('image')
+
+        def save(index, data):
+            name = image_field.generate_filename(None, f"{with_images[index][1]['slug']}.jpg")
+            return default_storage.save(name, ContentFile(data))
+
+        stored = images.resize([values['image'] for _, values in with_images], save)
+        for (line, values), result in zip(with_images, stored):
+            if isinstance(result, ValueError):
+                upload.error(line, f"image {values['image'].filename!r}: {result}")
+                values['skip'] = True
+            else:
+                values['image'] = result
+
+    now = timezone.now()
+    products = [
+        Product(vendor=vendor, created=now, updated=now, deleted_at=None, **values)
+        for _, values in parsed
+        if not values.pop('skip', False)
+    ]
+    if not products:
+        return 0
+    existing = set(
+        Product.all_objects.filter(vendor=vendor, slug__in=[product.slug for product in products])
+        .values_list('slug', flat=True)
+    )
+    with transaction.atomic():
+        for has_image in (False, True):
+            group = [product for product in products if bool(product.image) == has_image]
+            for product in group:
+                if not has_image:
+                    product.image = ''
+            if group:
+                Product.objects.bulk_create(
+                    group, update_conflicts=True, unique_fields=['vendor', 'slug'],
+                    update_fields=UPDATE_FIELDS + (['image'] if has_image else []),
+                )
+    upload.updated += len(existing)
+    upload.created += len(products) - len(existing)
+    return len(products)
+
+
+def upload_products(vendor, csv_file, zip_file=None):
+    """Create or update ``vendor``'s products from an uploaded CSV (and zip of images); returns an Upload.
+
+    Columns: ``name``, ``price`` and ``category`` (slug or name), optionally
+    ``slug`` (defaults to the slugified name), ``description``,
+    ``available`` (yes/no, true/false or 1/0; default yes) and ``image``
+    (a file name in the zip).
+    """
+    upload = Upload()
+    try:
+        images = _Images(zip_file, settings.VENDOR_BULK_UPLOAD) if zip_file else None
+    except zipfile.BadZipFile:
+        upload.error(0, "the images file is not a zip")
+        return upload
+
+    written = 0
+    try:
+        reader = open_csv(csv_file, upload)
+        if reader is None:
+            return upload
+
+        categories, slugs, rows = {}, {}, []
+        try:
+            for row in reader:
+                rows.append((reader.line_num, row))
+                if len(rows) >= CHUNK_SIZE:
+                    written += _write_chunk(vendor, rows, categories, slugs, images, upload)
+                    rows = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            upload.error(reader.line_num, f"unreadable CSV: {exc}")
+        written += _write_chunk(vendor, rows, categories, slugs, images, upload)
+    finally:
+        if images is not None:
+            images.close()
+        # Chunks already written are live even if a later one failed
+        if written:
+            bump_catalog_version()
+            bump_vendor_version(vendor.pk)
+    logger.info("Vendor %s bulk upload: %d created, %d updated, %d errors",
+                vendor.pk, upload.created, upload.updated, upload.error_count)
+    return upload
@@ -0,0 +1,137 @@
+"""
+Incremental vendor catalog feed sync.
+
+A feed is the vendor's whole catalog as a CSV, with the bulk upload columns
+except ``image``. Every valid row is hashed (SHA-256 of its normalized
+values) and BATCH_SIZE rows at a time are compared with the hashes stored on
+the vendor's products, in one lookup on the (vendor, slug) unique index.
+Only new rows (``bulk_create``) and rows whose hash changed
+(``bulk_update``) are written, so an unchanged catalog costs reads only.
+Products edited any other way have a blank hash and are rewritten from
+their row.
+
+Products the feed no longer lists are marked unavailable in one UPDATE at
+the end, with their hash cleared so relisting them writes them again. A
+feed that could not be read to the end marks nothing unavailable.
+"""
+import csv
+import hashlib
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from store.catalog import bump_catalog_version, bump_vendor_version
+from store.models import Product
+
+from .bulk_upload import Upload, load_categories, open_csv, parse_row, row_slug
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Keeps each UPDATE's parameter list well inside every backend's limit
+UNLIST_CHUNK_SIZE = 10000
+FEED_COLUMNS = ('slug', 'description', 'available')
+WRITE_FIELDS = ['name', 'category', 'description', 'price', 'available', 'feed_hash', 'updated', 'deleted_at']
+
+
+class FeedSync(Upload):
+    """Counts and per-line errors of one feed sync."""
+
+    def __init__(self):
+        super().__init__()
+        self.unchanged = 0
+        self.unlisted = 0
+
+
+def row_hash(values):
+    """Hash of the product values a feed row sets, independent of how the CSV spelled them."""
+    canonical = '\x1f'.join([
+        values['name'], str(values['category_id']), values['description'],
+        f"{values['price']:.2f}", '1' if values['available'] else '0',
+    ])
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _sync_batch(vendor, rows, categories, slugs, result):
+    load_categories(rows, categories)
+    parsed = []
+    for line, row in rows:
+        if (row.get('image') or '').strip():
+            result.error(line, "feeds can't carry images; use the bulk upload for those")
+            continue
+        try:
+            values = parse_row(row, line, categories, slugs)
+        except ValueError as exc:
+            result.error(line, str(exc))
+            continue
+        del values['image']
+        values['feed_hash'] = row_hash(values)
+        parsed.append(values)
+
+    stored = {
+        slug: (pk, feed_hash if deleted_at is None else '')
+        for slug, pk, feed_hash, deleted_at in Product.all_objects
+        .filter(vendor=vendor, slug__in=[values['slug'] for values in parsed])
+        .values_list('slug', 'pk', 'feed_hash', 'deleted_at')
+    }
+    now = timezone.now()
+    new, changed = [], []
+    for values in parsed:
+        current = stored.get(values['slug'])
+        if current is None:
+            new.append(Product(vendor=vendor, created=now, updated=now, **values))
+        elif current[1] == values['feed_hash']:
+            result.unchanged += 1
+        else:
+            changed.append(Product(pk=current[0], vendor=vendor, updated=now, deleted_at=None, **values))
+
+    with transaction.atomic():
+        Product.objects.bulk_create(new)
+        Product.all_objects.bulk_update(changed, WRITE_FIELDS)
+    result.created += len(new)
+    result.updated += len(changed)
+    return len(new) + len(changed)
+
+
+def _unlist(vendor, listed):
+    missing = [
+        pk for pk, slug in Product.objects.filter(vendor=vendor, available=True).values_list('pk', 'slug')
+        if slug not in listed
+    ]
+    for start in range(0, len(missing), UNLIST_CHUNK_SIZE):
+        Product.all_objects.filter(pk__in=missing[start:start + UNLIST_CHUNK_SIZE]).update(
+            available=False, feed_hash='', updated=timezone.now(),
+        )
+    return len(missing)
+
+
+def sync_feed(vendor, file):
+    """Bring ``vendor``'s products in line with a full catalog CSV; returns a FeedSync."""
+    result = FeedSync()
+    reader = open_csv(file, result, optional=FEED_COLUMNS)
+    if reader is None:
+        return result
+
+    written = 0
+    listed, categories, slugs, rows = set(), {}, {}, []
+    try:
+        for row in reader:
+            rows.append((reader.line_num, row))
+            # Rows with errors still count as listed: a typo must not unlist a product
+            listed.add(row_slug(row))
+            if len(rows) >= BATCH_SIZE:
+                written += _sync_batch(vendor, rows, categories, slugs, result)
+                rows = []
+        written += _sync_batch(vendor, rows, categories, slugs, result)
+        result.unlisted = _unlist(vendor, listed)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        result.error(reader.line_num, f"unreadable CSV, stopped here: {exc}")
+    finally:
+        # Batches already written are live even if a later one failed
+        if written or result.unlisted:
+            bump_catalog_version()
+            bump_vendor_version(vendor.pk)
+    logger.info("Vendor %s feed sync: %d created, %d updated, %d unchanged, %d unlisted, %d errors",
+                vendor.pk, result.created, result.updated, result.unchanged, result.unlisted, result.error_count)
+    return result
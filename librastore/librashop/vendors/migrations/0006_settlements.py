@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_soft_delete'),
+        ('vendors', '0005_vendor_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField(help_text='Exclusive')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payable', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='statements', to='vendors.vendor')),
+            ],
+            options={
+                'ordering': ['-period_start', 'vendor_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SettlementEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('refund', 'Refund')], max_length=10)),
+                ('gross', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('discount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('net', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='settlement_entries', to='store.order')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='settlement_entries', to='vendors.vendor')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='vendors.settlementstatement')),
+            ],
+            options={
+                'verbose_name_plural': 'settlement entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='settlementstatement',
+            constraint=models.UniqueConstraint(fields=('vendor', 'period_start', 'period_end'), name='settlement_statement_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='settlemententry',
+            constraint=models.UniqueConstraint(fields=('vendor', 'order', 'kind'), name='settlement_entry_unique'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0026_flashsale_allocation'),
+        ('vendors', '0006_settlements'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='settlemententry',
+            name='settlement_entry_unique',
+        ),
+        migrations.AddField(
+            model_name='settlemententry',
+            name='sequence',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddConstraint(
+            model_name='settlemententry',
+            constraint=models.UniqueConstraint(fields=('vendor', 'order', 'kind', 'sequence'), name='settlement_entry_unique'),
+        ),
+    ]
@@ -2,9 +2,13 @@ from django.db import models
 from django.conf import settings
 from django.utils.text import slugify
 import uuid
+from decimal import Decimal
 
 # Create your models here.
 
+# Paths under vendors/ that a storefront slug would otherwise shadow
+RESERVED_SLUGS = {'dashboard', 'orders', 'products', 'register', 'login', 'logout', 'settings'}
+
 class Vendor(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='vendor')
     store_name = models.CharField(max_length=200, default='-')
@@ -22,8 +26,134 @@ class Vendor(models.Model):
         if not self.slug:
             base_slug = slugify(self.store_name)
             slug = base_slug
-            while Vendor.objects.filter(slug=slug).exists():
+            while slug in RESERVED_SLUGS or Vendor.objects.filter(slug=slug).exists():
                 slug = f"{base_slug}-{uuid.uuid4().hex[:8]}"
             self.slug = slug
         super().save(*args, **kwargs)
-    
\ No newline at end of file
+    
+
+class VendorOrder(models.Model):
+    """A vendor's share of one order, written when the order is placed (see vendors.order_index)."""
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='orders')
+    order = models.ForeignKey('store.Order', on_delete=models.CASCADE, related_name='vendor_orders')
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    placed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'order'], name='vendor_order_unique'),
+        ]
+        indexes = [
+            # Vendor order pages: newest first, keyset over (placed_at, id)
+            models.Index(fields=['vendor', '-placed_at', '-id'], name='vendor_order_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor} - order #{self.order_id}"
+
+
+class VendorOrderLine(models.Model):
+    """One of the vendor's items in an order, with the product details as sold."""
+    vendor_order = models.ForeignKey(VendorOrder, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey('store.Product', on_delete=models.SET_NULL, null=True, blank=True)
+    product_name = models.CharField(max_length=255, blank=True)
+    product_image = models.CharField(max_length=500, blank=True)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+
+class VendorStats(models.Model):
+    """Running dashboard totals for a vendor, kept by vendors.stats.
+
+    Paid orders are added at placement and reviews when written; money is
+    held in paise so the increments are exact integers.
+    """
+    vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, related_name='stats')
+    earnings_paise = models.BigIntegerField(default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'vendor stats'
+
+    def __str__(self):
+        return f"{self.vendor} stats"
+
+    @property
+    def earnings(self):
+        return Decimal(self.earnings_paise).scaleb(-2)
+
+    @property
+    def avg_rating(self):
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else None
+
+
+class SettlementStatement(models.Model):
+    """What a vendor is owed for a settlement period; written once by vendors.settlement, never edited.
+
+    ``payable`` is gross sales less their share of coupon discounts, less
+    the net of orders refunded since they were settled.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.PROTECT, related_name='statements')
+    period_start = models.DateField()
+    period_end = models.DateField(help_text='Exclusive')
+    orders = models.PositiveIntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payable = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'period_start', 'period_end'], name='settlement_statement_unique'),
+        ]
+        ordering = ['-period_start', 'vendor_id']
+
+    def __str__(self):
+        return f"{self.vendor} {self.period_start:%Y-%m-%d} to {self.period_end:%Y-%m-%d}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Settlement statements are immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Settlement statements are immutable")
+
+
+class SettlementEntry(models.Model):
+    """One vendor order settled in a statement, or its reversal after a refund.
+
+    ``sequence`` counts the times the order was settled: an order refunded
+    and then paid again is settled again as sale 2, reversed as refund 2.
+    """
+    SALE, REFUND = 'sale', 'refund'
+    KIND_CHOICES = [(SALE, 'Sale'), (REFUND, 'Refund')]
+
+    statement = models.ForeignKey(SettlementStatement, on_delete=models.PROTECT, related_name='entries')
+    vendor = models.ForeignKey(Vendor, on_delete=models.PROTECT, related_name='settlement_entries')
+    order = models.ForeignKey('store.Order', on_delete=models.PROTECT, related_name='settlement_entries')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    sequence = models.PositiveIntegerField(default=1)
+    gross = models.DecimalField(max_digits=12, decimal_places=2)
+    discount = models.DecimalField(max_digits=12, decimal_places=2)
+    net = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            # Each settlement of a vendor share of an order is written, and reversed, at most once
+            models.UniqueConstraint(fields=['vendor', 'order', 'kind', 'sequence'], name='settlement_entry_unique'),
+        ]
+        verbose_name_plural = 'settlement entries'
+
+    def __str__(self):
+        return f"{self.kind} {self.sequence} order #{self.order_id}: {self.net}"
@@ -0,0 +1,77 @@
+"""
+Per-vendor order index (VendorOrder, VendorOrderLine).
+
+An order's items are split by the vendor of their product when the order is
+placed, so a vendor's orders page is a range scan of its own index rows
+(vendor, placed_at, id) instead of a join through every order item of every
+product it sells. Prices come from the order items' snapshots, the vendor
+from the product at indexing time. Items without a product or vendor are
+not indexed.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from store.models import OrderItem
+from store.rollups import SALES_STATUS
+from store.totals import ZERO
+
+from . import stats
+from .models import VendorOrder, VendorOrderLine
+
+
+def _write(order_ids):
+    order_ids = list(order_ids)
+    items = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .exclude(product__vendor=None)
+        .values_list(
+            'order_id', 'order__date_odered', 'product_id', 'product__vendor_id',
+            Coalesce('product_name', 'product__name'), Coalesce('product_image', Value('')),
+            Coalesce('product_price', 'product__price', Value(ZERO)), Coalesce('quantity', 0),
+        )
+        .order_by('order_id', 'id')
+    )
+    grouped = defaultdict(list)
+    placed = {}
+    for order_id, placed_at, product_id, vendor_id, name, image, price, quantity in items:
+        placed[order_id] = placed_at
+        grouped[(vendor_id, order_id)].append(VendorOrderLine(
+            product_id=product_id, product_name=name or '', product_image=image,
+            unit_price=price, quantity=quantity, subtotal=price * quantity,
+        ))
+
+    with transaction.atomic():
+        VendorOrder.objects.filter(order_id__in=order_ids).delete()
+        vendor_orders = VendorOrder.objects.bulk_create([
+            VendorOrder(
+                vendor_id=vendor_id, order_id=order_id, placed_at=placed[order_id],
+                subtotal=sum((line.subtotal for line in lines), ZERO),
+                quantity=sum(line.quantity for line in lines),
+            )
+            for (vendor_id, order_id), lines in grouped.items()
+        ])
+        # bulk_create sets primary keys on Postgres and SQLite, which is all this runs on
+        for vendor_order, lines in zip(vendor_orders, grouped.values()):
+            for line in lines:
+                line.vendor_order = vendor_order
+        VendorOrderLine.objects.bulk_create([line for lines in grouped.values() for line in lines])
+    return vendor_orders
+
+
+def index_orders(order_ids):
+    """(Re)write the vendor index rows of ``order_ids``; returns how many VendorOrders were written."""
+    return len(_write(order_ids))
+
+
+def record_order(order):
+    """Index a just-placed order and add it to its vendors' counters.
+
+    Call inside the placement transaction, after the order's items exist.
+    """
+    vendor_orders = _write([order.pk])
+    if order.status == SALES_STATUS:
+        stats.add_orders(vendor_orders)
+    return len(vendor_orders)
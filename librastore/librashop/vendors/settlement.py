@@ -0,0 +1,152 @@
+"""
+Vendor settlements.
+
+``settle(start, end)`` closes the period [start, end) for every vendor that
+has something to settle and no statement for that period yet:
+
+* sales: the vendor's share of each paid order placed before ``end`` and
+  not settled before (VendorOrder rows, built from the order items' price
+  snapshots), less its part of the order's coupon discount, pro rata to
+  its part of the order subtotal;
+* refunds: settled shares whose order is no longer paid, reversed once.
+
+Every share settled or reversed is recorded as a SettlementEntry, unique per
+vendor, order, kind and sequence, so rerunning a period writes nothing new
+and closing the next one only picks up what changed since: late-paid
+orders, refunds of orders settled earlier, and refunded orders paid again,
+which are settled again under the next sequence number. Candidates are read with one
+streamed query per kind and written with batched inserts, in a single
+transaction per close; statements are never edited afterwards.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from librashop.reporting import local_midnight, month_window
+from store.rollups import SALES_STATUS
+from store.totals import ZERO
+
+from .models import SettlementEntry, SettlementStatement, VendorOrder
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+CENT = Decimal('0.01')
+
+
+def previous_month(today=None):
+    """[start, end) of the last complete calendar month."""
+    this_month = (today or timezone.localdate()).replace(day=1)
+    return month_window(1, this_month - timedelta(days=1))
+
+
+def allocated_discount(share, order_subtotal, order_discount):
+    """The part of an order's discount borne by a ``share`` of its subtotal, to the cent."""
+    if not order_discount or not order_subtotal:
+        return ZERO
+    return min(share, (share * order_discount / order_subtotal).quantize(CENT))
+
+
+def _entry(vendor_id, order_id, kind, sequence, gross, discount):
+    return SettlementEntry(
+        vendor_id=vendor_id, order_id=order_id, kind=kind, sequence=sequence,
+        gross=gross, discount=discount, net=gross - discount,
+    )
+
+
+def _reversed():
+    """Refund entries of the outer sale entry."""
+    return SettlementEntry.objects.filter(
+        vendor=OuterRef('vendor'), order=OuterRef('order'),
+        sequence=OuterRef('sequence'), kind=SettlementEntry.REFUND,
+    )
+
+
+def _sales(end, closed):
+    # A share is settled while its latest sale entry has no refund
+    sale_entries = SettlementEntry.objects.filter(
+        vendor=OuterRef('vendor'), order=OuterRef('order'), kind=SettlementEntry.SALE,
+    )
+    open_sale = sale_entries.exclude(Exists(_reversed()))
+    last_sequence = sale_entries.order_by('-sequence').values('sequence')[:1]
+    rows = (
+        VendorOrder.objects
+        .filter(order__status=SALES_STATUS, placed_at__lt=local_midnight(end))
+        .exclude(vendor__in=closed)
+        .exclude(Exists(open_sale))
+        .annotate(last_sequence=Subquery(last_sequence))
+        .values_list('vendor_id', 'order_id', 'last_sequence', 'subtotal', 'order__subtotal', 'order__discount')
+        .order_by()
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    for vendor_id, order_id, last_sequence, share, order_subtotal, order_discount in rows:
+        yield _entry(vendor_id, order_id, SettlementEntry.SALE, (last_sequence or 0) + 1, share,
+                     allocated_discount(share, order_subtotal, order_discount))
+
+
+def _refunds(closed):
+    rows = (
+        SettlementEntry.objects
+        .filter(kind=SettlementEntry.SALE)
+        .exclude(order__status=SALES_STATUS)
+        .exclude(vendor__in=closed)
+        .exclude(Exists(_reversed()))
+        .values_list('vendor_id', 'order_id', 'sequence', 'gross', 'discount')
+        .order_by()
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    for vendor_id, order_id, sequence, gross, discount in rows:
+        yield _entry(vendor_id, order_id, SettlementEntry.REFUND, sequence, -gross, -discount)
+
+
+def settle(start, end):
+    """Write the statements for [start, end) that don't exist yet; returns them."""
+    if end > timezone.localdate():
+        raise ValueError(f"The period ending {end} is not over yet")
+    closed = SettlementStatement.objects.filter(period_start=start, period_end=end).values('vendor_id')
+    statements = {}
+    totals = defaultdict(lambda: {'orders': 0, 'gross': ZERO, 'discount': ZERO, 'refunds': ZERO})
+
+    def statement_id(vendor_id):
+        if vendor_id not in statements:
+            statements[vendor_id] = SettlementStatement.objects.create(
+                vendor_id=vendor_id, period_start=start, period_end=end,
+            )
+        return statements[vendor_id].pk
+
+    with transaction.atomic():
+        # Refunds first, so their scan of the sale entries never overlaps this run's inserts
+        for source in (_refunds(closed), _sales(end, closed)):
+            batch = []
+            for entry in source:
+                entry.statement_id = statement_id(entry.vendor_id)
+                vendor_totals = totals[entry.vendor_id]
+                if entry.kind == SettlementEntry.SALE:
+                    vendor_totals['orders'] += 1
+                    vendor_totals['gross'] += entry.gross
+                    vendor_totals['discount'] += entry.discount
+                else:
+                    vendor_totals['refunds'] -= entry.net
+                batch.append(entry)
+                if len(batch) >= BATCH_SIZE:
+                    SettlementEntry.objects.bulk_create(batch)
+                    batch = []
+            SettlementEntry.objects.bulk_create(batch)
+
+        # The totals are only known once the entries are written; this is the statement's one update
+        for vendor_id, statement in statements.items():
+            vendor_totals = totals[vendor_id]
+            payable = vendor_totals['gross'] - vendor_totals['discount'] - vendor_totals['refunds']
+            SettlementStatement.objects.filter(pk=statement.pk).update(payable=payable, **vendor_totals)
+            for name, value in vendor_totals.items():
+                setattr(statement, name, value)
+            statement.payable = payable
+
+    if statements:
+        logger.info("Settled %s to %s for %d vendors", start, end, len(statements))
+    return list(statements.values())
@@ -0,0 +1,108 @@
+"""
+Per-vendor dashboard counters (VendorStats).
+
+Each vendor's share of a paid order (vendors.order_index) is added at
+placement, and reviews add or remove their rating when they are written or
+deleted. Both use F() increments inside the writer's transaction, so the
+dashboard reads a single row. Orders moving into or out of the paid status
+through store.bulk_edit are added or taken back the same way. ``rebuild``
+recomputes vendors from their orders and reviews; it repairs what
+increments miss, e.g. edited ratings or status changes made elsewhere, and
+the rebuild_vendor_stats command runs it for everyone.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from store.catalog import bump_vendor_version
+from store.models import Product
+from store.rollups import SALES_STATUS
+
+from .models import VendorOrder, VendorStats
+
+WRITE_BATCH_SIZE = 1000
+
+
+def to_paise(amount):
+    return int((amount or 0) * 100)
+
+
+def _add(vendor_id, **amounts):
+    """Add ``amounts`` to the vendor's counters, creating its row if needed."""
+    increments = {name: F(name) + value for name, value in amounts.items()}
+    now = timezone.now()
+    if VendorStats.objects.filter(vendor_id=vendor_id).update(**increments, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            VendorStats.objects.create(vendor_id=vendor_id, **amounts)
+    except IntegrityError:
+        # Another writer created the row first
+        VendorStats.objects.filter(vendor_id=vendor_id).update(**increments, updated_at=now)
+
+
+def add_orders(vendor_orders, sign=1):
+    """Count VendorOrders as paid (``sign=-1`` takes them back out)."""
+    for vendor_order in vendor_orders:
+        _add(
+            vendor_order.vendor_id,
+            earnings_paise=sign * to_paise(vendor_order.subtotal),
+            paid_orders=sign,
+            units_sold=sign * vendor_order.quantity,
+        )
+
+
+def order_status_changed(paid_order_ids, unpaid_order_ids):
+    """Move the vendor shares of orders that just became paid, or stopped being paid."""
+    add_orders(VendorOrder.objects.filter(order_id__in=paid_order_ids))
+    add_orders(VendorOrder.objects.filter(order_id__in=unpaid_order_ids), sign=-1)
+
+
+def _vendor_of(review):
+    return Product.all_objects.filter(pk=review.product_id).values_list('vendor_id', flat=True).first()
+
+
+def add_review(review, sign=1):
+    vendor_id = _vendor_of(review)
+    if vendor_id:
+        _add(vendor_id, rating_sum=sign * review.rating, rating_count=sign)
+        # The storefront shows the rating
+        transaction.on_commit(lambda: bump_vendor_version(vendor_id))
+
+
+def review_edited(review):
+    # The old rating is gone by now, so recount the vendor
+    vendor_id = _vendor_of(review)
+    if vendor_id:
+        rebuild([vendor_id])
+        transaction.on_commit(lambda: bump_vendor_version(vendor_id))
+
+
+def rebuild(vendor_ids=None):
+    """Recompute the counters of ``vendor_ids`` (every vendor if None); returns rows written."""
+    from reviews.models import Review
+
+    orders = VendorOrder.objects.filter(order__status=SALES_STATUS)
+    reviews = Review.objects.exclude(product__vendor=None)
+    stats = VendorStats.objects.all()
+    if vendor_ids is not None:
+        orders = orders.filter(vendor_id__in=vendor_ids)
+        reviews = reviews.filter(product__vendor_id__in=vendor_ids)
+        stats = stats.filter(vendor_id__in=vendor_ids)
+
+    rows = {}
+    sales = orders.values('vendor_id').annotate(earnings=Sum('subtotal'), orders=Count('id'), units=Sum('quantity'))
+    for row in sales.order_by():
+        rows[row['vendor_id']] = VendorStats(
+            vendor_id=row['vendor_id'], earnings_paise=to_paise(row['earnings']),
+            paid_orders=row['orders'], units_sold=row['units'] or 0,
+        )
+    ratings = reviews.values('product__vendor_id').annotate(total=Sum('rating'), count=Count('id'))
+    for row in ratings.order_by():
+        vendor_stats = rows.setdefault(row['product__vendor_id'], VendorStats(vendor_id=row['product__vendor_id']))
+        vendor_stats.rating_sum, vendor_stats.rating_count = row['total'] or 0, row['count']
+
+    with transaction.atomic():
+        stats.delete()
+        VendorStats.objects.bulk_create(rows.values(), batch_size=WRITE_BATCH_SIZE)
+    return len(rows)
@@ -1,3 +1,171 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from store.models import Category, Customer, Order, OrderItem, Product
+
+from . import order_index
+from .feed_sync import sync_feed
+from .models import SettlementEntry, Vendor, VendorOrder
+from .settlement import settle
+
+
+class VendorTestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.vendor = Vendor.objects.create(
+            user=User.objects.create_user('vendor', password='x'),
+            store_name='Vendor', owner_name='Owner', phone='1', address='Street',
+        )
+        self.customer = Customer.objects.get(user=User.objects.create_user('buyer', password='x'))
+        self.category = Category.objects.create(name='Books', slug='books')
+
+
+class SettlementTests(VendorTestCase):
+    def setUp(self):
+        super().setUp()
+        product = Product.objects.create(
+            vendor=self.vendor, name='Book', slug='book', category=self.category, price=10, available=True,
+        )
+        self.order = Order.objects.create(custamer=self.customer, status='paid', transaction_id='t')
+        OrderItem.objects.create(order=self.order, product=product, quantity=2, product_name='Book', product_price=10)
+        self.order.recalculate_totals()
+        order_index.record_order(self.order)
+        VendorOrder.objects.filter(order=self.order).update(placed_at=timezone.now() - timedelta(days=10))
+
+    def close(self, days_ago):
+        """Settle the day that ended ``days_ago`` days ago; the payable amounts written."""
+        end = timezone.localdate() - timedelta(days=days_ago)
+        return [statement.payable for statement in settle(end - timedelta(days=1), end)]
+
+    def set_status(self, status):
+        Order.objects.filter(pk=self.order.pk).update(status=status)
+
+    def test_rerunning_a_period_writes_nothing(self):
+        self.assertEqual(self.close(8), [Decimal('20.00')])
+        self.assertEqual(self.close(8), [])
+        self.assertEqual(self.close(7), [])
+
+    def test_refund_is_reversed_once(self):
+        self.close(8)
+        self.set_status('cancelled')
+        self.assertEqual(self.close(7), [Decimal('-20.00')])
+        self.assertEqual(self.close(6), [])
+
+    def test_order_paid_again_after_refund_is_settled_again(self):
+        self.close(8)
+        self.set_status('cancelled')
+        self.close(7)
+        self.set_status('paid')
+        self.assertEqual(self.close(6), [Decimal('20.00')])
+        self.assertEqual(self.close(5), [])
+        entries = SettlementEntry.objects.filter(order=self.order).order_by('pk')
+        self.assertEqual(
+            list(entries.values_list('kind', 'sequence')),
+            [(SettlementEntry.SALE, 1), (SettlementEntry.REFUND, 1), (SettlementEntry.SALE, 2)],
+        )
+
+    def test_unfinished_period_is_refused(self):
+        today = timezone.localdate()
+        with self.assertRaises(ValueError):
+            settle(today, today + timedelta(days=1))
+
+
+class FeedSyncTests(VendorTestCase):
+    def sync(self, *rows):
+        feed = 'name,price,category,slug,available\n' + ''.join(f'{row}\n' for row in rows)
+        return sync_feed(self.vendor, io.BytesIO(feed.encode()))
+
+    def products(self):
+        return dict(Product.all_objects.filter(vendor=self.vendor).values_list('slug', 'available'))
+
+    def test_unchanged_feed_writes_nothing(self):
+        result = self.sync('Book,10,books,book,yes', 'Pen,2.5,books,pen,yes')
+        self.assertEqual((result.created, result.updated), (2, 0))
+        # Same values spelled differently hash the same
+        with CaptureQueriesContext(connection) as queries:
+            result = self.sync('Book,10.00,Books,book,1', 'Pen,2.50,books,pen,true')
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 2))
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(writes, [])
+
+    def test_changed_row_is_rewritten(self):
+        self.sync('Book,10,books,book,yes')
+        result = self.sync('Book,12,books,book,yes')
+        self.assertEqual((result.updated, result.unchanged), (1, 0))
+        self.assertEqual(Product.objects.get(slug='book').price, Decimal('12'))
+
+    def test_product_edited_elsewhere_is_rewritten(self):
+        self.sync('Book,10,books,book,yes')
+        product = Product.objects.get(slug='book')
+        product.name = 'Edited'
+        product.save()
+        self.assertEqual(self.sync('Book,10,books,book,yes').updated, 1)
+        self.assertEqual(Product.objects.get(slug='book').name, 'Book')
+
+    def test_missing_products_are_unlisted_and_relisted(self):
+        self.sync('Book,10,books,book,yes', 'Pen,2,books,pen,yes')
+        self.assertEqual(self.sync('Book,10,books,book,yes').unlisted, 1)
+        self.assertEqual(self.products(), {'book': True, 'pen': False})
+        self.assertEqual(self.sync('Book,10,books,book,yes', 'Pen,2,books,pen,yes').updated, 1)
+        self.assertEqual(self.products(), {'book': True, 'pen': True})
+
+    def test_row_errors_keep_the_product_listed(self):
+        self.sync('Book,10,books,book,yes')
+        result = self.sync('Book,not a price,books,book,yes')
+        self.assertEqual((result.error_count, result.unlisted), (1, 0))
+        self.assertEqual(self.products(), {'book': True})
+
+
+# The manifest only exists after collectstatic
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class StorefrontTests(VendorTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Product.objects.create(
+            vendor=self.vendor, name='Book', slug='book', category=self.category, price=10, available=True,
+        )
+
+    def get(self, slug=None, **params):
+        return self.client.get(reverse('vendor_storefront', args=[slug or self.vendor.slug]), params)
+
+    def test_cache_hit_runs_no_queries(self):
+        self.assertEqual(self.get().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertContains(response, 'Book')
+
+    def test_renamed_store_is_a_404(self):
+        old_slug = self.vendor.slug
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.slug = 'renamed'
+            self.vendor.save()
+        self.assertEqual(self.get(old_slug).status_code, 404)
+        self.assertEqual(self.get('renamed').status_code, 200)
+
+    def test_deleted_store_is_a_404(self):
+        slug = self.vendor.slug
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.delete()
+        self.assertEqual(self.get(slug).status_code, 404)
+
+    def test_out_of_range_page_is_a_404(self):
+        self.assertEqual(self.get(page=99).status_code, 404)
+        # Nothing was cached for it, and the real page still renders
+        self.assertEqual(self.get(page=99).status_code, 404)
+        self.assertEqual(self.get(page=1).status_code, 200)
+        self.assertEqual(self.get(page='last').context['number'], 1)
@@ -9,6 +9,8 @@ urlpatterns = [
     path('dashboard/', views.vendor_dashboard, name='vendor_dashboard'),
     path('orders/', views.vendor_orders, name='vendor_orders'),
     path('products/', views.vendor_products, name='vendor_products'),
+    path('products/bulk-upload/', views.vendor_bulk_upload, name='vendor_bulk_upload'),
+    path('products/feed/', views.vendor_feed_sync, name='vendor_feed_sync'),
     path('products/add/', ProductCreateView.as_view(), name='product_create'),
     path('products/<int:pk>/edit/', ProductUpdateView.as_view(), name='product_update'),
     path('products/<int:pk>/delete/', ProductDeleteView.as_view(), name='product_delete'),
@@ -17,4 +19,6 @@ urlpatterns = [
     # path('login/', views.vandor_login, name='vendor_login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='home'), name='vendor_logout'),
     path('settings/', views.vendor_settings, name='vendor_settings'),
+    # Last, so the fixed paths above win (Vendor.save keeps them out of slugs)
+    path('<slug:slug>/', views.vendor_storefront, name='vendor_storefront'),
 ]
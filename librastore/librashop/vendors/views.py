@@ -1,18 +1,75 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.http import Http404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from .models import Vendor
-from store.models import Product, Order, OrderItem, Category  # type: ignore
+from . import bulk_upload, feed_sync
+from .models import Vendor, VendorOrder, VendorOrderLine, VendorStats
+from store.models import Product, Category, ProductForecast  # type: ignore
+from store import catalog, deletion
+from store.rollups import SALES_STATUS
+from librashop.pagination import paginate_list
 from .forms import ProductForm, CombinedRegistrationForm, VendorSettingsForm
 from django.db import transaction
-from django.db.models import Sum, Avg, Count, F, ExpressionWrapper, DecimalField
+from django.db.models import Prefetch, prefetch_related_objects
 from django.contrib.auth import login
 from django.utils.text import slugify
+import uuid
 
 # Create your views here.
 
+VENDOR_ORDER_ORDERING = ['-placed_at', '-id']
+STOREFRONT_PAGE_SIZE = 24
+STOREFRONT_SLUG_SECONDS = 3600
+
+
+def _storefront_page(vendor_id, number):
+    """Everything a storefront page shows, evaluated so it can be cached."""
+    vendor = Vendor.objects.get(pk=vendor_id)
+    stats = VendorStats.objects.filter(vendor=vendor).first() or VendorStats(vendor=vendor)
+    products = (
+        Product.objects.filter(vendor=vendor, available=True)
+        .select_related('category').order_by('-created', '-id')
+    )
+    # page() rather than get_page(): a clamped page would be cached again under every out-of-range number
+    page = Paginator(products, STOREFRONT_PAGE_SIZE).page(number)
+    return {
+        'vendor': vendor,
+        'avg_rating': stats.avg_rating,
+        'rating_count': stats.rating_count,
+        'products': list(page.object_list),
+        'number': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+    }
+
+
+def vendor_storefront(request, slug):
+    """Public storefront of one vendor; a cache hit runs no queries."""
+    slug_key = f'vendor-slug:{slug}'
+    vendor_id = cache.get(slug_key)
+    if vendor_id is None:
+        vendor_id = get_object_or_404(Vendor, slug=slug).pk
+        cache.set(slug_key, vendor_id, STOREFRONT_SLUG_SECONDS)
+    try:
+        number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        number = 1
+    try:
+        page = catalog.vendor_cached(vendor_id, f'storefront:{number}', lambda: _storefront_page(vendor_id, number))
+    except Vendor.DoesNotExist:
+        page = None
+    except EmptyPage:
+        raise Http404("No such page")
+    if page is None or page['vendor'].slug != slug:
+        # Deleted or renamed since the slug was cached
+        cache.delete(slug_key)
+        raise Http404("No such store")
+    return render(request, 'vendor_storefront.html', page)
+
 
 @login_required
 def vendor_dashboard(request):
@@ -21,42 +78,29 @@ def vendor_dashboard(request):
         return redirect('home')
 
     vendor = request.user.vendor
-    products = Product.objects.filter(vendor=vendor)
-    total_products = products.count()
-
-    vendor_order_items = OrderItem.objects.filter(
-        product__in=products
-    ).select_related('product', 'order')
-
-    # total_earnings = vendor_order_items.filter(order__status='paid').aggregate(total=Sum('price'))['total'] or 0
-    # total_orders = vendor_order_items.filter(order__status='paid').aggregate(total=Count('order',distinct=True))['total'] or 0
+    total_products = Product.objects.filter(vendor=vendor).count()
 
-    # recent_orders = Order.objects.filter(id__in=vendor_order_items.filter(order__status='paid').values('order_id')).order_by('-created_at').distinct()[:5]
+    # Running totals kept by vendors.stats; a vendor with no sales or reviews has no row yet
+    stats = VendorStats.objects.filter(vendor=vendor).first() or VendorStats(vendor=vendor)
+    recent_orders = (
+        VendorOrder.objects.filter(vendor=vendor, order__status=SALES_STATUS)
+        .select_related('order__custamer__user').order_by(*VENDOR_ORDER_ORDERING)[:5]
+    )
 
-    total_earnings = vendor_order_items.filter(order__status='paid').aggregate(
-        total=Sum(
-            ExpressionWrapper(
-                F('quantity') * F('product__price'),
-                output_field=DecimalField()
-                )
-            )
-        )['total'] or 0
-    total_orders = vendor_order_items.filter(order__status='paid').aggregate(total=Count('order', distinct=True))['total'] or 0
-    recent_orders = Order.objects.filter(  # type: ignore
-        id__in=vendor_order_items.filter(order__status='paid').values('order_id')
-    ).order_by('-date_odered').distinct()[:5]
-
-    avg_rating_query = products.aggregate(avg_rating=Avg('reviews__rating'))['avg_rating']
-    avg_rating = round(avg_rating_query, 1) if avg_rating_query else 'N/A'
+    # Written nightly by build_demand_forecasts; nothing is computed here
+    restock_suggestions = (
+        ProductForecast.objects.filter(product__vendor=vendor, needs_restock=True)
+        .select_related('product').order_by('days_of_cover')[:10]
+    )
 
     context = {
         'vendor': vendor,
+        'restock_suggestions': restock_suggestions,
         'total_products': total_products,
-        'total_orders': total_orders,
-        'total_earnings': total_earnings,
-        'avg_rating': avg_rating,
+        'total_orders': stats.paid_orders,
+        'total_earnings': stats.earnings,
+        'avg_rating': stats.avg_rating or 'N/A',
         'recent_orders': recent_orders,
-        'products': products,
     }
     return render(request, 'dashboard.html', context)
 
@@ -68,37 +112,15 @@ def vendor_orders(request):
         return redirect('home')
 
     vendor = request.user.vendor
-    products = Product.objects.filter(vendor=vendor)  # type: ignore
-    
-    # Optimize query with select_related to avoid N+1
-    vendor_order_items = OrderItem.objects.filter(
-        product__in=products
-    ).select_related('product', 'order')  # type: ignore
-
-    # Get all unique orders for this vendor with prefetch
-    from django.db.models import Prefetch
-    orders = Order.objects.filter(  # type: ignore
-        id__in=vendor_order_items.values('order_id')
-    ).prefetch_related(
-        Prefetch('orderitem_set', queryset=vendor_order_items)
-    ).order_by('-date_odered').distinct()
-
-    # Get order items with product info for each order
-    orders_with_items = []
-    for order in orders:
-        # Use prefetched data instead of querying again
-        items = [item for item in order.orderitem_set.all() if item.product in products]
-        order_total = sum(item.quantity * item.product.price for item in items if item.product)
-        orders_with_items.append({
-            'order': order,
-            'items': items,
-            'total': order_total
-        })
+    vendor_orders = VendorOrder.objects.filter(vendor=vendor).select_related('order__custamer__user')
+    page = paginate_list(request, vendor_orders, VENDOR_ORDER_ORDERING)
+    prefetch_related_objects(page.object_list, Prefetch(
+        'lines', queryset=VendorOrderLine.objects.select_related('product__category').order_by('id'),
+    ))
 
     context = {
         'vendor': vendor,
-        'orders_with_items': orders_with_items,
-        'total_orders': orders.count(),
+        'page': page,
     }
     return render(request, 'vendor_orders.html', context)
 
@@ -119,6 +141,54 @@ def vendor_products(request):
     return render(request, 'vendor_products.html', context)
 
 
+@login_required
+def vendor_bulk_upload(request):
+    """Create or update many products from a CSV, with their images in a zip."""
+    if not hasattr(request.user, 'vendor'):
+        messages.warning(request, 'You are not registered as a vendor!')
+        return redirect('home')
+
+    upload = None
+    if request.method == 'POST':
+        csv_file = request.FILES.get('csv_file')
+        if not csv_file:
+            messages.error(request, 'Please choose a CSV file.')
+        else:
+            upload = bulk_upload.upload_products(request.user.vendor, csv_file, request.FILES.get('images_zip'))
+            if upload.created or upload.updated:
+                messages.success(request, f'{upload.created} products added and {upload.updated} updated.')
+
+    context = {
+        'vendor': request.user.vendor,
+        'upload': upload,
+        'max_errors': bulk_upload.MAX_ERRORS,
+    }
+    return render(request, 'vendor_bulk_upload.html', context)
+
+
+@login_required
+def vendor_feed_sync(request):
+    """Sync the vendor's products with a full catalog CSV (unlisted products become unavailable)."""
+    if not hasattr(request.user, 'vendor'):
+        messages.warning(request, 'You are not registered as a vendor!')
+        return redirect('home')
+
+    result = None
+    if request.method == 'POST':
+        feed = request.FILES.get('feed')
+        if not feed:
+            messages.error(request, 'Please choose a catalog CSV file.')
+        else:
+            result = feed_sync.sync_feed(request.user.vendor, feed)
+
+    context = {
+        'vendor': request.user.vendor,
+        'result': result,
+        'max_errors': bulk_upload.MAX_ERRORS,
+    }
+    return render(request, 'vendor_feed_sync.html', context)
+
+
 class ProductCreateView(CreateView):
     model = Product
     form_class = ProductForm
@@ -135,9 +205,13 @@ class ProductCreateView(CreateView):
             except Category.DoesNotExist:
                 messages.error(self.request, 'Selected category does not exist.')
                 return self.form_invalid(form)
-        # Set slug from name if missing
+        # Set slug from name if missing; slugs are unique per vendor
         if not getattr(form.instance, 'slug', None):
-            form.instance.slug = slugify(form.instance.name)
+            base_slug = slugify(form.instance.name)
+            slug = base_slug
+            while Product.all_objects.filter(vendor=form.instance.vendor, slug=slug).exists():
+                slug = f"{base_slug}-{uuid.uuid4().hex[:8]}"
+            form.instance.slug = slug
         # Save image if provided
         image_file = self.request.FILES.get('image')
         if image_file:
@@ -194,9 +268,11 @@ class ProductDeleteView(DeleteView):
     def get_queryset(self):
         return self.request.user.vendor.products.all()
 
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Product deleted successfully!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Hidden now, purged with its dependents in the background like admin deletes
+        deletion.soft_delete_products([self.object.pk])
+        messages.success(self.request, 'Product deleted successfully!')
+        return redirect(self.get_success_url())
 
 
 @transaction.atomic